@@ -13,7 +13,7 @@ echo   This will install the required components for the bot.
 echo   This only needs to be done ONCE.
 echo.
 echo   What will be installed:
-echo   - Python libraries (playwright, customtkinter)
+echo   - Python libraries (playwright, customtkinter, aiohttp)
 echo   - Chromium browser (local installation)
 echo.
 echo   This may take 2-5 minutes depending on your internet speed.
@@ -42,7 +42,7 @@ if %errorlevel% neq 0 (
 echo ===============================================================
 echo   📦 Installing Python libraries...
 echo ===============================================================
-pip install playwright customtkinter
+pip install playwright customtkinter aiohttp
 
 echo.
 echo ===============================================================
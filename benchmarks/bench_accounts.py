@@ -0,0 +1,125 @@
+"""Memory and CPU of N account runs against the local stub site, one Chromium per account versus
+`shared_browser = true` (one Chromium, a BrowserContext per account).
+
+The runs are started through RunSupervisor exactly as Start does, log in to the stub and keep scanning
+a room whose target never opens (one spot left, button disabled). Once every account is scanning, the
+process tree under this script (Playwright's drivers and every Chromium process) is sampled with psutil:
+RSS at the end of the window and CPU as the share of one core used over it. Needs `pip install psutil`.
+
+    python benchmarks/bench_accounts.py --accounts 1,2,4,8 --seconds 20
+    python benchmarks/bench_accounts.py --headless --chromium /path/to/chrome   # outside the bundled ms-playwright
+"""
+import argparse
+import asyncio
+import configparser
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import bot
+import psutil
+from playwright.async_api import BrowserType
+from stub_site import StubSite
+
+DAY = "2025-12-01 الاثنين"
+MODES = {"per-account": None, "shared": bot.shared_browser_session}
+
+def override_launch(**overrides):
+    """Make every Chromium the bot launches use `overrides` (executable_path, headless, args)."""
+    launch = BrowserType.launch
+    async def launch_with(self, **kwargs): return await launch(self, **{**kwargs, **overrides})
+    BrowserType.launch = launch_with
+
+def make_config(interval):
+    config = configparser.ConfigParser()
+    config.read_dict({"Settings": {"scan_interval_seconds": str(interval), "restart_failed_runs": "0"}, "Credentials": {}})
+    return config
+
+def tree_cpu_seconds(process):
+    """{pid: user + system CPU seconds} for `process` and everything below it."""
+    seconds = {}
+    for member in [process] + process.children(recursive=True):
+        try: times = member.cpu_times(); seconds[member.pid] = times.user + times.system
+        except psutil.Error: pass
+    return seconds
+
+def tree_rss(process):
+    """(process count, RSS bytes) of everything below `process` (the driver and the browsers)."""
+    members = process.children(recursive=True); total = 0
+    for member in members:
+        try: total += member.memory_info().rss
+        except psutil.Error: pass
+    return len(members), total
+
+def measure(site, mode, account_count, args):
+    """Start `account_count` runs in `mode`, wait until all scan, then sample. Returns (processes, RSS bytes, CPU %)."""
+    log_queue = queue.Queue(); stop_event = threading.Event(); config = make_config(args.interval)
+    runs = [{"room": site.room, "cooldown": 0, "shifts": [{"date": "2025-12-01", "name": "Morning"}],
+             "credentials": {"username": site.username, "password": site.password}, "label": f"acc{i + 1}", "engine": "browser"}
+            for i in range(account_count)]
+    supervisor = bot.RunSupervisor(config, log_queue)
+    if MODES[mode] is None:
+        supervisor.start(runs, lambda run: bot.account_run_coroutine(config, run, log_queue, stop_event))
+    else:
+        supervisor.start(runs, lambda run, browser: bot.account_run_coroutine(config, run, log_queue, stop_event, browser=browser), setup=MODES[mode])
+    me = psutil.Process()
+    try:
+        deadline = time.monotonic() + args.startup_timeout
+        while supervisor.counts().get(bot.RUN_SCANNING, 0) < account_count:
+            if not supervisor.active() or time.monotonic() > deadline:
+                errors = {state.error for state in supervisor.states.values() if state.error}
+                raise RuntimeError(f"{mode} x{account_count}: the runs did not all reach scanning ({', '.join(errors) or supervisor.counts()})")
+            time.sleep(0.2)
+        time.sleep(args.warmup)
+        before = tree_cpu_seconds(me); started = time.monotonic()
+        time.sleep(args.seconds)
+        after = tree_cpu_seconds(me); elapsed = time.monotonic() - started
+        process_count, rss = tree_rss(me)
+        cpu = sum(seconds - before.get(pid, 0.0) for pid, seconds in after.items())
+        return process_count, rss, 100 * cpu / elapsed
+    finally:
+        stop_event.set()
+        if supervisor.active(): supervisor.stop()
+        deadline = time.monotonic() + 30
+        while (supervisor.active() or me.children(recursive=True)) and time.monotonic() < deadline: time.sleep(0.2)
+
+def main(args):
+    overrides = {}
+    if args.chromium: overrides.update(executable_path=args.chromium, args=["--no-sandbox"])
+    if args.headless: overrides["headless"] = True
+    if overrides: override_launch(**overrides)
+    # The stub runs on its own loop; the supervisor starts its own thread, as it does under the GUI
+    loop = asyncio.new_event_loop(); threading.Thread(target=loop.run_forever, daemon=True).start()
+    # Morning has a spot but its button stays disabled: every run keeps scanning for it
+    site = StubSite({DAY: [{"id": 101, "name": "Morning", "spots": 1}, {"id": 102, "name": "Night", "spots": 2, "open": True}]})
+    asyncio.run_coroutine_threadsafe(site.start(), loop).result()
+    bot.LOGIN_URL = f"{site.url}/login/"
+    bot.get_month_url = lambda room_number, year, month: f"{site.url}/rooms/{room_number}/"
+    bot.SESSIONS_DIR = tempfile.mkdtemp(prefix="bench_accounts_")
+    try:
+        print(f"scan interval {args.interval}s, {args.seconds}s sampled after {args.warmup}s warm-up; CPU in % of one core")
+        print(f"{'mode':>12} {'accounts':>9} {'procs':>6} {'RSS MB':>8} {'MB/acct':>8} {'CPU %':>7}")
+        for mode in args.modes.split(","):
+            for account_count in (int(n) for n in args.accounts.split(",")):
+                process_count, rss, cpu = measure(site, mode, account_count, args)
+                print(f"{mode:>12} {account_count:>9} {process_count:>6} {rss / 2**20:>8.0f} {rss / 2**20 / account_count:>8.0f} {cpu:>7.1f}")
+    finally:
+        asyncio.run_coroutine_threadsafe(site.close(), loop).result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", default="1,2,4,8", help="comma-separated account counts (default 1,2,4,8)")
+    parser.add_argument("--modes", default="per-account,shared", help=f"comma-separated modes out of {', '.join(MODES)} (default both)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="sampling window once every account is scanning (default 20)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="wait before sampling (default 5)")
+    parser.add_argument("--interval", type=float, default=0.2, help="scan_interval_seconds of every run (default 0.2)")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="give up if the runs are not all scanning by then (default 120)")
+    parser.add_argument("--headless", action="store_true", help="launch Chromium headless (the bot itself shows its windows)")
+    parser.add_argument("--chromium", help="path to a Chromium executable (default: the bundled ms-playwright one, as the bot uses)")
+    main(parser.parse_args())
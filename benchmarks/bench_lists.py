@@ -0,0 +1,126 @@
+"""Cost of the virtualized target-shift and account lists (VirtualList) with 500 rows: the first
+render, a refresh with nothing changed, moving a row, scrolling, removing the top row, adding a row
+off-screen and jumping to the end, each as set_items / refresh / scroll calls the app makes.
+
+Rows are built by BotApp's own make_*_row / *_row_state / apply_*_row. With a display they are real
+CustomTkinter widgets (the time Tk then spends on layout is reported too); without one, or with
+--stand-in, `ctk` is swapped for StandInCtk, whose widgets only count the calls made on them.
+
+    python benchmarks/bench_lists.py --rows 500 --repeats 50
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bot
+
+class StandInCtk:
+    """The part of customtkinter VirtualList and the row builders use; every widget call is counted."""
+    calls = 0
+
+    class Widget:
+        def __init__(self, parent=None, **options):
+            StandInCtk.calls += 1
+            self.options = options; self.children = []
+            if parent is not None: parent.children.append(self)
+        def _call(self, *args, **kwargs): StandInCtk.calls += 1
+        pack = pack_forget = pack_propagate = grid = bind = set = _call
+        def configure(self, **options): StandInCtk.calls += 1; self.options.update(options)
+        def cget(self, name): StandInCtk.calls += 1; return self.options.get(name)
+        def winfo_children(self): return self.children
+        def winfo_height(self): return 1
+
+    CTkFrame = CTkLabel = CTkButton = CTkCheckBox = CTkScrollbar = Widget
+
+    class BooleanVar:
+        def __init__(self, value=False): self.value = value
+        def set(self, value): StandInCtk.calls += 1; self.value = value
+        def get(self): return self.value
+
+    @staticmethod
+    def CTkFont(**options): return options
+
+class ListHost:
+    """Just the state of BotApp its row builders read."""
+    make_shift_row = bot.BotApp.make_shift_row; shift_row_state = bot.BotApp.shift_row_state; apply_shift_row = bot.BotApp.apply_shift_row
+    make_account_row = bot.BotApp.make_account_row; account_row_state = bot.BotApp.account_row_state; apply_account_row = bot.BotApp.apply_account_row
+
+    def __init__(self, rows):
+        first = datetime.date(2025, 12, 1)
+        self.target_shifts = [{"date": (first + datetime.timedelta(days=i // 3)).isoformat(), "name": ["Morning", "Evening", "Night"][i % 3],
+                               **({"weight": 2} if i % 7 == 0 else {})} for i in range(rows)]
+        self.accounts = [{"username": f"nurse{i + 1}@example.com", "password": "secret", "use_shared": i % 3 != 0, "room": "2761",
+                          "shifts": self.target_shifts[:i % 5], "engine": "http" if i % 4 == 0 else "browser"} for i in range(rows)]
+
+def make_list(host, kind, parent):
+    """The list as BotApp builds it (same sizes)."""
+    if kind == "shifts": return bot.VirtualList(parent, host.make_shift_row, host.shift_row_state, host.apply_shift_row, height=140, row_height=38)
+    return bot.VirtualList(parent, host.make_account_row, host.account_row_state, host.apply_account_row, height=140, row_height=44)
+
+def operations(host, kind, parent):
+    """[(name, setup, timed step)]: `setup` runs untimed around every step to put the list back where it was."""
+    items = host.target_shifts if kind == "shifts" else host.accounts
+    view = make_list(host, kind, parent)
+    if parent is not None: view.frame.pack(fill="both", expand=True)
+    view.set_items(items)
+    extra = dict(items[-1]); count = len(items); removed = items[0]
+    def first_render():
+        fresh = make_list(host, kind, parent); fresh.set_items(items)
+        return fresh
+    def swap(): items[0], items[1] = items[1], items[0]; view.set_items(items)
+    def remove(): items.pop(0); view.set_items(items)
+    def add(): items.append(extra); view.set_items(items)
+    def restore_removed(): items.insert(0, removed); view.set_items(items)
+    return view, [
+        ("first render", None, first_render),
+        ("refresh, nothing changed", None, view.refresh),
+        ("move row 2 up", None, swap),
+        ("scroll one row", lambda: view.scroll(-1), lambda: view.scroll(1)),
+        ("remove top row", lambda: restore_removed() if len(items) < count else None, remove),
+        ("add a row off-screen", lambda: (items.pop(), view.set_items(items)) if items[-1] is extra else None, add),
+        ("jump to the end", lambda: view.on_scrollbar("moveto", 0.0), lambda: view.on_scrollbar("moveto", 1.0)),
+    ]
+
+def main(args):
+    root = None
+    if not args.stand_in:
+        try: root = bot.ctk.CTk(); root.geometry("900x400"); root.update()
+        except Exception as e: print(f"No display ({e}); using StandInCtk")
+    if root is None: bot.ctk = StandInCtk
+    print(f"{args.rows} rows, {args.repeats} repeats per step, {'CustomTkinter' if root is not None else 'StandInCtk'}")
+    header = f"{'list':>9} {'step':>26} {'median ms':>10} {'max ms':>8}"
+    print(header + (f" {'Tk layout ms':>13}" if root is not None else f" {'widget calls':>13}"))
+    for kind in ("shifts", "accounts"):
+        host = ListHost(args.rows)
+        parent = bot.ctk.CTkFrame(root) if root is not None else None
+        if parent is not None: parent.pack(fill="both", expand=True)
+        view, steps = operations(host, kind, parent)
+        for name, setup, step in steps:
+            timings, layouts, calls = [], [], []
+            for _ in range(args.repeats):
+                if setup is not None: setup()
+                if root is not None: root.update_idletasks()
+                before = StandInCtk.calls; started = time.perf_counter()
+                result = step()
+                timings.append(time.perf_counter() - started); calls.append(StandInCtk.calls - before)
+                if root is not None:
+                    started = time.perf_counter(); root.update_idletasks(); layouts.append(time.perf_counter() - started)
+                if isinstance(result, bot.VirtualList) and root is not None: result.frame.destroy()
+            if setup is not None: setup()  # leave the list as the next step expects it
+            last = f"{statistics.median(layouts) * 1000:>13.2f}" if root is not None else f"{statistics.median(calls):>13.0f}"
+            print(f"{kind:>9} {name:>26} {statistics.median(timings) * 1000:>10.3f} {max(timings) * 1000:>8.3f} {last}")
+        if parent is not None: parent.destroy()
+    if root is not None: root.destroy()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="target shifts and accounts in the lists (default 500)")
+    parser.add_argument("--repeats", type=int, default=50, help="times each step is timed (default 50)")
+    parser.add_argument("--stand-in", action="store_true", help="use StandInCtk even if a display is available")
+    main(parser.parse_args())
@@ -0,0 +1,165 @@
+"""Cost of the Live Log at 1,000 messages per second: every 100 ms tick hands add_log_messages one batch
+(as the UI scheduler does), mostly "Scanning for N target shifts..." heartbeats from several accounts that
+LogCollapser folds, with a plain line from some account now and then.
+
+Per tick it reports LogCollapser.fold on its own, the whole add_log_messages call and the number of textbox
+calls it made. With a display the textbox is a real CTkTextbox (the time Tk then spends drawing is reported
+too); without one, or with --stand-in, it is TextStandIn, a line-based model of the Tk Text calls the log uses.
+
+    python benchmarks/bench_log.py --rate 1000 --accounts 10 --seconds 10
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bot
+
+TICK_SECONDS = 0.1  # UiScheduler drains the log queue on this period
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+class TextStandIn:
+    """The Tk Text calls add_log_messages makes, on a list of lines: "row.col" / "end" / "end-1c" /
+    "<mark>" / "<mark> lineend" indices, and marks with left gravity."""
+    def __init__(self):
+        self.lines = [""]; self.marks = {}
+
+    def _pos(self, index):
+        if index in ("end", "end-1c"): return len(self.lines), len(self.lines[-1])
+        if index.endswith(" lineend"):
+            row, _ = self._pos(index[:-len(" lineend")])
+            return row, len(self.lines[row - 1])
+        if index in self.marks: return self.marks[index]
+        row, col = (int(part) for part in index.split("."))
+        if row > len(self.lines): return len(self.lines), len(self.lines[-1])
+        return row, min(col, len(self.lines[row - 1]))
+
+    def index(self, index): return "%d.%d" % self._pos(index)
+
+    def insert(self, index, text, tag=None):
+        row, col = self._pos(index)
+        line = self.lines[row - 1]
+        new = (line[:col] + text).split("\n"); tail = line[col:]; new[-1] += tail
+        self.lines[row - 1:row] = new
+        for name, (mark_row, mark_col) in self.marks.items():
+            if mark_row > row: self.marks[name] = (mark_row + len(new) - 1, mark_col)
+            elif mark_row == row and mark_col > col: self.marks[name] = (row + len(new) - 1, len(new[-1]) - len(tail) + mark_col - col)
+
+    def delete(self, first, last):
+        (row, col), (last_row, last_col) = self._pos(first), self._pos(last)
+        self.lines[row - 1:last_row] = [self.lines[row - 1][:col] + self.lines[last_row - 1][last_col:]]
+        for name, (mark_row, mark_col) in self.marks.items():
+            if (mark_row, mark_col) <= (row, col): continue
+            if (mark_row, mark_col) <= (last_row, last_col): self.marks[name] = (row, col)
+            elif mark_row == last_row: self.marks[name] = (row, col + mark_col - last_col)
+            else: self.marks[name] = (mark_row - (last_row - row), mark_col)
+
+    def get(self, first, last):
+        (row, col), (last_row, last_col) = self._pos(first), self._pos(last)
+        if row == last_row: return self.lines[row - 1][col:last_col]
+        return "\n".join([self.lines[row - 1][col:], *self.lines[row:last_row - 1], self.lines[last_row - 1][:last_col]])
+
+    def mark_set(self, name, index): self.marks[name] = self._pos(index)
+
+    def mark_unset(self, name): self.marks.pop(name, None)
+
+    def mark_gravity(self, name, gravity): pass
+
+    def see(self, index): pass
+
+    def configure(self, **options): pass
+
+class CountingBox:
+    """Forwards to a textbox and counts the calls."""
+    def __init__(self, box): self.box = box; self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.box, name)
+        def call(*args, **kwargs):
+            self.calls += 1
+            return method(*args, **kwargs)
+        return call
+
+class LogHost:
+    """Just the state of BotApp that add_log_messages uses, around a given textbox."""
+    add_log_messages = bot.BotApp.add_log_messages
+    forget_scan_line = bot.BotApp.forget_scan_line
+
+    def __init__(self, box, max_lines):
+        self.config = bot.configparser.ConfigParser(); self.config.read_dict({"Settings": {"log_max_lines": str(max_lines)}})
+        self.log_textbox = box; self.log_collapser = bot.LogCollapser()
+        self.log_scan_marks = {}; self.log_mark_seq = 0; self.log_message_count = 0
+
+    def update_log_stats(self): pass
+
+def make_textbox(stand_in):
+    """(textbox, Tk root or None): a CTkTextbox like the Live Log's if a display is available."""
+    if not stand_in:
+        try:
+            root = bot.ctk.CTk(); root.geometry("900x500")
+        except Exception as e: print(f"No display ({e}); using TextStandIn")
+        else:
+            box = bot.ctk.CTkTextbox(root, state="disabled", font=bot.ctk.CTkFont(size=13), height=500)
+            box.pack(fill="both", expand=True)
+            for tag, color in bot.LOG_TAG_COLORS.items(): box.tag_config(tag, foreground=color)
+            root.update()
+            return box, root
+    return TextStandIn(), None
+
+def batches(rate, accounts, other_every):
+    """Endless ticks of rate/10 messages each: account heartbeats in turn, one plain line per `other_every` messages."""
+    labels = [f"{i + 1}:acc***" for i in range(accounts)]; per_tick = round(rate * TICK_SECONDS); n = 0
+    while True:
+        batch = []
+        for _ in range(per_tick):
+            label = labels[n % accounts]; n += 1
+            if other_every and n % other_every == 0: batch.append(f"[{label}] ✅ Found 'Morning' on 2025-12-01 — booking...")
+            else: batch.append(bot.RunEvent(bot.EVENT_SCAN_CYCLE, label, targets=5))
+        yield batch
+
+def main(args):
+    box, root = make_textbox(args.stand_in)
+    counting = CountingBox(box); host = LogHost(counting, args.max_lines); fold_only = bot.LogCollapser()
+    folds, writes, draws, calls = [], [], [], []
+    ticks = round(args.seconds / TICK_SECONDS); next_tick = time.perf_counter()
+    for tick, batch in zip(range(ticks), batches(args.rate, args.accounts, args.other_every)):
+        started = time.perf_counter()
+        fold_only.fold(batch)
+        folded = time.perf_counter()
+        counting.calls = 0
+        host.add_log_messages(batch)
+        written = time.perf_counter()
+        if root is not None: root.update()
+        folds.append(folded - started); writes.append(written - folded); draws.append(time.perf_counter() - written); calls.append(counting.calls)
+        next_tick += TICK_SECONDS
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    if root is not None: root.destroy()
+    lines = int(box.index("end-1c").split(".")[0]) - 1
+    print(f"{args.rate} msg/s from {args.accounts} accounts, {ticks} ticks of {TICK_SECONDS * 1000:.0f} ms, "
+          f"{'CTkTextbox' if root is not None else 'TextStandIn'}, {lines} lines kept")
+    print(f"{'per tick':>22} {'p50':>8} {'p99':>8} {'max':>8}")
+    rows = [("fold ms", folds), ("add_log_messages ms", writes), ("textbox calls", calls)]
+    if root is not None: rows.append(("Tk update ms", draws))
+    for name, values in rows:
+        scale = 1000 if name.endswith("ms") else 1
+        print(f"{name:>22} {percentile(values, 50) * scale:>8.2f} {percentile(values, 99) * scale:>8.2f} {max(values) * scale:>8.2f}")
+    busy = sum(writes) + sum(draws)
+    print(f"Live Log busy {100 * busy / (ticks * TICK_SECONDS):.1f}% of the UI thread")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=1000, help="messages per second (default 1000)")
+    parser.add_argument("--accounts", type=int, default=10, help="accounts the messages come from (default 10)")
+    parser.add_argument("--other-every", type=int, default=20, help="one plain (non-heartbeat) line per this many messages; 0 for none (default 20)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="run length (default 10)")
+    parser.add_argument("--max-lines", type=int, default=bot.LOG_MAX_LINES, help=f"log_max_lines (default {bot.LOG_MAX_LINES})")
+    parser.add_argument("--stand-in", action="store_true", help="use TextStandIn even if a display is available")
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+"""Detection latency of staggered multi-tab scanning against the local stub site.
+
+K tabs of one room reload every `period` seconds, offset by period/K (refresh_tab_staggered, as in
+run_automation with tabs_per_room = K), and the scan loop snapshots them after every reload
+(snapshot_pages / wait_for_next_scan). A closed shift is opened at a random moment and the time until
+a snapshot shows it bookable is recorded; p50 / p99 are printed per K.
+
+    python benchmarks/bench_multitab.py --tabs 1,2,4,8 --trials 30 --period 2
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import bot
+from playwright.async_api import async_playwright
+from stub_site import StubSite
+
+DAY = "2025-12-01 الاثنين"
+SHIFT_ID = 101
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+async def measure(browser, tab_count, trials, period, interval):
+    """Latencies (seconds) from opening the shift on the server to a snapshot showing it bookable."""
+    site = StubSite({DAY: [{"id": SHIFT_ID, "name": "Morning", "spots": 0}, {"id": 102, "name": "Night", "spots": 2, "open": True}]})
+    async with site:
+        context = await browser.new_context()
+        await context.add_cookies([{"name": "sessionid", "value": site.new_session(), "url": site.url}])
+        tabs = []
+        for _ in range(tab_count):
+            tab = await context.new_page()
+            await tab.goto(f"{site.url}/rooms/{site.room}/", wait_until="domcontentloaded")
+            tabs.append(tab)
+        fresh_at = {}; wake_event = asyncio.Event()
+        refreshers = [asyncio.ensure_future(bot.refresh_tab_staggered(tab, j * period / tab_count, period, fresh_at, wake_event))
+                      for j, tab in enumerate(tabs)]
+        latencies = []
+        try:
+            for _ in range(trials):
+                await asyncio.sleep(random.uniform(0, period))
+                site.set_shift(SHIFT_ID, open=True, spots=1)
+                opened = time.monotonic()
+                while True:
+                    await bot.wait_for_next_scan(wake_event, interval)
+                    wake_event.clear()
+                    slot = (await bot.snapshot_pages(tabs, fresh_at)).get((DAY, "Morning"))
+                    if slot is not None and slot["bookable"]: break
+                latencies.append(time.monotonic() - opened)
+                site.set_shift(SHIFT_ID, open=False, spots=0)
+                await asyncio.sleep(period)  # every tab reloads once and shows it closed again
+        finally:
+            for refresher in refreshers: refresher.cancel()
+            await context.close()
+        return latencies
+
+async def main(args):
+    tab_counts = [int(k) for k in args.tabs.split(",")]
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(executable_path=args.chromium, args=["--no-sandbox"] if args.chromium else None)
+        try:
+            print(f"period {args.period}s, scan heartbeat {args.interval}s, {args.trials} openings per row")
+            print(f"{'tabs':>5} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+            for tab_count in tab_counts:
+                latencies = await measure(browser, tab_count, args.trials, args.period, args.interval)
+                print(f"{tab_count:>5} {percentile(latencies, 50) * 1000:>9.0f} {percentile(latencies, 99) * 1000:>9.0f} {max(latencies) * 1000:>9.0f}")
+        finally:
+            await browser.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", default="1,2,4,8", help="comma-separated tab counts (default 1,2,4,8)")
+    parser.add_argument("--trials", type=int, default=30, help="openings measured per tab count (default 30)")
+    parser.add_argument("--period", type=float, default=2.0, help="reload period of each tab, like tab_refresh_seconds (default 2)")
+    parser.add_argument("--interval", type=float, default=0.5, help="scan heartbeat when no tab reloads (default 0.5)")
+    parser.add_argument("--chromium", help="path to a Chromium executable (default: Playwright's own)")
+    asyncio.run(main(parser.parse_args()))
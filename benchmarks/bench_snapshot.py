@@ -0,0 +1,100 @@
+"""Scan-cycle time of the single-snapshot scanner on a static room page: snapshot_room (one
+page.evaluate round trip) followed by match_targets, with 1, 20 and 100 targets.
+
+The page is a month of day cards in the room markup (three shifts a day), loaded once with
+page.set_content, so the numbers are the scanner's own cost without the network.
+
+    python benchmarks/bench_snapshot.py --targets 1,20,100 --cycles 200
+    python benchmarks/bench_snapshot.py --fixture   # the recorded tests/fixtures/room_page.html instead
+"""
+import argparse
+import asyncio
+import datetime
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import bot
+from playwright.async_api import async_playwright
+from stub_site import StubSite, read_fixture
+
+FIRST_DAY = datetime.date(2025, 12, 1)
+ARABIC_WEEKDAYS = ["الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت", "الأحد"]
+SHIFT_NAMES = ["Morning", "Evening", "Night"]
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def month_page(day_count):
+    """Room HTML with `day_count` day cards from FIRST_DAY on; every third shift is open."""
+    days = {}
+    for i in range(day_count):
+        day = FIRST_DAY + datetime.timedelta(days=i)
+        days[f"{day.isoformat()} {ARABIC_WEEKDAYS[day.weekday()]}"] = [
+            {"id": 3 * i + j, "name": name, "spots": (i + j) % 3, "open": (i + j) % 3 == 0 and (i + j) % 2 == 0}
+            for j, name in enumerate(SHIFT_NAMES)]
+    return StubSite(days).render_room("benchmarkCsrfToken")
+
+def make_targets(count, day_count):
+    """`count` targets cycling through the kinds the target list supports: an exact shift, a date range,
+    a range limited to weekdays, and a regex name."""
+    targets = []
+    for i in range(count):
+        day = FIRST_DAY + datetime.timedelta(days=i % day_count)
+        last = FIRST_DAY + datetime.timedelta(days=min(day_count - 1, i % day_count + 6))
+        name = SHIFT_NAMES[i % len(SHIFT_NAMES)]
+        kind = i % 4
+        if kind == 0: targets.append({"date": day.isoformat(), "name": name})
+        elif kind == 1: targets.append({"date": f"{day.isoformat()}..{last.isoformat()}", "name": name})
+        elif kind == 2: targets.append({"date": f"{day.isoformat()}..{last.isoformat()}", "name": name, "weekdays": "Fri, Sat"})
+        else: targets.append({"date": day.isoformat(), "name": "re:^(morning|night)$"})
+    return targets
+
+async def time_cycles(page, patterns, cycles):
+    """Per-cycle (snapshot, match) durations in seconds."""
+    timings = []
+    for _ in range(cycles):
+        started = time.perf_counter()
+        index = await bot.snapshot_room(page)
+        snapped = time.perf_counter()
+        bot.match_targets(index, patterns)
+        timings.append((snapped - started, time.perf_counter() - snapped))
+    return timings, len(index)
+
+async def main(args):
+    html = read_fixture("room_page.html") if args.fixture else month_page(args.days)
+    day_count = 2 if args.fixture else args.days
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(executable_path=args.chromium, args=["--no-sandbox"] if args.chromium else None)
+        try:
+            page = await browser.new_page()
+            await page.set_content(html)
+            await time_cycles(page, [], 10)  # warm up
+            rows = []
+            for count in (int(n) for n in args.targets.split(",")):
+                timings, slot_count = await time_cycles(page, bot.compile_targets(make_targets(count, day_count)), args.cycles)
+                rows.append((count, timings))
+            print(f"{slot_count} shifts on the page, {args.cycles} cycles per row (ms)")
+            print(f"{'targets':>8} {'snapshot p50':>13} {'p99':>7} {'match p50':>10} {'p99':>7} {'cycle p50':>10} {'p99':>7}")
+            for count, timings in rows:
+                snapshots = [s for s, _ in timings]; matches = [m for _, m in timings]; cycles = [s + m for s, m in timings]
+                print(f"{count:>8} {percentile(snapshots, 50) * 1000:>13.2f} {percentile(snapshots, 99) * 1000:>7.2f}"
+                      f" {percentile(matches, 50) * 1000:>10.3f} {percentile(matches, 99) * 1000:>7.3f}"
+                      f" {percentile(cycles, 50) * 1000:>10.2f} {percentile(cycles, 99) * 1000:>7.2f}")
+        finally:
+            await browser.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default="1,20,100", help="comma-separated target counts (default 1,20,100)")
+    parser.add_argument("--cycles", type=int, default=200, help="scan cycles timed per target count (default 200)")
+    parser.add_argument("--days", type=int, default=31, help="day cards on the generated page (default 31)")
+    parser.add_argument("--fixture", action="store_true", help="time the recorded room page instead of a generated month")
+    parser.add_argument("--chromium", help="path to a Chromium executable (default: Playwright's own)")
+    asyncio.run(main(parser.parse_args()))
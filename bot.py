@@ -1,13 +1,16 @@
 import asyncio
 import configparser
+import contextlib
 import json
 import os
 import threading
+import time
+import weakref
 import queue
 import sys
 import multiprocessing
-import winsound  # For sound notifications
-from playwright.async_api import async_playwright
+from html.parser import HTMLParser
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import customtkinter as ctk
 from tkinter import messagebox
 
@@ -25,6 +28,7 @@ if os.path.exists(local_browsers_path):
     os.environ['PLAYWRIGHT_BROWSERS_PATH'] = local_browsers_path
 
 ACCOUNTS_FILE = os.path.join(get_base_path(), "accounts.json")
+BOOKING_HISTORY_FILE = os.path.join(get_base_path(), "booking_history.jsonl")
 
 # ==============================================================================
 # --- ⚙️ SETUP AND CONFIGURATION ---
@@ -69,46 +73,1409 @@ def load_or_create_config(app_instance):
 # ==============================================================================
 # --- 🤖 CORE BOT LOGIC (Playwright Automation) ---
 # ==============================================================================
-def get_shifts_url(room_number, shifts_to_book):
-    """Generate the correct Wardyati URL based on shift dates"""
+LOGIN_URL = "https://wardyati.com/login/"
+USERNAME_SELECTOR = "#id_username"
+PASSWORD_SELECTOR = "#id_password"
+LOGIN_BUTTON_TEXT = "تسجيل الدخول"
+SESSIONS_DIR = os.path.join(get_base_path(), "sessions")
+
+# ------------------------------------------------------------------------------
+# Run events: what a run did, as data. Engines put them on the log queue next to plain lines;
+# the GUI publishes them on its EventBus and renders the Live Log text from them.
+# ------------------------------------------------------------------------------
+EVENT_LOGIN_OK = "login_ok"
+EVENT_SCAN_CYCLE = "scan_cycle"
+EVENT_TARGET_FULL = "target_full"
+EVENT_BOOKING_CLICKED = "booking_clicked"
+EVENT_BOOKING_CONFIRMED = "booking_confirmed"
+EVENT_RUN_FINISHED = "run_finished"
+EVENT_RUN_STOPPED = "run_stopped"
+EVENT_RUN_FAILED = "run_failed"
+
+def _confirmed_text(d):
+    where = f": {d['date']} | {d['name']}" if d.get("date") else ""
+    return f"🎫 Booking confirmed{where} ({d['detail']}" + (f", {d['confirm_ms']:.0f} ms)" if d.get("confirm_ms") is not None else ")")
+
+def _clicked_text(d):
+    if d["how"] == "in-page": return f"🎉 Clicked the 'Book' button in-page ({d['latency_ms']:.2f} ms after detection)"
+    return "🎉 Sending the 'Book' request NOW!" if d["how"] == "request" else "🎉 Clicking the 'Book' button NOW!"
+
+EVENT_TEXT = {
+    EVENT_LOGIN_OK: lambda d: "♻️ Saved session is valid. Skipping login." if d.get("restored") else "✅ Login successful!",
+    EVENT_SCAN_CYCLE: lambda d: f"Scanning for {d['targets']} target shifts...",
+    EVENT_TARGET_FULL: lambda d: f"❌ {'OVER' if d.get('over') else 'FULL'}: {d['date']} | {d['name']}. Removing from targets.",
+    EVENT_BOOKING_CLICKED: _clicked_text,
+    EVENT_BOOKING_CONFIRMED: _confirmed_text,
+    EVENT_RUN_FINISHED: lambda d: "\n🎉 All target shifts processed!\n--- BOT FINISHED ---",
+    EVENT_RUN_STOPPED: lambda d: "\n🛑 Bot stopped by user." if d.get("by_user", True) else "🛑 Bot stopped",
+    EVENT_RUN_FAILED: lambda d: f"❌ FATAL ERROR: {d['error']}" + (f"\n{d['hint']}" if d.get("hint") else ""),
+}
+
+class RunEvent:
+    """One event of an account run: `kind` (EVENT_*), the account `label`, a monotonic timestamp `at`
+    and kind-specific fields in `data`. str() renders the log line."""
+    __slots__ = ("kind", "label", "at", "data")
+    def __init__(self, kind, label="", **data):
+        self.kind = kind; self.label = label; self.at = time.monotonic(); self.data = data
+
+    def text(self): return EVENT_TEXT[self.kind](self.data)
+
+    def __str__(self): return (f"[{self.label}] " if self.label else "") + self.text()
+
+def run_logger(log_queue, account_label):
+    """The log() of a run: plain strings get the account prefix, RunEvents get the account label."""
+    prefix = f"[{account_label}] " if account_label else ""
+    def log(message):
+        if isinstance(message, RunEvent):
+            message.label = account_label; log_queue.put(message)
+        else: log_queue.put(f"{prefix}{message}")
+    return log
+
+def session_state_path(username, suffix=".json"):
+    """Per-account file for saved login state (file name is a hash, not the email)."""
+    import hashlib
+    return os.path.join(SESSIONS_DIR, hashlib.sha1(username.strip().lower().encode("utf-8")).hexdigest()[:16] + suffix)
+
+async def browser_login(page, username, password, log):
+    """Fill and submit the login form, then save the context's storage_state for the next run."""
+    log("--- Step 1: Logging in ---")
+    await page.goto(LOGIN_URL)
+    await page.locator(USERNAME_SELECTOR).fill(username)
+    await page.locator(PASSWORD_SELECTOR).fill(password)
+    log("🔐 Clicking login...")
+    async with page.expect_navigation(url="**/rooms/**", timeout=15000):
+        await page.get_by_role("button", name=LOGIN_BUTTON_TEXT).click()
+    log(RunEvent(EVENT_LOGIN_OK))
+    try:
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        await page.context.storage_state(path=session_state_path(username))
+    except Exception:
+        log("⚠️ WARNING: Unable to save the login session; next run will log in again.")
+
+async def open_logged_in_page(browser, shifts_url, username, password, log):
+    """Open a context on the shifts page, reusing the saved session when it is still valid.
+    Loading the shifts page doubles as the validity probe: an expired session redirects to /login/."""
+    state_path = session_state_path(username)
+    saved = os.path.exists(state_path)
+    context = None
+    if saved:
+        try:
+            context = await browser.new_context(storage_state=state_path)
+            page = await context.new_page()
+            await page.goto(shifts_url)
+            if "/login/" not in page.url:
+                log(RunEvent(EVENT_LOGIN_OK, restored=True))
+                log(f"🔗 URL: {shifts_url}")
+                await page.wait_for_load_state("domcontentloaded")
+                return context, page
+            log("⌛ Saved session expired. Logging in again...")
+        except Exception:
+            log("⚠️ Saved session could not be used. Logging in again...")
+        if context is not None: await context.close()
+        try: os.remove(state_path)
+        except OSError: pass
+    context = await browser.new_context()
+    page = await context.new_page()
+    await browser_login(page, username, password, log)
+    log("--- Step 2: Navigating to shifts page ---")
+    log(f"🔗 URL: {shifts_url}")
+    await page.goto(shifts_url)
+    await page.wait_for_load_state("domcontentloaded")
+    return context, page
+
+def parse_shift_date(text):
+    """datetime.date of the first YYYY-MM-DD in a text (headings may carry the Arabic weekday,
+    e.g., "2025-10-02 الخميس"), or None."""
+    import datetime, re
+    date_match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', text)
+    if not date_match: return None
+    try: return datetime.date(int(date_match.group(1)), int(date_match.group(2)), int(date_match.group(3)))
+    except ValueError: return None
+
+def target_months(shift):
+    """(year, month) keys a target's date or date range covers; empty if the date has no YYYY-MM-DD part."""
+    first_text, _, last_text = shift["date"].partition("..")
+    first_day = parse_shift_date(first_text); last_day = parse_shift_date(last_text) if last_text else first_day
+    if first_day is None: return []
+    if last_day is None or last_day < first_day: last_day = first_day
+    months = []; year, month = first_day.year, first_day.month
+    while (year, month) <= (last_day.year, last_day.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def get_month_url(room_number, year, month):
+    """Shifts page URL for one month of a room (the plain room URL shows the current month)."""
     import datetime
-    import re
-
-    current_month = datetime.datetime.now().month
-    current_year = datetime.datetime.now().year
-
-    # Check if any shifts are in a different month
-    need_month_params = False
-    target_year = current_year
-    target_month = current_month
-
-    for shift in shifts_to_book:
-        date_str = shift["date"]
-        # Try to extract date from Arabic date format (e.g., "2025-10-02 الخميس")
-        date_match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', date_str)
-        if date_match:
-            year = int(date_match.group(1))
-            month = int(date_match.group(2))
-
-            if month != current_month or year != current_year:
-                need_month_params = True
-                target_year = year
-                target_month = month
-                break
-
+    now = datetime.datetime.now()
     base_url = f"https://wardyati.com/rooms/{room_number}/"
+    if (year, month) == (now.year, now.month): return base_url
+    return f"{base_url}?view=monthly&year={year}&month={month}"
 
-    if need_month_params:
-        return f"{base_url}?view=monthly&year={target_year}&month={target_month}"
-    else:
-        return base_url
-
-async def run_automation(config, shifts_to_book, room_number, cooldown, log_queue, stop_event=None, credentials=None, account_label=""):
-    prefix = f"[{account_label}] " if account_label else ""
-    def log(message): log_queue.put(f"{prefix}{message}")
+def group_targets_by_month(room_number, shifts_to_book):
+    """Group targets by (year, month) in priority order of first appearance.
+    Returns [(month key, url)]; targets without a parseable date go with the first group."""
+    import datetime
+    groups = []
+    for shift in shifts_to_book:
+        for key in target_months(shift):
+            if key not in groups: groups.append(key)
+    if not groups:
+        now = datetime.datetime.now(); groups.append((now.year, now.month))
+    return [(key, get_month_url(room_number, *key)) for key in groups]
+
+def targets_for_month(shifts_to_book, month_key, groups):
+    """Targets that live on a month group's page (undated targets belong to the first group)."""
+    first_key = groups[0][0]
+    return [s for s in shifts_to_book if month_key in (target_months(s) or [first_key])]
+
+# A 'Book' button as RoomPageParser describes it ({attrs, form}), so hold_request_for can work out the
+# request it sends in the browser engines too (form fields are left out: only method and URL are needed).
+BUTTON_SPEC_JS = """(btn) => {
+        const attrs = {};
+        for (const a of btn.attributes) attrs[a.name] = a.value;
+        const form = btn.closest('form');
+        return {attrs, form: form ? {action: form.getAttribute('action') ?? '', method: (form.getAttribute('method') || 'get').toUpperCase(), fields: {}} : null};
+    }"""
+
+# One page.evaluate round trip that reads every day card / shift instance on the page.
+# Each row: [date heading, shift title, data-number or null, button bookable, card index, shift index, button spec or null]
+ROOM_SNAPSHOT_JS = """
+() => {
+    const clean = (el) => el ? el.textContent.replace(/\\s+/g, ' ').trim() : '';
+    const buttonSpec = __BUTTON_SPEC__;
+    const rows = [];
+    document.querySelectorAll('div.arena-day-card').forEach((card, ci) => {
+        const date = clean(card.querySelector('h5'));
+        card.querySelectorAll('div.arena_shift_instance').forEach((inst, si) => {
+            const spots = inst.querySelector('span.number-container');
+            const btn = inst.querySelector('button.button_hold');
+            const bookable = !!btn && btn.getClientRects().length > 0 && !btn.disabled && btn.getAttribute('aria-disabled') !== 'true';
+            rows.push([date, clean(inst.querySelector('div.text-start')), spots ? spots.getAttribute('data-number') : null, bookable, ci, si, btn ? buttonSpec(btn) : null]);
+        });
+    });
+    return rows;
+}
+""".replace("__BUTTON_SPEC__", BUTTON_SPEC_JS)
+
+def build_room_index(rows):
+    """Turn snapshot rows into {(date, shift name): slot}, keeping page order and the first duplicate."""
+    index = {}
+    for date, name, spots, bookable, card, slot, *extra in rows:
+        try: spots = int(spots) if spots is not None else None
+        except ValueError: spots = None
+        index.setdefault((date, name), {"date": date, "name": name, "spots": spots, "bookable": bookable, "card": card, "slot": slot,
+                                        "request": extra[0] if extra else None})
+    return index
+
+async def snapshot_room(page):
+    """Read the whole room in one round trip. Returns {(date, shift name): slot} in page order."""
+    return build_room_index(await page.evaluate(ROOM_SNAPSHOT_JS))
+
+# ------------------------------------------------------------------------------
+# Target patterns: a target is {"date", "name"} plus optional "weekdays" and "weight".
+#   date: "2025-12-01" or a range "2025-12-01..2025-12-15"
+#   name: exact shift title (case-insensitive) or "re:<regex>"
+# ------------------------------------------------------------------------------
+WEEKDAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+MAX_PATTERN_DAYS = 400
+
+def normalize_shift_text(text):
+    return " ".join(text.split()).casefold()
+
+def parse_weekdays(value):
+    """"Fri, Sat" (or a list of names / numbers, Monday = 0) -> frozenset of weekday numbers; empty -> None (any day)."""
+    if not value: return None
+    items = value.replace(";", ",").split(",") if isinstance(value, str) else value
+    days = set()
+    for item in items:
+        if isinstance(item, int) and 0 <= item <= 6: days.add(item); continue
+        prefix = str(item).strip().lower()[:3]
+        if not prefix: continue
+        if prefix not in WEEKDAY_NAMES: raise ValueError(f"Unknown weekday '{str(item).strip()}' (use Mon, Tue, ... Sun)")
+        days.add(WEEKDAY_NAMES.index(prefix))
+    return frozenset(days) or None
+
+def describe_target(shift):
+    """One-line text of a target for the list and the log."""
+    text = f"{shift['date']} | {shift['name']}"
+    if shift.get("weekdays"): text += f" | {shift['weekdays']}"
+    if shift.get("weight"): text += f" | weight {shift['weight']}"
+    return text
+
+class TargetPattern:
+    """A target compiled once at Start. Dates compare as calendar days, names exactly (case-insensitive)
+    unless given as "re:<regex>". A date without YYYY-MM-DD falls back to a substring of the card heading."""
+    def __init__(self, shift, order):
+        import re
+        self.shift = shift; self.order = order
+        try: self.weight = float(shift.get("weight") or 0)
+        except (TypeError, ValueError): raise ValueError(f"Weight must be a number: {describe_target(shift)}")
+        date_text = shift["date"].strip()
+        first_text, is_range, last_text = date_text.partition("..")
+        self.first_day = parse_shift_date(first_text); self.last_day = parse_shift_date(last_text) if is_range else self.first_day
+        self.date_query = None
+        if is_range and (self.first_day is None or self.last_day is None or self.last_day < self.first_day):
+            raise ValueError(f"Invalid date range '{date_text}' (use YYYY-MM-DD..YYYY-MM-DD)")
+        if self.first_day is None: self.date_query = date_text.lower()
+        elif (self.last_day - self.first_day).days >= MAX_PATTERN_DAYS:
+            raise ValueError(f"Date range '{date_text}' is longer than {MAX_PATTERN_DAYS} days")
+        self.weekdays = parse_weekdays(shift.get("weekdays"))
+        name_text = shift["name"].strip()
+        self.name_regex = None; self.name_exact = None
+        if name_text.lower().startswith("re:"):
+            try: self.name_regex = re.compile(name_text[3:].strip(), re.IGNORECASE)
+            except re.error as e: raise ValueError(f"Invalid shift name pattern '{name_text}': {e}")
+        else: self.name_exact = normalize_shift_text(name_text)
+        # An exact target names one shift: if it is full, it will not come back
+        self.exact = self.date_query is None and self.first_day == self.last_day and self.weekdays is None and self.name_regex is None
+
+    def matches_date(self, day, heading_lower):
+        if self.date_query is not None: return self.date_query in heading_lower
+        return (day is not None and self.first_day <= day <= self.last_day
+                and (self.weekdays is None or day.weekday() in self.weekdays))
+
+    def matches_name(self, name):
+        if self.name_regex is not None: return self.name_regex.search(name) is not None
+        return normalize_shift_text(name) == self.name_exact
+
+    def days(self):
+        """Calendar days the pattern can match (None for a free-text date)."""
+        import datetime
+        if self.date_query is not None: return None
+        span = (self.last_day - self.first_day).days
+        days = (self.first_day + datetime.timedelta(days=i) for i in range(span + 1))
+        return [day for day in days if self.weekdays is None or day.weekday() in self.weekdays]
+
+def make_target(date_text, name_text, weekdays_text="", weight_text=""):
+    """Build a target from the entry fields (optional keys only when filled in); raises ValueError if it does not compile."""
+    shift = {"date": date_text, "name": name_text}
+    if weekdays_text: shift["weekdays"] = weekdays_text
+    if weight_text:
+        try: weight = float(weight_text)
+        except ValueError: raise ValueError("Weight must be a number")
+        shift["weight"] = int(weight) if weight.is_integer() else weight
+    TargetPattern(shift, 0)
+    return shift
+
+def compile_targets(shifts_to_book):
+    """Compile every target once; raises ValueError naming the first invalid target."""
+    return [TargetPattern(shift, order) for order, shift in enumerate(shifts_to_book)]
+
+def match_targets(index, patterns):
+    """One pass over a room snapshot: every (pattern, slot) match, ranked by weight (highest first),
+    then target list order, then page order."""
+    candidates = []
+    for position, slot in enumerate(index.values()):
+        day = parse_shift_date(slot["date"]); heading_lower = slot["date"].lower()
+        for pattern in patterns:
+            if pattern.matches_date(day, heading_lower) and pattern.matches_name(slot["name"]):
+                candidates.append((-pattern.weight, pattern.order, position, pattern, slot))
+    candidates.sort(key=lambda c: c[:3])
+    return [(pattern, slot) for *_, pattern, slot in candidates]
+
+def exhausted_patterns(index, patterns, today=None):
+    """Date-range / weekday / regex patterns that can no longer book anything, as [(pattern, over)]:
+    every day they cover is past (over=True), or every coming day is on the loaded pages and every
+    shift matching them there shows 0 spots. Exact targets leave on their own when full; free-text
+    dates never qualify, since there is no telling which days they cover."""
+    import datetime
+    today = today or datetime.date.today()
+    shown = {}  # day -> slots on the loaded pages
+    for slot in index.values():
+        day = parse_shift_date(slot["date"])
+        if day is not None and day >= today: shown.setdefault(day, []).append(slot)
+    exhausted = []
+    for pattern in patterns:
+        if pattern.exact or pattern.date_query is not None: continue
+        coming = [day for day in pattern.days() if day >= today]
+        if not coming:
+            exhausted.append((pattern, True)); continue
+        if any(day not in shown for day in coming): continue
+        matching = [slot for day in coming for slot in shown[day] if pattern.matches_name(slot["name"])]
+        if matching and all(slot["spots"] == 0 for slot in matching): exhausted.append((pattern, False))
+    return exhausted
+
+def drop_exhausted_targets(index, patterns, shifts_to_book, coordinator, log):
+    """Remove targets exhausted_patterns() gives up on, for every account."""
+    for pattern, over in exhausted_patterns(index, live_patterns(patterns, shifts_to_book)):
+        shifts_to_book.remove(pattern.shift)
+        if coordinator is not None: coordinator.mark_done(pattern.shift)
+        log(RunEvent(EVENT_TARGET_FULL, date=pattern.shift["date"], name=pattern.shift["name"], over=over))
+
+def live_patterns(patterns, shifts_to_book):
+    """Patterns whose target is still waiting to be booked."""
+    live = {id(shift) for shift in shifts_to_book}
+    return [pattern for pattern in patterns if id(pattern.shift) in live]
+
+# ------------------------------------------------------------------------------
+# Booking order policies: when several targets are open in the same scan, which one
+# gets the click before the cooldown. Weights stay hard priority bands; a policy only
+# reorders candidates inside a band.
+# ------------------------------------------------------------------------------
+class ListOrderPolicy:
+    """Book in target list order (after weights)."""
+    name = "list_order"
+    def observe(self, index, now): pass
+    def order(self, candidates, now): return candidates
+    def describe(self, slot, now): return ""
+
+class ScarcityPolicy:
+    """Book the open shift most likely to vanish first: the fewest seconds left at the rate its
+    remaining-spots counter (data-number) has been dropping over the last `window` seconds,
+    then the fewest spots left."""
+    name = "scarcity"
+    def __init__(self, window_seconds=30.0):
+        import collections
+        self.window = window_seconds
+        self.history = collections.defaultdict(collections.deque)  # (date, name) -> deque of (time, spots) at each change
+
+    def observe(self, index, now):
+        for key, slot in index.items():
+            if slot["spots"] is None: continue
+            changes = self.history[key]
+            if not changes or changes[-1][1] != slot["spots"]: changes.append((now, slot["spots"]))
+            # Keep the last change before the window as its starting value
+            while len(changes) > 1 and changes[1][0] <= now - self.window: changes.popleft()
+
+    def drop_rate(self, slot, now):
+        """Spots lost per second over the window (0 if not dropping)."""
+        changes = self.history.get((slot["date"], slot["name"]))
+        if not changes or len(changes) < 2: return 0.0
+        elapsed = min(now - changes[0][0], self.window)
+        return max(0.0, (changes[0][1] - changes[-1][1]) / elapsed) if elapsed > 0 else 0.0
+
+    def seconds_left(self, slot, now):
+        if slot["spots"] is None: return float("inf")
+        rate = self.drop_rate(slot, now)
+        return slot["spots"] / rate if rate > 0 else float("inf")
+
+    def order(self, candidates, now):
+        # Stable: ties keep list order, then page order
+        return sorted(candidates, key=lambda c: (-c[0].weight, self.seconds_left(c[1], now),
+                                                  c[1]["spots"] if c[1]["spots"] is not None else float("inf")))
+
+    def describe(self, slot, now):
+        if slot["spots"] is None: return ""
+        rate = self.drop_rate(slot, now)
+        return f" [{slot['spots']} left" + (f", dropping {rate * 60:.1f}/min]" if rate > 0 else "]")
+
+BOOKING_POLICIES = {ListOrderPolicy.name: ListOrderPolicy, ScarcityPolicy.name: ScarcityPolicy}
+
+def make_booking_policy(config):
+    """The policy named by `booking_policy` in config.ini (list_order by default)."""
+    name = config.get('Settings', 'booking_policy', fallback=ListOrderPolicy.name).strip().lower()
+    if name not in BOOKING_POLICIES: raise ValueError(f"Unknown booking_policy '{name}' (use {', '.join(BOOKING_POLICIES)})")
+    if name == ScarcityPolicy.name: return ScarcityPolicy(config.getfloat('Settings', 'scarcity_window_seconds', fallback=30.0))
+    return BOOKING_POLICIES[name]()
+
+async def snapshot_pages(pages, fresh_at=None, failures=None):
+    """Snapshot several room pages concurrently and merge them into one index; each slot remembers its page.
+    When several tabs show the same shift, the most recently reloaded tab (per `fresh_at`) wins.
+    Pages that could not be read (or sit on the login page) are appended to `failures` as (page, error)."""
+    merged = {}
+    if fresh_at: pages = sorted(pages, key=lambda page: fresh_at.get(page, 0.0), reverse=True)
+    results = await asyncio.gather(*(snapshot_room(page) for page in pages), return_exceptions=True)
+    for page, index in zip(pages, results):
+        if not isinstance(index, Exception) and "/login/" in page.url: index = RuntimeError("Session expired (redirected to login).")
+        if isinstance(index, Exception):
+            if failures is not None: failures.append((page, index))
+            continue
+        for key, slot in index.items():
+            slot["page"] = page
+            merged.setdefault(key, slot)
+    return merged
+
+async def refresh_tab_staggered(tab, offset, period, fresh_at, wake_event=None):
+    """Reload one tab every `period` seconds after an initial `offset`. K tabs offset by period/K
+    keep some tab's view of the room at most period/K seconds old."""
+    await asyncio.sleep(offset)
+    while True:
+        started = time.monotonic()
+        try:
+            await tab.reload(wait_until="domcontentloaded")
+            fresh_at[tab] = time.monotonic()
+            if wake_event is not None: wake_event.set()
+        except Exception: pass
+        await asyncio.sleep(max(0.0, period - (time.monotonic() - started)))
+
+def schedule_digest(index):
+    """Content hash of what matters in a room index (shift, spots, bookable), ignoring tokens and markup."""
+    import hashlib
+    rows = [(key, slot["spots"], slot["bookable"]) for key, slot in sorted(index.items(), key=lambda item: item[0])]
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+class ConditionalRefresher:
+    """Keeps room pages current without blind reloads: fetches the page in the background through
+    page.request (with If-None-Match / If-Modified-Since), hashes the schedule it contains and reloads
+    the visible page only when the server's schedule changed and the page does not already show it."""
+    def __init__(self):
+        self.state = {}  # page -> {"etag", "last_modified", "size", "digest"}
+        self.checks = 0; self.not_modified = 0; self.unchanged = 0; self.reloads = 0; self.bytes_saved = 0
+
+    async def check(self, page, url):
+        """One conditional fetch; returns True if the page was reloaded."""
+        state = self.state.setdefault(page, {"etag": None, "last_modified": None, "size": 0, "digest": None})
+        headers = {}
+        if state["etag"]: headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]: headers["If-Modified-Since"] = state["last_modified"]
+        self.checks += 1
+        response = await page.request.get(url, headers=headers)
+        if response.status == 304:
+            self.not_modified += 1; self.bytes_saved += state["size"]
+            return False
+        if response.status >= 400 or "/login/" in response.url: return False
+        body = await response.body()
+        state["etag"] = response.headers.get("etag"); state["last_modified"] = response.headers.get("last-modified")
+        state["size"] = len(body)
+        digest = schedule_digest(parse_room_html(body.decode("utf-8", "replace"))[0])
+        if digest == state["digest"]:
+            self.unchanged += 1
+            return False
+        state["digest"] = digest
+        # The page may already show it (htmx swaps, live updates): compare with the DOM before reloading
+        if schedule_digest(await snapshot_room(page)) == digest:
+            self.unchanged += 1
+            return False
+        await page.reload(wait_until="domcontentloaded")
+        self.reloads += 1
+        return True
+
+    async def run(self, page, url, period, wake_event=None):
+        """Check one page every `period` seconds for as long as the scan runs."""
+        while True:
+            started = time.monotonic()
+            try:
+                if await self.check(page, url) and wake_event is not None: wake_event.set()
+            except Exception: pass
+            await asyncio.sleep(max(0.0, period - (time.monotonic() - started)))
+
+    def summary(self):
+        return (f"checks {self.checks} | not modified {self.not_modified} | unchanged {self.unchanged} | "
+                f"reloads {self.reloads} | bytes saved {self.bytes_saved / 1024:.1f} KB")
+
+async def click_slot(page, slot, timeout=None):
+    """Click the 'Book' button of a slot located by a snapshot. Playwright waits (up to `timeout` seconds)
+    for the button to become clickable, so a slot a push frame opened is clicked as soon as the DOM catches up."""
+    shift_container = page.locator("div.arena-day-card").nth(slot["card"]).locator("div.arena_shift_instance").nth(slot["slot"])
+    await shift_container.locator("button.button_hold").click(**({"timeout": timeout * 1000} if timeout is not None else {}))
+
+# Booking confirmation: tie each click to the response of the hold request it sends
+BOOKING_CONFIRMED, BOOKING_REJECTED, BOOKING_UNKNOWN = "confirmed", "rejected", "unknown"
+
+def may_be_hold_response(response):
+    """Cheap filter for responses worth keeping around: non-GET requests and htmx GETs (page reloads are plain GETs)."""
+    request = response.request
+    return request.method != "GET" or bool(request.headers.get("hx-request"))
+
+def hold_response_matcher(button, page_url):
+    """Predicate for the response to the request one 'Book' button sends (same method and URL as
+    hold_request_for works out), so htmx polling or other fetches can't pass for it. None if the
+    button's request can't be worked out."""
+    from urllib.parse import urlsplit
+    spec = hold_request_for(button, page_url) if button else None
+    if spec is None: return None
+    method, url, _, headers = spec
+    wanted = urlsplit(url)
+    def matches(response):
+        request = response.request
+        if request.method != method: return False
+        if method == "GET" and headers.get("HX-Request") and not request.headers.get("hx-request"): return False
+        sent = urlsplit(request.url)
+        # A GET carries its data in the query string, so only the path has to match
+        return ((sent.netloc, sent.path.rstrip("/")) == (wanted.netloc, wanted.path.rstrip("/"))
+                and (method == "GET" or sent.query == wanted.query))
+    return matches
+
+def booking_outcome(status, location=""):
+    """(outcome, detail) for the server's answer to a hold request."""
+    if "/login/" in location: return BOOKING_REJECTED, "session expired"
+    if status >= 400: return BOOKING_REJECTED, f"HTTP {status}"
+    return BOOKING_CONFIRMED, f"HTTP {status}"
+
+async def click_and_confirm(page, slot, timeout_seconds):
+    """Click a slot's 'Book' button and wait for the response to the request it triggers.
+    Returns (outcome, click-to-response ms or None, detail)."""
+    matches = hold_response_matcher(slot.get("request"), page.url)
+    if matches is None:
+        # Nothing to tie a response to: the next snapshot settles it
+        await click_slot(page, slot, timeout_seconds)
+        return BOOKING_UNKNOWN, None, "booking request not recognised"
+    clicked = False
+    started = time.perf_counter()
+    try:
+        async with page.expect_response(matches, timeout=timeout_seconds * 1000) as response_info:
+            await click_slot(page, slot, timeout_seconds); clicked = True
+        response = await response_info.value
+    except PlaywrightTimeoutError:
+        if not clicked: raise
+        return BOOKING_UNKNOWN, None, f"no response within {timeout_seconds}s"
+    location = response.headers.get("location") or response.headers.get("hx-redirect") or response.url
+    outcome, detail = booking_outcome(response.status, location)
+    return outcome, (time.perf_counter() - started) * 1000, detail
+
+def resolve_pending_bookings(pending, room_index):
+    """Settle unconfirmed clicks ({target id: (target, slot key)}) against a fresh snapshot: a slot that is
+    no longer bookable counts as booked, anything else goes back in the queue. Returns (confirmed, requeued)."""
+    confirmed, requeued = [], []
+    for target_id, (target_shift, slot_key) in list(pending.items()):
+        slot = room_index.get(slot_key)
+        (confirmed if slot is not None and not slot["bookable"] else requeued).append((target_shift, slot_key))
+        del pending[target_id]
+    return confirmed, requeued
+
+def latency_summary(samples_ms):
+    import statistics
+    return f"n={len(samples_ms)} | median {statistics.median(samples_ms):.2f} ms | max {max(samples_ms):.2f} ms"
+
+class BookingConfirmStats:
+    """Outcome counts and click-to-response latencies of one run's booking clicks."""
+    def __init__(self):
+        self.counts = {BOOKING_CONFIRMED: 0, BOOKING_REJECTED: 0, BOOKING_UNKNOWN: 0}
+        self.latencies_ms = []
+
+    def record(self, outcome, latency_ms=None):
+        self.counts[outcome] += 1
+        if latency_ms is not None: self.latencies_ms.append(latency_ms)
+
+    def log_summary(self, log):
+        if not any(self.counts.values()): return
+        log("📊 Booking clicks: " + " | ".join(f"{outcome} {count}" for outcome, count in self.counts.items()))
+        if self.latencies_ms: log(f"📊 Click-to-confirmation latency: {latency_summary(self.latencies_ms)}")
+
+# Push mode: a MutationObserver that calls back into Python when a 'Book' button
+# appears/changes or a remaining-spots counter changes.
+ROOM_WATCHER_JS = """
+(bindingName) => {
+    if (window.__wardyatiWatcher) return;
+    const WATCHED = 'button.button_hold, span.number-container';
+    let pending = false;
+    const notify = () => {
+        if (pending) return;
+        pending = true;
+        queueMicrotask(() => { pending = false; window[bindingName](); });
+    };
+    const observer = new MutationObserver((mutations) => {
+        for (const m of mutations) {
+            if (m.type === 'attributes') {
+                if (m.target.matches && m.target.matches(WATCHED)) { notify(); return; }
+                continue;
+            }
+            for (const n of m.addedNodes) {
+                if (n.nodeType === 1 && (n.matches(WATCHED) || n.querySelector(WATCHED))) { notify(); return; }
+            }
+        }
+    });
+    observer.observe(document.body, {subtree: true, childList: true, attributes: true, attributeFilter: ['data-number', 'disabled', 'aria-disabled', 'class', 'style']});
+    window.__wardyatiWatcher = observer;
+}
+"""
+
+_page_bindings = weakref.WeakKeyDictionary()  # page -> {binding name: current Python callback}
+
+async def bind_page_callback(page, name, callback):
+    """expose_binding may only be registered once per page, so pages reused across runs just get
+    their Python callback swapped."""
+    handlers = _page_bindings.setdefault(page, {})
+    first_time = name not in handlers
+    handlers[name] = callback
+    if first_time:
+        await page.expose_binding(name, lambda source, *args: handlers[name](*args))
+
+async def install_change_watcher(page, wake_event):
+    """Wake the scan loop (sets wake_event) whenever the room DOM changes in a way that matters.
+    Returns a function that detaches the watcher from the page."""
+    await bind_page_callback(page, "wardyatiRoomChanged", wake_event.set)
+    async def install():
+        try: await page.evaluate(ROOM_WATCHER_JS, "wardyatiRoomChanged")
+        except Exception: pass
+    # The observer lives in the document, so put it back after every navigation
+    on_load = lambda _: asyncio.ensure_future(install())
+    page.on("domcontentloaded", on_load)
+    await install()
+    return lambda: page.remove_listener("domcontentloaded", on_load)
+
+async def wait_for_next_scan(wake_event, timeout):
+    """Sleep until the page reports a change or the timeout (poll interval / heartbeat) expires."""
+    if wake_event is None:
+        await asyncio.sleep(timeout); return
+    try: await asyncio.wait_for(wake_event.wait(), timeout)
+    except asyncio.TimeoutError: pass
+
+# ------------------------------------------------------------------------------
+# Push frames: decode live room updates (WebSocket frames, XHR/fetch bodies) into the
+# scanner's (date, shift) -> spots/bookable view before the DOM repaints
+# ------------------------------------------------------------------------------
+# Only keys that name a shift's date / title / remaining spots: generic ones ("title", "number",
+# "available", ...) turn unrelated JSON (analytics, notifications) into false openings
+PUSH_DATE_KEYS = ("shift_date", "date")
+PUSH_NAME_KEYS = ("shift_name", "name")
+PUSH_SPOTS_KEYS = ("spots", "remaining_spots", "available_spots", "data_number")
+PUSH_BOOKABLE_KEYS = ("bookable", "is_bookable", "can_hold")
+
+def _collect_json_updates(node, updates, date_text=None):
+    if isinstance(node, list):
+        for item in node: _collect_json_updates(item, updates, date_text)
+        return
+    if not isinstance(node, dict): return
+    first = lambda keys: next((node[k] for k in keys if k in node and not isinstance(node[k], (dict, list))), None)
+    date_text = first(PUSH_DATE_KEYS) or date_text
+    name = first(PUSH_NAME_KEYS); spots = first(PUSH_SPOTS_KEYS); bookable = first(PUSH_BOOKABLE_KEYS)
+    if (name is not None and date_text is not None and (spots is not None or bookable is not None)
+            and parse_shift_date(str(date_text)) is not None):
+        try: spots = int(spots) if spots is not None else None
+        except (TypeError, ValueError): spots = None
+        updates.append((str(date_text), str(name), spots, bool(bookable) if bookable is not None else None))
+    for value in node.values():
+        if isinstance(value, (dict, list)): _collect_json_updates(value, updates, date_text)
+
+def decode_push_frame(payload):
+    """Room updates carried by one push frame or response body, as [(date text, shift name, spots or None,
+    bookable or None)]. Understands JSON (any nesting: objects with a YYYY-MM-DD date, a shift name and a
+    spots or bookable field; a date on an outer object applies to the shifts inside it), HTML fragments holding
+    whole day cards (htmx swaps) and SSE 'data:' lines. Anything else decodes to []."""
+    if isinstance(payload, bytes): payload = payload.decode("utf-8", "replace")
+    text = payload.strip()
+    if not text: return []
+    if text.startswith(("data:", "event:", "id:")):
+        data = "\n".join(line[5:].strip() for line in text.splitlines() if line.startswith("data:"))
+        return decode_push_frame(data) if data else []
+    if text[0] in "[{":
+        try: message = json.loads(text)
+        except ValueError: return []
+        updates = []
+        _collect_json_updates(message, updates)
+        return updates
+    if "arena-day-card" in text:
+        index, _ = parse_room_html(text)
+        return [(slot["date"], slot["name"], slot["spots"], slot["bookable"]) for slot in index.values() if slot["date"] and slot["name"]]
+    return []
+
+class PushState:
+    """Latest pushed state per shift. Entries younger than `hold_seconds` override the (lagging) DOM
+    snapshot; after that the DOM has caught up and wins again."""
+    def __init__(self, hold_seconds=2.0):
+        self.hold_seconds = hold_seconds
+        self.updates = {}  # (ISO day or heading text, normalized name) -> {"spots", "bookable", "at"}
+        self.frames = 0; self.openings = 0
+
+    @staticmethod
+    def key(date_text, name):
+        day = parse_shift_date(date_text)
+        return (day.isoformat() if day else " ".join(date_text.split()).lower(), normalize_shift_text(name))
+
+    def feed(self, updates):
+        """Record decoded updates; True if one shows a shift opening."""
+        now = time.monotonic(); opened = False
+        for date_text, name, spots, bookable in updates:
+            key = self.key(date_text, name)
+            previous = self.updates.get(key)
+            # A counter going up from zero opens the shift even if the frame says nothing about the button;
+            # otherwise a frame that only carries the counter keeps what was known about the button
+            if bookable is None and spots and previous is not None:
+                bookable = True if previous["spots"] == 0 else previous["bookable"]
+            if spots == 0: bookable = False
+            if bookable and not (previous and previous["bookable"]): opened = True
+            self.updates[key] = {"spots": spots, "bookable": bookable, "at": now}
+        self.frames += 1
+        if opened: self.openings += 1
+        return opened
+
+    def overlay(self, room_index):
+        """Apply fresh pushed values to a snapshot in place; drops expired entries."""
+        now = time.monotonic()
+        for key in [k for k, update in self.updates.items() if now - update["at"] > self.hold_seconds]: del self.updates[key]
+        if not self.updates: return
+        for slot in room_index.values():
+            update = self.updates.get(self.key(slot["date"], slot["name"]))
+            if update is None: continue
+            if update["spots"] is not None: slot["spots"] = update["spots"]
+            if update["bookable"] is not None: slot["bookable"] = update["bookable"]
+
+def install_push_listener(page, push_state, wake_event):
+    """Feed a room page's WebSocket frames and XHR/fetch response bodies into push_state and wake the
+    scan loop when one shows a shift opening. Returns a function that detaches the listeners.
+    (Playwright only hands over an SSE body once the stream closes, so SSE helps only when it reconnects.)"""
+    def on_payload(payload):
+        updates = decode_push_frame(payload)
+        if updates and push_state.feed(updates): wake_event.set()
+    def on_websocket(websocket): websocket.on("framereceived", on_payload)
+    async def read_body(response):
+        try: on_payload(await response.body())
+        except Exception: pass
+    def on_response(response):
+        if response.request.resource_type in ("xhr", "fetch", "eventsource"): asyncio.ensure_future(read_body(response))
+    page.on("websocket", on_websocket); page.on("response", on_response)
+    def remove():
+        page.remove_listener("websocket", on_websocket); page.remove_listener("response", on_response)
+    return remove
+
+# In-page booking agent: clicks the highest-priority enabled 'Book' button inside the
+# MutationObserver callback (a microtask) that first sees it, then reports back to Python.
+BOOKING_AGENT_JS = """
+({targets, waitMs, bindingName}) => {
+    if (window.__wardyatiAgent) window.__wardyatiAgent.observer.disconnect();
+    const text = (el) => el ? el.textContent.replace(/\\s+/g, ' ').trim() : '';
+    const bookable = (btn) => !!btn && btn.getClientRects().length > 0 && !btn.disabled && btn.getAttribute('aria-disabled') !== 'true';
+    const isoDay = (heading) => {
+        const m = heading.match(/(\\d{4})-(\\d{1,2})-(\\d{1,2})/);
+        return m ? `${m[1]}-${m[2].padStart(2, '0')}-${m[3].padStart(2, '0')}` : null;
+    };
+    const nameRegex = (source) => { try { return new RegExp(source, 'i'); } catch (e) { return /(?!)/; } };
+    const buttonSpec = __BUTTON_SPEC__;
+    const agent = {
+        // Already ranked by weight / list order in Python
+        targets: targets.map((t) => ({...t, days: t.days ? new Set(t.days) : null, nameRegex: t.nameRegex !== null ? nameRegex(t.nameRegex) : null})),
+        // No click before this time (null: not until re-armed); Python moves it after every booking (booking token bucket)
+        allowedAt: performance.now() + (waitMs ?? Infinity),
+        timer: null,
+    };
+    const dateMatches = (t, heading) => t.days ? t.days.has(isoDay(heading)) : heading.toLowerCase().includes(t.dateQuery);
+    const nameMatches = (t, name) => t.nameRegex ? t.nameRegex.test(name) : name.toLowerCase() === t.nameExact;
+    // Every shift instance a target matches, in page order
+    const find = function* (t) {
+        for (const card of document.querySelectorAll('div.arena-day-card')) {
+            const heading = text(card.querySelector('h5'));
+            if (!dateMatches(t, heading)) continue;
+            for (const inst of card.querySelectorAll('div.arena_shift_instance')) {
+                const name = text(inst.querySelector('div.text-start'));
+                if (nameMatches(t, name)) yield [inst, heading, name];
+            }
+        }
+    };
+    const scan = () => {
+        const detectedAt = performance.now();
+        const waitMs = agent.allowedAt - detectedAt;
+        if (waitMs > 0) {
+            if (!agent.timer && Number.isFinite(waitMs)) agent.timer = setTimeout(() => { agent.timer = null; scan(); }, waitMs);
+            return;
+        }
+        for (let i = 0; i < agent.targets.length; i++) {
+            const t = agent.targets[i];
+            let full = false;
+            for (const [inst, heading, name] of find(t)) {
+                const spots = inst.querySelector('span.number-container');
+                if (spots && spots.getAttribute('data-number') === '0') { full = true; continue; }
+                const btn = inst.querySelector('button.button_hold');
+                if (!bookable(btn)) continue;
+                btn.click();
+                const clickedAt = performance.now();
+                agent.allowedAt = Infinity;  // until Python answers with holdOff()
+                agent.targets.splice(i, 1);
+                window[bindingName]({event: 'booked', date: t.date, name: t.name, slotDate: heading, slotName: name, latencyMs: clickedAt - detectedAt,
+                                     request: buttonSpec(btn)});
+                return;
+            }
+            // Only an exact target is gone for good when its shift is full
+            if (full && t.exact) {
+                agent.targets.splice(i--, 1);
+                window[bindingName]({event: 'full', date: t.date, name: t.name});
+            }
+        }
+    };
+    // The account just booked (on this or another page): next click allowed in `ms`
+    agent.holdOff = (ms) => {
+        agent.allowedAt = performance.now() + ms;
+        if (agent.timer) { clearTimeout(agent.timer); agent.timer = null; }
+        scan();
+    };
+    agent.drop = (date, name) => { agent.targets = agent.targets.filter((t) => t.date !== date || t.name !== name); };
+    agent.observer = new MutationObserver(scan);
+    agent.observer.observe(document.body, {subtree: true, childList: true, attributes: true, attributeFilter: ['data-number', 'disabled', 'aria-disabled', 'class', 'style']});
+    window.__wardyatiAgent = agent;
+    scan();
+}
+""".replace("__BUTTON_SPEC__", BUTTON_SPEC_JS)
+
+def agent_target(pattern, constraints=None):
+    """A compiled target as BOOKING_AGENT_JS takes it, or None if the account's rules leave it no day to book.
+    Rules are applied per calendar day here; the rest of the check needs the shift's real name, which
+    only the polling loop sees for regex targets."""
+    days = pattern.days()
+    if days is not None:
+        if constraints is not None: days = [day for day in days if constraints.violation(day.isoformat(), pattern.shift["name"]) is None]
+        if not days: return None
+        days = [day.isoformat() for day in days]
+    return {"date": pattern.shift["date"], "name": pattern.shift["name"], "days": days, "dateQuery": pattern.date_query,
+            "nameExact": None if pattern.name_regex else " ".join(pattern.shift["name"].split()).lower(), "nameRegex": pattern.name_regex.pattern if pattern.name_regex else None,
+            "exact": pattern.exact}
+
+async def run_booking_agent(page_groups, shifts_to_book, bucket, log, stop_event=None, heartbeat_seconds=2.0, coordinator=None, account_label="", constraints=None,
+                            patterns=None, confirm_timeout=3.0, confirm_stats=None, healer=None):
+    """Hand the ranked targets to BOOKING_AGENT_JS (one agent per month page, given as
+    [(page, targets on that page)]) and apply their click reports to shifts_to_book.
+    Agents are only armed with targets that fit the account's rules (constraints) and that it owns
+    (coordinator.take_over), so no two accounts' agents hold the same target. The armed set is
+    re-checked on every heartbeat; with a coordinator, the agents stay disarmed for the whole cooldown
+    after a booking and are re-armed when it ends, since other accounts may take targets over meanwhile.
+    Each click is confirmed by the hold response seen on its page (or, failing that, a fresh
+    snapshot); a rejected click puts the target back in the queue.
+    Every heartbeat also checks the pages: a session or network failure is healed with `healer`
+    (RunHealer) and the agents re-armed; a crashed page returns early so the polling loop, which
+    can replace pages, takes over."""
+    if confirm_stats is None: confirm_stats = BookingConfirmStats()
+    if patterns is None: patterns = compile_targets(shifts_to_book)
+    pattern_of = {id(pattern.shift): pattern for pattern in patterns}
+    ranked = lambda shifts: sorted((pattern_of[id(s)] for s in shifts if id(s) in pattern_of), key=lambda p: (-p.weight, p.order))
+    reports = asyncio.Queue()
+    latencies_ms = []
+    blocked = set()
+    def armable(shift):
+        if shift not in shifts_to_book: return False
+        pattern = pattern_of.get(id(shift))
+        allowed = constraint_allows(constraints, shift, log, blocked) if pattern is None or pattern.exact else agent_target(pattern, constraints) is not None
+        if coordinator is None: return allowed
+        if not allowed:
+            coordinator.decline(account_label, shift); return False
+        return coordinator.take_over(account_label, shift)
+    async def arm(page, page_targets):
+        """Arm one page's agent; returns the error if that failed (the heartbeat check deals with it)."""
+        try:
+            await page.evaluate(BOOKING_AGENT_JS, {"targets": [agent_target(p, constraints) for p in ranked(page_targets) if armable(p.shift)],
+                                                   "waitMs": None if rearm_timer is not None else bucket.wait_seconds() * 1000,
+                                                   "bindingName": "wardyatiAgentReport"})
+        except Exception as e: return e
+    rearm_timer = None  # pending re-arm at the end of a cooldown (coordinated runs only)
+    async def rearm_all():
+        nonlocal armed, rearm_timer
+        rearm_timer = None
+        armed = [s for s in shifts_to_book if armable(s)]
+        for page, page_targets in page_groups: await arm(page, page_targets)
+    async def rearm_if_changed():
+        nonlocal armed
+        now_armable = [s for s in shifts_to_book if armable(s)]
+        if now_armable != armed:
+            armed = now_armable
+            for page, page_targets in page_groups: await arm(page, page_targets)
+    async def check_pages():
+        """Heartbeat health check. Heals a page that left the room (login redirect), lost its agent or
+        stopped answering, then re-arms; False if a page crashed and the polling loop has to take over."""
+        for page, page_targets in page_groups:
+            try:
+                if page.is_closed(): raise RuntimeError("Page has been closed")
+                if "/login/" in page.url: raise RuntimeError("Session expired (redirected to login)")
+                if not await page.evaluate("() => !!window.__wardyatiAgent"):
+                    error = await arm(page, page_targets)
+                    if error is not None: raise error
+            except Exception as e:
+                if healer is None or classify_failure(e, page) == FAILURE_CRASH:
+                    log(f"🩹 In-page agent lost its page ({str(e).splitlines()[0][:120]}). Falling back to the polling loop...")
+                    return False
+                await healer.heal(e, page)
+                for other_page, other_targets in page_groups: await arm(other_page, other_targets)
+                return True
+        if healer is not None: healer.scan_ok()
+        return True
+    async def drop_exhausted():
+        """The agent only drops exact targets when full; ranges, weekdays and regexes are checked here on a heartbeat."""
+        if all(pattern_of[id(s)].exact for s in shifts_to_book if id(s) in pattern_of): return
+        index = {}
+        for page, _ in page_groups:
+            try: room_index = await snapshot_room(page)
+            except Exception: continue  # its days just count as not loaded; check_pages deals with the page
+            for key, slot in room_index.items(): index.setdefault(key, slot)
+        drop_exhausted_targets(index, patterns, shifts_to_book, coordinator, log)
+    # Recent candidate responses per page, so a click reported by the agent can be matched to the request it sent
+    hold_responses = {page: [] for page, _ in page_groups}; response_seen = asyncio.Event()
+    def on_response(response, page):
+        if may_be_hold_response(response):
+            now = time.monotonic(); recent = hold_responses[page]
+            recent.append((now, response))
+            while recent and now - recent[0][0] > confirm_timeout + 1: recent.pop(0)
+            response_seen.set()
+    async def confirm_click(page, report, reported_at):
+        deadline = reported_at + confirm_timeout
+        matches = hold_response_matcher(report.get("request"), page.url)
+        while matches is not None:
+            # The binding call arrives within a few ms of the click; nothing older can be its response
+            entry = next(((t, r) for t, r in hold_responses[page] if t >= reported_at - 0.02 and matches(r)), None)
+            if entry is not None:
+                hold_responses[page].remove(entry); response = entry[1]
+                location = response.headers.get("location") or response.headers.get("hx-redirect") or response.url
+                return (*booking_outcome(response.status, location), (time.monotonic() - reported_at) * 1000)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            response_seen.clear()
+            try: await asyncio.wait_for(response_seen.wait(), remaining)
+            except asyncio.TimeoutError: break
+        # No response: settle it from what the page shows now
+        try: index = await snapshot_room(page)
+        except Exception: return BOOKING_UNKNOWN, "page unavailable", None
+        slot = index.get((report["slotDate"], report["slotName"]))
+        if slot is not None and not slot["bookable"]: return BOOKING_CONFIRMED, "verified on the page", None
+        return BOOKING_REJECTED, "still open on the page", None
+    listeners = []
+    for page, page_targets in page_groups:
+        await bind_page_callback(page, "wardyatiAgentReport", lambda report, page=page: reports.put_nowait((page, report, time.monotonic())))
+        on_load = lambda _, page=page, page_targets=page_targets: asyncio.ensure_future(arm(page, page_targets))
+        page.on("domcontentloaded", on_load); listeners.append((page, "domcontentloaded", on_load))
+        on_hold = lambda response, page=page: on_response(response, page)
+        page.on("response", on_hold); listeners.append((page, "response", on_hold))
+        await arm(page, page_targets)
+    log(f"🤖 In-page booking agent armed with {len(shifts_to_book)} target shifts.")
+    armed = [s for s in shifts_to_book if armable(s)]
+    unreachable = False  # a page failed to take the post-booking hold-off: check it before waiting again
+    try:
+        while shifts_to_book and (stop_event is None or not stop_event.is_set()):
+            if unreachable:
+                unreachable = False
+                if not await check_pages(): break
+            try: clicked_page, report, reported_at = await asyncio.wait_for(reports.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                drop_done_targets(shifts_to_book, coordinator, log)
+                await drop_exhausted()
+                await rearm_if_changed()
+                if not await check_pages(): break
+                continue
+            target_shift = next((s for s in shifts_to_book if s["date"] == report["date"] and s["name"] == report["name"]), None)
+            if target_shift is None: continue
+            position = shifts_to_book.index(target_shift)
+            shifts_to_book.remove(target_shift)
+            if report["event"] == "full":
+                if coordinator is not None: coordinator.mark_done(target_shift)
+                log(RunEvent(EVENT_TARGET_FULL, date=target_shift["date"], name=target_shift["name"])); continue
+            bucket.take(); wait = bucket.wait_seconds()
+            if coordinator is not None: coordinator.set_busy(account_label, wait)
+            latencies_ms.append(report["latencyMs"])
+            # Every tab/page drops the target and waits for the account's next booking token. With other
+            # accounts around, the agents stay off until re-armed with the targets this account owns then.
+            for other_page, _ in page_groups:
+                try: await other_page.evaluate("(r) => window.__wardyatiAgent && (window.__wardyatiAgent.drop(r.date, r.name), window.__wardyatiAgent.holdOff(r.ms ?? Infinity))",
+                                               {"date": target_shift["date"], "name": target_shift["name"], "ms": None if coordinator is not None else wait * 1000})
+                except Exception: unreachable = True
+            if coordinator is not None:
+                if rearm_timer is not None: rearm_timer.cancel()
+                rearm_timer = asyncio.get_running_loop().call_later(wait, lambda: asyncio.ensure_future(rearm_all()))
+            log(f"✅ AVAILABLE: {report['slotDate']} | {report['slotName']}" + ("" if pattern_of[id(target_shift)].exact else f" (target: {describe_target(target_shift)})"))
+            log(RunEvent(EVENT_BOOKING_CLICKED, date=report["slotDate"], name=report["slotName"], how="in-page", latency_ms=report["latencyMs"]))
+            outcome, detail, confirm_ms = await confirm_click(clicked_page, report, reported_at)
+            confirm_stats.record(outcome if confirm_ms is not None else BOOKING_UNKNOWN, confirm_ms)
+            if outcome != BOOKING_CONFIRMED:
+                shifts_to_book.insert(position, target_shift)
+                log(f"⚠️ WARNING: Booking not confirmed ({detail}). Target goes back in the queue.")
+                if rearm_timer is None:
+                    for page, page_targets in page_groups: await arm(page, page_targets)
+                continue
+            if coordinator is not None: coordinator.mark_done(target_shift)
+            log(RunEvent(EVENT_BOOKING_CONFIRMED, date=report["slotDate"], name=report["slotName"], detail=detail, confirm_ms=confirm_ms))
+            if constraints is not None:
+                constraints.record(report["slotDate"], report["slotName"])
+                await rearm_if_changed()
+            if shifts_to_book and wait > 0: log(f"⏳ Shift booked! Next in-page click allowed in {bucket.wait_seconds():.1f}s...")
+    finally:
+        # Disarm so a page kept open after this run (warm pool) never clicks on its own
+        if rearm_timer is not None: rearm_timer.cancel()
+        for page, event, handler in listeners: page.remove_listener(event, handler)
+        for page, _ in page_groups:
+            try: await page.evaluate("() => { if (window.__wardyatiAgent) { window.__wardyatiAgent.observer.disconnect(); window.__wardyatiAgent = null; } }")
+            except Exception: pass
+    if latencies_ms:
+        log(f"📊 Detection-to-click latency: {latency_summary(latencies_ms)}")
+    return latencies_ms
+
+# ------------------------------------------------------------------------------
+# Scheduled release: pre-warm before the drop, scan slowly, then burst at T
+# ------------------------------------------------------------------------------
+def parse_release_time(text):
+    """Parse 'YYYY-MM-DD HH:MM[:SS]' or 'HH:MM[:SS]' (today) into an epoch timestamp. Returns None if empty."""
+    import datetime
+    text = (text or "").strip()
+    if not text: return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%H:%M:%S", "%H:%M"):
+        try: parsed = datetime.datetime.strptime(text, fmt)
+        except ValueError: continue
+        if parsed.year == 1900:
+            parsed = datetime.datetime.combine(datetime.date.today(), parsed.time())
+        return parsed.timestamp()
+    raise ValueError(f"Unrecognised release time: {text}")
+
+async def estimate_clock_offset(fetch_date_header, samples=5):
+    """Estimate (server clock - local clock) in seconds from HTTP Date headers.
+    Date only has 1 s resolution, so each sample bounds the offset to a window; intersecting
+    windows from requests sent at different sub-second phases narrows it down."""
+    import email.utils
+    low, high = float("-inf"), float("inf")
+    for i in range(samples):
+        sent = time.time()
+        header = await fetch_date_header()
+        received = time.time()
+        if header:
+            server = email.utils.parsedate_to_datetime(header).timestamp()
+            low = max(low, server - received); high = min(high, server + 1 - sent)
+        if i < samples - 1: await asyncio.sleep(0.37)  # spread the samples over the second
+    if low == float("-inf"): return 0.0
+    return (low + high) / 2
+
+async def wait_until(timestamp, stop_event=None):
+    """Sleep until a local epoch timestamp, waking early if the run is stopped."""
+    while (stop_event is None or not stop_event.is_set()) and time.time() < timestamp:
+        await asyncio.sleep(min(0.5, timestamp - time.time()))
+
+class ReleaseSchedule:
+    """Scan-rate plan around a known release time T (server clock): slow until T - lead, burst until T + window."""
+    def __init__(self, config, release_at):
+        self.release_at = release_at
+        self.prewarm_seconds = config.getfloat('Settings', 'prewarm_minutes', fallback=3) * 60
+        self.slow_interval = config.getfloat('Settings', 'slow_scan_interval_seconds', fallback=2.0)
+        self.lead_seconds = config.getfloat('Settings', 'burst_lead_seconds', fallback=5)
+        self.window_seconds = config.getfloat('Settings', 'burst_window_seconds', fallback=60)
+        self.burst_interval = config.getfloat('Settings', 'burst_scan_interval_seconds', fallback=0.05)
+        self.clock_offset = 0.0  # server - local, set once logged in
+        self.phase = None
+
+    def launch_at(self):
+        """Local time to launch and log in."""
+        return self.release_at - self.prewarm_seconds
+
+    def current_phase(self):
+        now = time.time() + self.clock_offset
+        if now < self.release_at - self.lead_seconds: return "slow"
+        if now < self.release_at + self.window_seconds: return "burst"
+        return "normal"
+
+    def interval(self, normal_interval):
+        """How long to wait before the next scan, never sleeping past the start of the burst."""
+        phase = self.current_phase()
+        if phase == "slow":
+            until_burst = self.release_at - self.lead_seconds - (time.time() + self.clock_offset)
+            return max(0.0, min(max(self.slow_interval, normal_interval), until_burst))
+        if phase == "burst": return min(self.burst_interval, normal_interval)
+        return normal_interval
+
+    def phase_change_message(self):
+        """Log line when the phase changes, else None."""
+        phase = self.current_phase()
+        if phase == self.phase: return None
+        self.phase = phase
+        return {"slow": f"🐢 Low-rate scanning until {self.lead_seconds:g}s before release...",
+                "burst": f"🚀 Release window: scanning at full speed for {self.window_seconds:g}s!",
+                "normal": "Release window over. Back to the normal scan rate."}[phase]
+
+# ------------------------------------------------------------------------------
+# Cross-account coordination (accounts sharing the main list)
+# ------------------------------------------------------------------------------
+class TargetCoordinator:
+    """Shared by every run on the main list so accounts stop racing for the same shift.
+    Targets are dealt round-robin to accounts; an account only books its own targets, except that
+    it may take over targets whose owner is in its post-booking cooldown or no longer running.
+    A target leaves every account's list the moment anyone books it (or sees it full).
+    Thread-safe: runs may live on different threads/event loops."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.owners = {}      # target key -> account label
+        self.in_flight = {}   # target key -> label currently clicking it
+        self.done = set()     # target keys booked or full
+        self.busy_until = {}  # label -> monotonic time its cooldown ends
+        self.active = set()
+
+    @staticmethod
+    def key(shift): return (shift["date"], shift["name"])
+
+    def register(self, labels, shifts):
+        """Deal the shared targets round-robin (in priority order) to the given accounts."""
+        with self._lock:
+            self.active.update(labels)
+            for i, shift in enumerate(shifts):
+                self.owners.setdefault(self.key(shift), labels[i % len(labels)])
+
+    def unregister(self, label):
+        with self._lock:
+            self.active.discard(label)
+
+    def _may_book(self, label, key, now):
+        if key in self.done: return False
+        flying = self.in_flight.get(key)
+        if flying is not None and flying != label: return False
+        owner = self.owners.get(key)
+        return owner is None or owner == label or owner not in self.active or self.busy_until.get(owner, 0) > now
+
+    def may_book(self, label, shift):
+        with self._lock:
+            return self._may_book(label, self.key(shift), time.monotonic())
+
+    def claim(self, label, shift):
+        """Reserve a target right before clicking it. Returns False if another account has it."""
+        with self._lock:
+            key = self.key(shift)
+            if not self._may_book(label, key, time.monotonic()): return False
+            if self.owners.get(key) not in (None, label): self.owners[key] = label  # idle account takes over
+            self.in_flight[key] = label
+            return True
+
+    def take_over(self, label, shift):
+        """Make an account the owner of a target it may book, before an in-page agent is armed with it.
+        The agent clicks on its own, so only the owner may arm a target: handing ownership over keeps
+        every other account's agent off it. Returns False if the target is someone else's."""
+        with self._lock:
+            key = self.key(shift)
+            if not self._may_book(label, key, time.monotonic()): return False
+            self.owners[key] = label
+            return True
+
+    def release(self, label, shift):
+        """Give a claimed target back (the click failed)."""
+        with self._lock:
+            if self.in_flight.get(self.key(shift)) == label: del self.in_flight[self.key(shift)]
+
+    def decline(self, label, shift):
+        """The account's rules rule a target out: stop owning it, so any other account may book it."""
+        with self._lock:
+            if self.owners.get(self.key(shift)) == label: del self.owners[self.key(shift)]
+
+    def mark_done(self, shift):
+        """Booked by someone, or full: take it out of everyone's pool."""
+        with self._lock:
+            self.done.add(self.key(shift)); self.in_flight.pop(self.key(shift), None)
+
+    def is_done(self, shift):
+        with self._lock:
+            return self.key(shift) in self.done
+
+    def set_busy(self, label, seconds):
+        """Account entered its cooldown; its targets may be taken over until it ends."""
+        with self._lock:
+            self.busy_until[label] = time.monotonic() + seconds
+
+# ------------------------------------------------------------------------------
+# Booking rate limit: a token bucket that only gates clicks, so scanning never pauses
+# ------------------------------------------------------------------------------
+class TokenBucket:
+    """Allows `burst` bookings back to back, then one more every `refill_seconds`."""
+    def __init__(self, refill_seconds, burst=1):
+        self.refill_seconds = max(0.0, refill_seconds); self.burst = max(1, burst)
+        self.tokens = float(self.burst); self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.refill_seconds <= 0: self.tokens = float(self.burst)
+        else: self.tokens = min(float(self.burst), self.tokens + (now - self.updated) / self.refill_seconds)
+        self.updated = now
+
+    def ready(self):
+        self._refill()
+        return self.tokens >= 1
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def wait_seconds(self):
+        """Seconds until the next booking is allowed (0 if a token is available now)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.refill_seconds
+
+def make_booking_bucket(config, cooldown):
+    """Per-account booking limiter. `booking_burst` (default 1) and `booking_refill_seconds`
+    (default: the room cooldown + 0.5s) in config.ini override the defaults."""
+    return TokenBucket(config.getfloat('Settings', 'booking_refill_seconds', fallback=cooldown + 0.5),
+                       config.getint('Settings', 'booking_burst', fallback=1))
+
+# ------------------------------------------------------------------------------
+# Per-account booking constraints
+# ------------------------------------------------------------------------------
+def parse_shift_hours(text):
+    """'Morning=08:00-16:00; Night=20:00-08:00' -> {'morning': (8.0, 16.0), 'night': (20.0, 8.0)} (hours)."""
+    import re
+    hours = {}
+    for part in (text or "").replace("\n", ";").split(";"):
+        if not part.strip(): continue
+        match = re.fullmatch(r'\s*(.+?)\s*=\s*(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?\s*', part)
+        if not match: raise ValueError(f"Bad shift hours: {part.strip()} (use Name=HH:MM-HH:MM)")
+        name, h1, m1, h2, m2 = match.groups()
+        hours[name.lower()] = (int(h1) + int(m1 or 0) / 60, int(h2) + int(m2 or 0) / 60)
+    return hours
+
+def parse_forbidden_sequences(text):
+    """'Night>Morning; Mid>Morning' -> [('night', 'morning')]: the second shift on the day after the first."""
+    pairs = []
+    for part in (text or "").replace("\n", ";").split(";"):
+        if not part.strip(): continue
+        first, sep, second = part.partition(">")
+        if not sep or not first.strip() or not second.strip(): raise ValueError(f"Bad forbidden pair: {part.strip()} (use First>Next)")
+        pairs.append((first.strip().lower(), second.strip().lower()))
+    return pairs
+
+class BookingConstraints:
+    """Per-account rules checked before every booking: max shifts per ISO week / month, one shift per
+    day, minimum rest between shifts and forbidden next-day sequences. Counters are kept per
+    week/month/day so a check is O(1) plus O(bookings on neighbouring days) for the rest gap."""
+    def __init__(self, rules):
+        rules = rules or {}
+        self.max_per_week = int(rules.get("max_per_week") or 0)    # 0 = unlimited
+        self.max_per_month = int(rules.get("max_per_month") or 0)
+        self.one_per_day = bool(rules.get("one_per_day"))
+        self.min_rest_hours = float(rules.get("min_rest_hours") or 0)
+        self.shift_hours = parse_shift_hours(rules.get("shift_hours", ""))
+        self.forbidden = set(parse_forbidden_sequences(rules.get("forbidden", "")))
+        self.per_week = {}; self.per_month = {}; self.by_day = {}  # day -> [shift name (lowercase)]
+        self._hours_cache = {}
+
+    def is_empty(self):
+        return not (self.max_per_week or self.max_per_month or self.one_per_day or self.min_rest_hours or self.forbidden)
+
+    @staticmethod
+    def _day(date_text):
+        return parse_shift_date(date_text)
+
+    def _hours(self, name):
+        """(start, end) hours for a shift name: exact match first, else the first configured name it contains."""
+        if name not in self._hours_cache:
+            self._hours_cache[name] = self.shift_hours.get(name) or next((h for key, h in self.shift_hours.items() if key in name), None)
+        return self._hours_cache[name]
+
+    def _interval(self, day, name):
+        """Absolute (start, end) in hours since day 0 for a booked shift, or None if its hours are unknown."""
+        hours = self._hours(name)
+        if hours is None: return None
+        start = day.toordinal() * 24 + hours[0]
+        end = day.toordinal() * 24 + hours[1]
+        return start, end if end > start else end + 24  # overnight shift
+
+    def _matches(self, rule_name, name):
+        return rule_name == name or rule_name in name
+
+    def violation(self, date_text, name):
+        """Why booking (date, name) would break a rule, or None if it is feasible."""
+        import datetime
+        day = self._day(date_text)
+        if day is None: return None
+        name = name.lower()
+        if self.one_per_day and self.by_day.get(day): return "already have a shift that day"
+        if self.max_per_week and self.per_week.get(day.isocalendar()[:2], 0) >= self.max_per_week: return f"weekly limit of {self.max_per_week}"
+        if self.max_per_month and self.per_month.get((day.year, day.month), 0) >= self.max_per_month: return f"monthly limit of {self.max_per_month}"
+        for offset in (-1, 1):
+            for other in self.by_day.get(day + datetime.timedelta(days=offset), ()):
+                first, second = (other, name) if offset == -1 else (name, other)
+                if any(self._matches(a, first) and self._matches(b, second) for a, b in self.forbidden):
+                    return "forbidden shift sequence"
+        if self.min_rest_hours:
+            mine = self._interval(day, name)
+            if mine is not None:
+                span = 1 + int(self.min_rest_hours // 24)
+                for offset in range(-span, span + 1):
+                    other_day = day + datetime.timedelta(days=offset)
+                    for other in self.by_day.get(other_day, ()):
+                        theirs = self._interval(other_day, other)
+                        if theirs is None: continue
+                        gap = max(mine[0] - theirs[1], theirs[0] - mine[1])
+                        if gap < self.min_rest_hours: return f"less than {self.min_rest_hours:g}h rest"
+        return None
+
+    def seed(self, bookings):
+        """Count shifts the account already holds (e.g. from booking_history.jsonl), so the limits cover them too."""
+        for date_text, name in bookings: self.record(date_text, name)
+
+    def record(self, date_text, name):
+        """Count a booking."""
+        day = self._day(date_text)
+        if day is None: return
+        week = day.isocalendar()[:2]
+        self.per_week[week] = self.per_week.get(week, 0) + 1
+        self.per_month[(day.year, day.month)] = self.per_month.get((day.year, day.month), 0) + 1
+        self.by_day.setdefault(day, []).append(name.lower())
+
+def load_booking_history(username):
+    """Distinct (date, shift name) bookings booking_history.jsonl holds for an account, oldest first."""
+    bookings = []
     try:
-        LOGIN_URL = "https://wardyati.com/login/"
-        SHIFTS_URL = get_shifts_url(room_number, shifts_to_book)
+        with open(BOOKING_HISTORY_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue
+                booking = (entry.get("date"), entry.get("name"))
+                if entry.get("username") == username and all(booking) and booking not in bookings: bookings.append(booking)
+    except OSError: pass
+    return bookings
+
+def constraint_allows(constraints, shift, log, reported):
+    """Check a shift (a target or a scanned slot: anything with "date" and "name") against the
+    account's rules, logging each blocked shift once."""
+    if constraints is None: return True
+    reason = constraints.violation(shift["date"], shift["name"])
+    if reason is None: return True
+    key = (shift["date"], shift["name"])
+    if key not in reported:
+        reported.add(key)
+        log(f"🚫 Skipping {shift['date']} | {shift['name']}: {reason}.")
+    return False
+
+# ------------------------------------------------------------------------------
+# Self-healing: classify scan-loop failures and apply the cheapest recovery for each
+# ------------------------------------------------------------------------------
+FAILURE_STALE = "stale element"      # re-read on the next snapshot
+FAILURE_NETWORK = "network error"    # back off, then reload the page
+FAILURE_SESSION = "session expired"  # log in again, then go back to the room
+FAILURE_CRASH = "page crash"         # replace the page with a fresh one
+
+def classify_failure(error, page=None):
+    """Which recovery a scan-loop error needs; `page` is the page it happened on, if known."""
+    message = str(error).lower()
+    if (page is not None and "/login/" in page.url) or "session expired" in message or "/login/" in message: return FAILURE_SESSION
+    if (page is not None and page.is_closed()) or any(s in message for s in ("crash", "target closed", "has been closed")): return FAILURE_CRASH
+    if (isinstance(error, (OSError, asyncio.TimeoutError)) or type(error).__module__.startswith("aiohttp")
+            or any(s in message for s in ("net::", "connection", "cannot connect", "server disconnected"))):
+        return FAILURE_NETWORK
+    return FAILURE_STALE
+
+class RunHealer:
+    """Recovery bookkeeping for one account run. `recoveries` maps a failure class to an async
+    callable(page or None) doing the fix. Each class backs off exponentially while it keeps failing
+    (a clean scan resets it) and the time spent recovering is added up per class."""
+    def __init__(self, log, recoveries, base_delay=0.5, max_delay=30.0, max_attempts=8):
+        self.log = log; self.recoveries = recoveries
+        self.base_delay = base_delay; self.max_delay = max_delay; self.max_attempts = max_attempts
+        self.streak = {}; self.events = {}; self.downtime = {}
+
+    async def heal(self, error, page=None):
+        """Recover from one failure; returns its class. Raises once a class keeps failing past max_attempts."""
+        failure = classify_failure(error, page)
+        attempt = self.streak.get(failure, 0) + 1; self.streak[failure] = attempt
+        if attempt > self.max_attempts:
+            raise RuntimeError(f"{failure} persists after {self.max_attempts} recoveries ({error})")
+        # A stale element is normal churn: retry at once, back off only if it keeps happening
+        delay = 0.0 if failure == FAILURE_STALE and attempt == 1 else min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if failure != FAILURE_STALE or attempt > 1:
+            self.log(f"🩹 {failure.capitalize()}: {str(error).splitlines()[0][:120]}. Recovering" + (f" in {delay:.1f}s" if delay else "") + "...")
+        started = time.monotonic()
+        try:
+            if delay: await asyncio.sleep(delay)
+            action = self.recoveries.get(failure)
+            if action is not None: await action(page)
+        except asyncio.CancelledError: raise
+        except Exception as e: self.log(f"⚠️ WARNING: Recovery from {failure} failed ({e}). Will retry.")
+        finally:
+            self.events[failure] = self.events.get(failure, 0) + 1
+            self.downtime[failure] = self.downtime.get(failure, 0.0) + time.monotonic() - started
+        return failure
+
+    def scan_ok(self):
+        self.streak.clear()
+
+    def log_summary(self):
+        if self.events:
+            self.log("🩹 Recoveries: " + " | ".join(f"{failure} {count}x, {self.downtime[failure]:.1f}s down" for failure, count in self.events.items()))
+
+def drop_done_targets(shifts_to_book, coordinator, log):
+    """Remove targets another account already booked (or found full)."""
+    if coordinator is None: return
+    for shift in shifts_to_book[:]:
+        if coordinator.is_done(shift):
+            shifts_to_book.remove(shift)
+            log(f"🤝 {shift['date']} | {shift['name']} handled by another account. Removing from targets.")
+
+async def run_automation(config, shifts_to_book, room_number, cooldown, log_queue, stop_event=None, credentials=None, account_label="", browser=None, pool=None, release_at=None, coordinator=None, constraints=None,
+                         state=None):
+    """Run one account. Launches its own Chromium unless a shared `browser` is passed, in which case
+    the account gets its own isolated BrowserContext inside it. With a warm `pool` the account attaches
+    to (and afterwards hands back) an already logged-in page. With `release_at` (epoch seconds) the run
+    pre-warms before that time and bursts around it. A shared `coordinator` keeps accounts on the
+    main list from booking the same targets; `constraints` (BookingConstraints) filters every booking decision.
+    Progress is reported on `state` (RunState); cancelling the task stops the run at once."""
+    log = run_logger(log_queue, account_label)
+    state = state or RunState(account_label)
+    try:
+        MONTH_GROUPS = group_targets_by_month(room_number, shifts_to_book)
+        SHIFTS_URL = MONTH_GROUPS[0][1]
         if credentials:
             YOUR_USERNAME = credentials.get('username', '')
             YOUR_PASSWORD = credentials.get('password', '')
@@ -116,68 +1483,1068 @@ async def run_automation(config, shifts_to_book, room_number, cooldown, log_queu
             YOUR_USERNAME = config.get('Credentials', 'username')
             YOUR_PASSWORD = config.get('Credentials', 'password')
         if not YOUR_USERNAME or not YOUR_PASSWORD:
-            log("ƒ?O FATAL ERROR: Missing account credentials.")
-            return
-        SCAN_INTERVAL_SECONDS = config.getfloat('Settings', 'scan_interval_seconds'); COOLDOWN_AFTER_BOOKING_SECONDS = cooldown + 0.5
-        USERNAME_SELECTOR = "#id_username"
-        PASSWORD_SELECTOR = "#id_password"
-        LOGIN_BUTTON_TEXT = "تسجيل الدخول"
-        TAKE_BUTTON_TEXT = "حجز"  # Updated label on new layout
-        REMAINING_SPOTS_SELECTOR = "span.number-container"
+            log(RunEvent(EVENT_RUN_FAILED, error="Missing account credentials."))
+            state.fail("missing credentials", retryable=False); return
+        SCAN_INTERVAL_SECONDS = config.getfloat('Settings', 'scan_interval_seconds')
+        bucket = make_booking_bucket(config, cooldown)
+        CONFIRM_TIMEOUT_SECONDS = config.getfloat('Settings', 'confirm_timeout_seconds', fallback=3.0)
+        PUSH_DETECTION = config.getboolean('Settings', 'push_detection', fallback=False)
+        PUSH_FRAMES = config.getboolean('Settings', 'push_frames', fallback=False)
+        HEARTBEAT_SECONDS = config.getfloat('Settings', 'heartbeat_seconds', fallback=2.0)
+        IN_PAGE_BOOKING = config.getboolean('Settings', 'in_page_booking', fallback=False)
+        TABS_PER_ROOM = max(1, config.getint('Settings', 'tabs_per_room', fallback=1))
+        TAB_REFRESH_SECONDS = config.getfloat('Settings', 'tab_refresh_seconds', fallback=2.0)
+        REFRESH_CHECK_SECONDS = config.getfloat('Settings', 'refresh_check_seconds', fallback=2.0)
+
+        schedule = ReleaseSchedule(config, release_at) if release_at else None
+        if schedule is not None and time.time() < schedule.launch_at():
+            log(f"⏰ Waiting to pre-warm at {time.strftime('%H:%M:%S', time.localtime(schedule.launch_at()))} (release at {time.strftime('%H:%M:%S', time.localtime(release_at))})...")
+            await wait_until(schedule.launch_at(), stop_event)
+            if stop_event is not None and stop_event.is_set():
+                log(RunEvent(EVENT_RUN_STOPPED)); return
 
         # This is now guaranteed to work because the .bat file checked for us.
         os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(get_playwright_browsers_path())
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False, slow_mo=25)
-            page = await browser.new_page()
-            log("--- Step 1: Logging in ---")
-            await page.goto(LOGIN_URL)
-            await page.locator(USERNAME_SELECTOR).fill(YOUR_USERNAME)
-            await page.locator(PASSWORD_SELECTOR).fill(YOUR_PASSWORD)
-            log("🔐 Clicking login...")
-            async with page.expect_navigation(url="**/rooms/**", timeout=15000):
-                await page.get_by_role("button", name=LOGIN_BUTTON_TEXT).click()
-            log("✅ Login successful!")
-            log(f"--- Step 2: Navigating to shifts page ---")
-            log(f"🔗 URL: {SHIFTS_URL}")
-            await page.goto(SHIFTS_URL)
-            await page.wait_for_load_state("domcontentloaded")
+        async with contextlib.AsyncExitStack() as cleanup:
+            if browser is None and pool is None:
+                p = await cleanup.enter_async_context(async_playwright())
+                browser = await p.chromium.launch(headless=False, slow_mo=25)
+                cleanup.push_async_callback(browser.close)
+            if pool is not None:
+                context, page = await pool.acquire(YOUR_USERNAME, YOUR_PASSWORD, SHIFTS_URL, log)
+                cleanup.callback(pool.release, YOUR_USERNAME)
+            else:
+                context, page = await open_logged_in_page(browser, SHIFTS_URL, YOUR_USERNAME, YOUR_PASSWORD, log)
+                cleanup.push_async_callback(context.close)
+            state.set(RUN_LOGGED_IN)
+            # One page per (year, month) the targets fall in, all in the same logged-in context,
+            # each opened in TABS_PER_ROOM tabs
+            month_tabs = []
+            for i, (month_key, month_url) in enumerate(MONTH_GROUPS):
+                tabs = [page] if i == 0 else []
+                if i > 0: log(f"🗓️ Opening {month_key[0]}-{month_key[1]:02d} page: {month_url}")
+                while len(tabs) < TABS_PER_ROOM:
+                    tab = await context.new_page()
+                    cleanup.push_async_callback(tab.close)
+                    await tab.goto(month_url)
+                    await tab.wait_for_load_state("domcontentloaded")
+                    tabs.append(tab)
+                month_tabs.append(tabs)
+            pages = [tab for tabs in month_tabs for tab in tabs]
+            wake_event = None
+            if PUSH_DETECTION:
+                wake_event = asyncio.Event()
+                for watched_page in pages:
+                    cleanup.callback(await install_change_watcher(watched_page, wake_event))
+                log(f"📡 Push detection on (fallback heartbeat every {HEARTBEAT_SECONDS}s)")
+            push_state = None
+            if PUSH_FRAMES:
+                if wake_event is None: wake_event = asyncio.Event()
+                push_state = PushState(config.getfloat('Settings', 'push_hold_seconds', fallback=2.0))
+                for watched_page in pages:
+                    cleanup.callback(install_push_listener(watched_page, push_state, wake_event))
+                log("📨 Listening to the room's live updates (WebSocket / XHR)")
+            fresh_at = {}
+            page_tasks = {}  # page -> background tasks bound to it
+            if TABS_PER_ROOM > 1:
+                for tabs in month_tabs:
+                    for j, tab in enumerate(tabs):
+                        refresher = asyncio.ensure_future(refresh_tab_staggered(tab, j * TAB_REFRESH_SECONDS / TABS_PER_ROOM, TAB_REFRESH_SECONDS, fresh_at, wake_event))
+                        cleanup.callback(refresher.cancel); page_tasks.setdefault(tab, []).append(refresher)
+                log(f"🗂️ {TABS_PER_ROOM} tabs per month page, each reloading every {TAB_REFRESH_SECONDS}s, staggered by {TAB_REFRESH_SECONDS / TABS_PER_ROOM:.2f}s")
+            room_refresher = None
+            if TABS_PER_ROOM == 1 and REFRESH_CHECK_SECONDS > 0:
+                # Single tab per month: keep it current with conditional background fetches
+                room_refresher = ConditionalRefresher()
+                for tabs, (_, month_url) in zip(month_tabs, MONTH_GROUPS):
+                    checker = asyncio.ensure_future(room_refresher.run(tabs[0], month_url, REFRESH_CHECK_SECONDS, wake_event))
+                    cleanup.callback(checker.cancel); page_tasks.setdefault(tabs[0], []).append(checker)
+                log(f"🔄 Checking the room for changes every {REFRESH_CHECK_SECONDS}s (page reloads only when the schedule changed)")
+            if schedule is not None:
+                async def page_date_header():
+                    response = await page.request.head(SHIFTS_URL)
+                    return response.headers.get("date")
+                schedule.clock_offset = await estimate_clock_offset(page_date_header)
+                log(f"🕒 Server clock offset: {schedule.clock_offset:+.2f}s")
+            # Recoveries for the self-healing scan loop, cheapest first
+            page_urls = {tab: url for tabs, (_, url) in zip(month_tabs, MONTH_GROUPS) for tab in tabs}
+            async def reload_pages(failed_page=None):
+                for tab in ([failed_page] if failed_page is not None else pages): await tab.reload(wait_until="domcontentloaded")
+            async def relogin(_=None):
+                await browser_login(pages[0], YOUR_USERNAME, YOUR_PASSWORD, log)
+                for tab in pages:
+                    await tab.goto(page_urls[tab]); await tab.wait_for_load_state("domcontentloaded")
+            async def reopen_pages(failed_page=None):
+                for dead in [tab for tab in pages if tab.is_closed() or tab is failed_page]:
+                    url = page_urls.pop(dead)
+                    for task in page_tasks.pop(dead, []): task.cancel()
+                    try: await dead.close()
+                    except Exception: pass
+                    tab = await context.new_page()
+                    cleanup.push_async_callback(tab.close)
+                    await tab.goto(url); await tab.wait_for_load_state("domcontentloaded")
+                    page_urls[tab] = url
+                    pages[:] = [tab if t is dead else t for t in pages]
+                    for tabs in month_tabs: tabs[:] = [tab if t is dead else t for t in tabs]
+                    if PUSH_DETECTION: cleanup.callback(await install_change_watcher(tab, wake_event))
+                    if push_state is not None: cleanup.callback(install_push_listener(tab, push_state, wake_event))
+                    if room_refresher is not None: task = asyncio.ensure_future(room_refresher.run(tab, url, REFRESH_CHECK_SECONDS, wake_event))
+                    elif TABS_PER_ROOM > 1: task = asyncio.ensure_future(refresh_tab_staggered(tab, 0, TAB_REFRESH_SECONDS, fresh_at, wake_event))
+                    else: continue
+                    cleanup.callback(task.cancel); page_tasks.setdefault(tab, []).append(task)
+                    log(f"🔁 Reopened {url}")
+            healer = RunHealer(log, {FAILURE_NETWORK: reload_pages, FAILURE_SESSION: relogin, FAILURE_CRASH: reopen_pages})
             log("\n--- Step 3: Starting LIVE SHIFT SCANNING ---")
+            state.set(RUN_SCANNING)
+            patterns = compile_targets(shifts_to_book)
+            policy = make_booking_policy(config)
+            if policy.name != ListOrderPolicy.name: log(f"🧮 Booking order: {policy.name} (within equal weights)")
+            blocked_by_rules = set()
+            confirm_stats = BookingConfirmStats()
+            pending = {}  # clicks without a hold response yet: target id -> (target, slot key)
+            def booking_confirmed(target_shift, slot_key, detail, confirm_ms=None):
+                shifts_to_book.remove(target_shift)
+                if coordinator is not None: coordinator.mark_done(target_shift)
+                if constraints is not None: constraints.record(*slot_key)
+                log(RunEvent(EVENT_BOOKING_CONFIRMED, date=slot_key[0], name=slot_key[1], detail=detail, confirm_ms=confirm_ms))
+                if shifts_to_book and not bucket.ready(): log(f"⏳ Shift booked! Next booking allowed in {bucket.wait_seconds():.1f}s (still scanning)...")
+            if IN_PAGE_BOOKING:
+                page_groups = [(tab, targets_for_month(shifts_to_book, month_key, MONTH_GROUPS)) for tabs, (month_key, _) in zip(month_tabs, MONTH_GROUPS) for tab in tabs]
+                await run_booking_agent(page_groups, shifts_to_book, bucket, log, stop_event, HEARTBEAT_SECONDS, coordinator, account_label, constraints, patterns,
+                                        CONFIRM_TIMEOUT_SECONDS, confirm_stats, healer)
+            # Polling loop (also picks up any targets left over if the in-page agent bailed out)
             while shifts_to_book and (stop_event is None or not stop_event.is_set()):
-                log(f"Scanning for {len(shifts_to_book)} target shifts...")
-                booked_one_in_this_cycle = False
-                for target_shift in shifts_to_book[:]:
+                log(RunEvent(EVENT_SCAN_CYCLE, targets=len(shifts_to_book)))
+                waiting_for_token = False
+                if wake_event is not None: wake_event.clear()
+                state.set(RUN_SCANNING if bucket.ready() else RUN_COOLDOWN)
+                failures = []
+                room_index = await snapshot_pages(pages, fresh_at, failures)
+                if failures:
+                    # One recovery per class per cycle (every tab shares the session); crashed pages each get replaced
+                    healed = set()
+                    for failed_page, error in failures:
+                        failure = classify_failure(error, failed_page)
+                        if failure in healed and failure != FAILURE_CRASH: continue
+                        healed.add(await healer.heal(error, failed_page))
+                    if not room_index: continue
+                else: healer.scan_ok()
+                if push_state is not None: push_state.overlay(room_index)
+                now = time.monotonic(); policy.observe(room_index, now)
+                confirmed, requeued = resolve_pending_bookings(pending, room_index)
+                for target_shift, slot_key in confirmed: booking_confirmed(target_shift, slot_key, "verified on the page")
+                for target_shift, slot_key in requeued:
+                    if coordinator is not None: coordinator.release(account_label, target_shift)
+                    log(f"⚠️ WARNING: {slot_key[0]} | {slot_key[1]} is still open after the click. Target stays in the queue.")
+                drop_done_targets(shifts_to_book, coordinator, log)
+                drop_exhausted_targets(room_index, patterns, shifts_to_book, coordinator, log)
+                for pattern, slot in policy.order(match_targets(room_index, live_patterns(patterns, shifts_to_book)), now):
+                    target_shift = pattern.shift
+                    if target_shift not in shifts_to_book or id(target_shift) in pending: continue
+                    claimed = False
                     try:
-                        day_card = page.locator(f'div.arena-day-card:has(h5:has-text("{target_shift["date"]}"))')
-                        shift_container = day_card.locator(f'div.arena_shift_instance:has(div.text-start:has-text("{target_shift["name"]}"))')
-                        if await shift_container.count() == 0: continue
-                        spots_container = shift_container.locator(REMAINING_SPOTS_SELECTOR)
-                        if await spots_container.count() > 0:
-                            if int(await spots_container.get_attribute("data-number")) == 0:
-                                log(f"❌ FULL: {target_shift['date']} | {target_shift['name']}. Removing from targets."); shifts_to_book.remove(target_shift); continue
-                        take_button = shift_container.locator("button.button_hold")
-                        if await take_button.is_visible() and await take_button.is_enabled():
-                            log(f"✅ AVAILABLE: {target_shift['date']} | {target_shift['name']}"); log("🎉 Clicking the 'Book' button NOW!")
-                            await take_button.click(); shifts_to_book.remove(target_shift); booked_one_in_this_cycle = True
-                            if not shifts_to_book: break
-                            log(f"⏳ Shift booked! Waiting for {COOLDOWN_AFTER_BOOKING_SECONDS}s cooldown..."); await asyncio.sleep(COOLDOWN_AFTER_BOOKING_SECONDS)
-                            break
-                    except Exception: continue
-                if not booked_one_in_this_cycle: await asyncio.sleep(SCAN_INTERVAL_SECONDS)
-
+                        if slot["spots"] == 0:
+                            if pattern.exact:
+                                log(RunEvent(EVENT_TARGET_FULL, date=target_shift["date"], name=target_shift["name"])); shifts_to_book.remove(target_shift)
+                                if coordinator is not None: coordinator.mark_done(target_shift)
+                            continue
+                        if slot["bookable"]:
+                            if not constraint_allows(constraints, slot, log, blocked_by_rules):
+                                if coordinator is not None: coordinator.decline(account_label, target_shift)
+                                continue
+                            if not bucket.ready():
+                                waiting_for_token = True; continue
+                            if coordinator is not None:
+                                if not coordinator.claim(account_label, target_shift): continue
+                                claimed = True
+                            log(f"✅ AVAILABLE: {slot['date']} | {slot['name']}" + ("" if pattern.exact else f" (target: {describe_target(target_shift)})") + policy.describe(slot, now))
+                            log(RunEvent(EVENT_BOOKING_CLICKED, date=slot["date"], name=slot["name"], how="click"))
+                            outcome, confirm_ms, detail = await click_and_confirm(slot["page"], slot, CONFIRM_TIMEOUT_SECONDS)
+                            bucket.take(); confirm_stats.record(outcome, confirm_ms)
+                            if coordinator is not None: coordinator.set_busy(account_label, bucket.wait_seconds())
+                            if outcome == BOOKING_REJECTED:
+                                if claimed: coordinator.release(account_label, target_shift)
+                                log(f"⚠️ WARNING: Booking rejected ({detail}). Target stays in the queue."); continue
+                            if outcome == BOOKING_UNKNOWN:
+                                pending[id(target_shift)] = (target_shift, (slot["date"], slot["name"]))
+                                log(f"❔ Booking not confirmed yet ({detail}); checking on the next scan."); continue
+                            booking_confirmed(target_shift, (slot["date"], slot["name"]), detail, confirm_ms)
+                    except Exception as e:
+                        if claimed: coordinator.release(account_label, target_shift)
+                        # The room view is out of date after anything worse than a stale element
+                        if await healer.heal(e, slot.get("page")) != FAILURE_STALE: break
+                        continue
+                if not shifts_to_book: break
+                interval = HEARTBEAT_SECONDS if PUSH_DETECTION else SCAN_INTERVAL_SECONDS
+                if schedule is not None:
+                    message = schedule.phase_change_message()
+                    if message: log(message)
+                    interval = schedule.interval(interval)
+                # Wake exactly when the next booking token is there if an open target is waiting for it
+                if waiting_for_token: interval = min(interval, bucket.wait_seconds())
+                await wait_for_next_scan(wake_event, interval)
+
+            confirm_stats.log_summary(log)
+            healer.log_summary()
+            if room_refresher is not None and room_refresher.checks: log(f"🔄 Room refresh: {room_refresher.summary()}")
+            if push_state is not None and push_state.frames: log(f"📨 Live updates decoded: {push_state.frames} (openings seen: {push_state.openings})")
             # Check why the loop ended
             if stop_event and stop_event.is_set():
-                log("\n🛑 Bot stopped by user.")
-                log("🛑 Bot stopped")
+                log(RunEvent(EVENT_RUN_STOPPED))
+                state.set(RUN_STOPPED)
             else:
-                log("\n🎉 All target shifts processed!")
-                log("--- BOT FINISHED ---")
+                log(RunEvent(EVENT_RUN_FINISHED))
+                state.set(RUN_FINISHED)
+
+            if pool is not None:
+                log("🔥 Browser stays logged in on the room page for the next Start.")
+            elif state.phase == RUN_FINISHED:
+                log("The browser will close in 10 seconds.")
+                await asyncio.sleep(10)
+    except Exception as e:
+        log(RunEvent(EVENT_RUN_FAILED, error=str(e), hint="Bot stopped. Check credentials, room number, or internet."))
+        state.fail(str(e))
+    finally:
+        if coordinator is not None: coordinator.unregister(account_label)
+
+@contextlib.asynccontextmanager
+async def shared_browser_session():
+    """One Chromium for every account run on the loop (each run opens its own BrowserContext in it)."""
+    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(get_playwright_browsers_path())
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False, slow_mo=25)
+        try: yield {"browser": browser}
+        finally: await browser.close()
+
+# ==============================================================================
+# --- 🌐 BROWSERLESS HTTP ENGINE (aiohttp) ---
+# ==============================================================================
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+                "Accept-Language": "ar,en;q=0.8"}
 
-            log("The browser will close in 10 seconds.")
-            await asyncio.sleep(10)
-            await browser.close()
-    except Exception as e: log(f"❌ FATAL ERROR: {e}"); log("Bot stopped. Check credentials, room number, or internet.")
+class RoomPageParser(HTMLParser):
+    """Parse room HTML into the same rows ROOM_SNAPSHOT_JS returns, plus the request each 'Book' button sends."""
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.csrf_token = None
+        self._stack = []  # open tags as (tag, role)
+        self._card = None; self._shift = None; self._form = None; self._text = None
+        self._card_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v if v is not None else "") for k, v in attrs}
+        classes = attrs.get("class", "").split()
+        role = None
+        if tag == "input" and attrs.get("name") == "csrfmiddlewaretoken" and not self.csrf_token:
+            self.csrf_token = attrs.get("value")
+        if tag == "div" and "arena-day-card" in classes:
+            self._card = {"date": None, "index": self._card_count, "shift_count": 0}; self._card_count += 1; role = "card"
+        elif tag == "h5" and self._card is not None and self._card["date"] is None and self._text is None:
+            self._text = []; role = "date"
+        elif tag == "div" and "arena_shift_instance" in classes and self._card is not None:
+            self._shift = {"name": None, "spots": None, "button": None, "index": self._card["shift_count"]}; self._card["shift_count"] += 1; role = "shift"
+        elif tag == "div" and "text-start" in classes and self._shift is not None and self._shift["name"] is None and self._text is None:
+            self._text = []; role = "name"
+        elif tag == "span" and "number-container" in classes and self._shift is not None and self._shift["spots"] is None:
+            self._shift["spots"] = attrs.get("data-number")
+        elif tag == "form":
+            self._form = {"action": attrs.get("action", ""), "method": attrs.get("method", "get").upper(), "fields": {}}; role = "form"
+        elif tag == "input" and self._form is not None and attrs.get("name") and attrs.get("type", "text").lower() not in ("submit", "button"):
+            self._form["fields"][attrs["name"]] = attrs.get("value", "")
+        elif tag == "button" and "button_hold" in classes and self._shift is not None and self._shift["button"] is None:
+            self._shift["button"] = {"attrs": attrs, "form": self._form}
+        if tag not in self.VOID_TAGS:
+            self._stack.append((tag, role))
+
+    def handle_endtag(self, tag):
+        if not any(t == tag for t, _ in self._stack): return  # stray closing tag
+        while self._stack:
+            open_tag, role = self._stack.pop()
+            self._close(role)
+            if open_tag == tag: break
+
+    def handle_data(self, data):
+        if self._text is not None: self._text.append(data)
+
+    def close(self):
+        super().close()
+        while self._stack: self._close(self._stack.pop()[1])
+
+    def _close(self, role):
+        if role == "date":
+            self._card["date"] = " ".join("".join(self._text).split()); self._text = None
+        elif role == "name":
+            self._shift["name"] = " ".join("".join(self._text).split()); self._text = None
+        elif role == "shift":
+            shift, self._shift = self._shift, None
+            button = shift["button"]
+            bookable = False
+            if button is not None:
+                b = button["attrs"]
+                bookable = ("disabled" not in b and b.get("aria-disabled") != "true" and "hidden" not in b
+                            and "d-none" not in b.get("class", "").split() and "display:none" not in b.get("style", "").replace(" ", ""))
+            self.rows.append([self._card["date"] or "", shift["name"] or "", shift["spots"], bookable,
+                              self._card["index"], shift["index"], button])
+        elif role == "card":
+            self._card = None
+        elif role == "form":
+            self._form = None
+
+def parse_room_html(html):
+    """Parse room HTML into (room index, csrf token)."""
+    parser = RoomPageParser()
+    parser.feed(html); parser.close()
+    return build_room_index(parser.rows), parser.csrf_token
+
+def hold_request_for(button, page_url):
+    """Work out (method, url, form data, extra headers) for the request a 'Book' button sends when clicked."""
+    from urllib.parse import urljoin
+    import json as _json
+    attrs, form = button["attrs"], button["form"]
+    for method in ("post", "put", "patch", "delete", "get"):
+        target = attrs.get(f"hx-{method}") or attrs.get(f"data-hx-{method}")
+        if target is not None:
+            data = {}
+            if form is not None and method != "get": data.update(form["fields"])
+            if attrs.get("hx-vals"):
+                try: data.update(_json.loads(attrs["hx-vals"]))
+                except ValueError: pass
+            if attrs.get("name"): data[attrs["name"]] = attrs.get("value", "")
+            return method.upper(), urljoin(page_url, target or page_url), data, {"HX-Request": "true", "HX-Current-URL": page_url}
+    target = attrs.get("formaction") or attrs.get("data-url") or attrs.get("data-href")
+    if target is None and form is not None: target = form["action"]
+    if target is None: return None
+    method = (attrs.get("formmethod") or (form["method"] if form is not None else "POST")).upper()
+    data = dict(form["fields"]) if form is not None else {}
+    if attrs.get("name"): data[attrs["name"]] = attrs.get("value", "")
+    return method, urljoin(page_url, target or page_url), data, {}
+
+def csrf_from_cookies(session, url):
+    """Django keeps the CSRF secret in the 'csrftoken' cookie."""
+    from yarl import URL
+    cookie = session.cookie_jar.filter_cookies(URL(url)).get("csrftoken")
+    return cookie.value if cookie is not None else None
+
+async def http_login(session, username, password):
+    """Log in once with a CSRF token + session cookie. Raises if the site keeps us on the login page."""
+    async with session.get(LOGIN_URL) as response:
+        _, csrf_token = parse_room_html(await response.text())
+    form = {"username": username, "password": password, "csrfmiddlewaretoken": csrf_token or csrf_from_cookies(session, LOGIN_URL) or ""}
+    async with session.post(LOGIN_URL, data=form, headers={"Referer": LOGIN_URL}) as response:
+        await response.read()
+        if "/login/" in str(response.url) or response.status >= 400:
+            raise RuntimeError("Login failed. Check username/password.")
+
+def http_save_session(session, username):
+    """Persist the aiohttp cookie jar so the next run can skip the login."""
+    try:
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        session.cookie_jar.save(session_state_path(username, ".cookies"))
+    except Exception: pass
+
+async def http_restore_session(session, username, shifts_url, log):
+    """Load saved cookies and probe the shifts page. Returns True if the saved session is still logged in."""
+    path = session_state_path(username, ".cookies")
+    if not os.path.exists(path): return False
+    try:
+        session.cookie_jar.load(path)
+        async with session.get(shifts_url) as response:
+            await response.read()
+            if "/login/" not in str(response.url) and response.status < 400:
+                log(RunEvent(EVENT_LOGIN_OK, restored=True))
+                return True
+        log("⌛ Saved session expired. Logging in again...")
+    except Exception:
+        log("⚠️ Saved session could not be used. Logging in again...")
+    session.cookie_jar.clear()
+    try: os.remove(path)
+    except OSError: pass
+    return False
+
+async def http_fetch_room(session, shifts_url):
+    """Fetch and parse the room page. Returns (room index, csrf token)."""
+    async with session.get(shifts_url) as response:
+        if "/login/" in str(response.url): raise RuntimeError("Session expired (redirected to login).")
+        response.raise_for_status()
+        room_index, csrf_token = parse_room_html(await response.text())
+    return room_index, csrf_token or csrf_from_cookies(session, shifts_url)
+
+async def http_fetch_rooms(session, urls):
+    """Fetch several month pages concurrently and merge them; each slot remembers its url and csrf token."""
+    merged = {}
+    results = await asyncio.gather(*(http_fetch_room(session, url) for url in urls), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors and len(errors) == len(results): raise errors[0]
+    for url, result in zip(urls, results):
+        if isinstance(result, RuntimeError) and "Session expired" in str(result): raise result
+        if isinstance(result, Exception): continue
+        room_index, csrf_token = result
+        for key, slot in room_index.items():
+            slot["url"] = url; slot["csrf_token"] = csrf_token
+            merged.setdefault(key, slot)
+    return merged
+
+async def http_send_hold(session, slot, shifts_url, csrf_token, timeout=None):
+    """Send the request the slot's button_hold click would send. Returns (HTTP status, final URL or HX-Redirect)."""
+    spec = hold_request_for(slot["request"], shifts_url) if slot.get("request") else None
+    if spec is None: raise RuntimeError("Could not work out the booking request for this shift.")
+    method, url, data, headers = spec
+    headers = {"Referer": shifts_url, "X-CSRFToken": csrf_token or "", **headers}
+    async with session.request(method, url, data=data if method != "GET" else None, params=data if method == "GET" else None, headers=headers,
+                               **({"timeout": timeout} if timeout is not None else {})) as response:
+        await response.read()
+        return response.status, response.headers.get("HX-Redirect") or str(response.url)
+
+async def run_http_automation(config, shifts_to_book, room_number, cooldown, log_queue, stop_event=None, credentials=None, account_label="", release_at=None, coordinator=None, constraints=None,
+                              state=None):
+    """Browserless engine with the same plumbing as run_automation: log in once, poll the room HTML, send hold requests."""
+    log = run_logger(log_queue, account_label)
+    state = state or RunState(account_label)
+    try:
+        try: import aiohttp
+        except ImportError:
+            log(RunEvent(EVENT_RUN_FAILED, error="The HTTP engine needs aiohttp (run: pip install aiohttp)."))
+            state.fail("aiohttp missing", retryable=False); return
+        MONTH_GROUPS = group_targets_by_month(room_number, shifts_to_book)
+        SHIFTS_URL = MONTH_GROUPS[0][1]
+        credentials = credentials or {}
+        YOUR_USERNAME = credentials.get('username') or config.get('Credentials', 'username', fallback='')
+        YOUR_PASSWORD = credentials.get('password') or config.get('Credentials', 'password', fallback='')
+        if not YOUR_USERNAME or not YOUR_PASSWORD:
+            log(RunEvent(EVENT_RUN_FAILED, error="Missing account credentials."))
+            state.fail("missing credentials", retryable=False); return
+        SCAN_INTERVAL_SECONDS = config.getfloat('Settings', 'http_scan_interval_seconds', fallback=config.getfloat('Settings', 'scan_interval_seconds'))
+        bucket = make_booking_bucket(config, cooldown)
+        CONFIRM_TIMEOUT_SECONDS = config.getfloat('Settings', 'confirm_timeout_seconds', fallback=3.0)
+        schedule = ReleaseSchedule(config, release_at) if release_at else None
+        if schedule is not None and time.time() < schedule.launch_at():
+            log(f"⏰ Waiting to pre-warm at {time.strftime('%H:%M:%S', time.localtime(schedule.launch_at()))} (release at {time.strftime('%H:%M:%S', time.localtime(release_at))})...")
+            await wait_until(schedule.launch_at(), stop_event)
+            if stop_event is not None and stop_event.is_set():
+                log(RunEvent(EVENT_RUN_STOPPED)); return
+        async with aiohttp.ClientSession(headers=HTTP_HEADERS, timeout=aiohttp.ClientTimeout(total=15)) as session:
+            if not await http_restore_session(session, YOUR_USERNAME, SHIFTS_URL, log):
+                log("--- Step 1: Logging in (HTTP, no browser) ---")
+                await http_login(session, YOUR_USERNAME, YOUR_PASSWORD)
+                log(RunEvent(EVENT_LOGIN_OK))
+                http_save_session(session, YOUR_USERNAME)
+            state.set(RUN_LOGGED_IN)
+            log("--- Step 2: Polling shifts page ---")
+            for _, month_url in MONTH_GROUPS: log(f"🔗 URL: {month_url}")
+            if schedule is not None:
+                async def http_date_header():
+                    async with session.head(SHIFTS_URL) as response:
+                        return response.headers.get("Date")
+                schedule.clock_offset = await estimate_clock_offset(http_date_header)
+                log(f"🕒 Server clock offset: {schedule.clock_offset:+.2f}s")
+            log("\n--- Step 3: Starting LIVE SHIFT SCANNING ---")
+            patterns = compile_targets(shifts_to_book)
+            policy = make_booking_policy(config)
+            if policy.name != ListOrderPolicy.name: log(f"🧮 Booking order: {policy.name} (within equal weights)")
+            blocked_by_rules = set()
+            confirm_stats = BookingConfirmStats()
+            pending = {}  # requests without an answer: target id -> (target, slot key)
+            async def relogin(_=None):
+                await http_login(session, YOUR_USERNAME, YOUR_PASSWORD)
+                log(RunEvent(EVENT_LOGIN_OK))
+                http_save_session(session, YOUR_USERNAME)
+            # Network errors only need the backoff; there is no page to reload or reopen
+            healer = RunHealer(log, {FAILURE_SESSION: relogin})
+            state.set(RUN_SCANNING)
+            def booking_confirmed(target_shift, slot_key, detail, confirm_ms=None):
+                shifts_to_book.remove(target_shift)
+                if coordinator is not None: coordinator.mark_done(target_shift)
+                if constraints is not None: constraints.record(*slot_key)
+                log(RunEvent(EVENT_BOOKING_CONFIRMED, date=slot_key[0], name=slot_key[1], detail=detail, confirm_ms=confirm_ms))
+                if shifts_to_book and not bucket.ready(): log(f"⏳ Shift booked! Next booking allowed in {bucket.wait_seconds():.1f}s (still scanning)...")
+            while shifts_to_book and (stop_event is None or not stop_event.is_set()):
+                log(RunEvent(EVENT_SCAN_CYCLE, targets=len(shifts_to_book)))
+                state.set(RUN_SCANNING if bucket.ready() else RUN_COOLDOWN)
+                waiting_for_token = False
+                try: room_index = await http_fetch_rooms(session, [url for _, url in MONTH_GROUPS])
+                except Exception as e:
+                    await healer.heal(e); continue
+                healer.scan_ok()
+                now = time.monotonic(); policy.observe(room_index, now)
+                confirmed, requeued = resolve_pending_bookings(pending, room_index)
+                for target_shift, slot_key in confirmed: booking_confirmed(target_shift, slot_key, "verified on the page")
+                for target_shift, slot_key in requeued:
+                    if coordinator is not None: coordinator.release(account_label, target_shift)
+                    log(f"⚠️ WARNING: {slot_key[0]} | {slot_key[1]} is still open after the request. Target stays in the queue.")
+                drop_done_targets(shifts_to_book, coordinator, log)
+                drop_exhausted_targets(room_index, patterns, shifts_to_book, coordinator, log)
+                for pattern, slot in policy.order(match_targets(room_index, live_patterns(patterns, shifts_to_book)), now):
+                    target_shift = pattern.shift
+                    if target_shift not in shifts_to_book or id(target_shift) in pending: continue
+                    if slot["spots"] == 0:
+                        if pattern.exact:
+                            log(RunEvent(EVENT_TARGET_FULL, date=target_shift["date"], name=target_shift["name"])); shifts_to_book.remove(target_shift)
+                            if coordinator is not None: coordinator.mark_done(target_shift)
+                        continue
+                    if slot["bookable"]:
+                        if not constraint_allows(constraints, slot, log, blocked_by_rules):
+                            if coordinator is not None: coordinator.decline(account_label, target_shift)
+                            continue
+                        if not bucket.ready():
+                            waiting_for_token = True; continue
+                        if coordinator is not None and not coordinator.claim(account_label, target_shift): continue
+                        log(f"✅ AVAILABLE: {slot['date']} | {slot['name']}" + ("" if pattern.exact else f" (target: {describe_target(target_shift)})") + policy.describe(slot, now))
+                        log(RunEvent(EVENT_BOOKING_CLICKED, date=slot["date"], name=slot["name"], how="request"))
+                        started = time.perf_counter(); confirm_ms = None
+                        try:
+                            status, location = await http_send_hold(session, slot, slot["url"], slot["csrf_token"], aiohttp.ClientTimeout(total=CONFIRM_TIMEOUT_SECONDS))
+                            outcome, detail = booking_outcome(status, location); confirm_ms = (time.perf_counter() - started) * 1000
+                        except (aiohttp.ClientConnectorError, RuntimeError) as e:
+                            # Never reached the server (or no request could be built): nothing was booked
+                            if coordinator is not None: coordinator.release(account_label, target_shift)
+                            log(f"⚠️ WARNING: Booking request failed ({e}). Will retry."); continue
+                        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                            outcome, detail = BOOKING_UNKNOWN, str(e) or f"no response within {CONFIRM_TIMEOUT_SECONDS}s"
+                        bucket.take(); confirm_stats.record(outcome, confirm_ms)
+                        if coordinator is not None: coordinator.set_busy(account_label, bucket.wait_seconds())
+                        if outcome == BOOKING_REJECTED:
+                            if coordinator is not None: coordinator.release(account_label, target_shift)
+                            log(f"⚠️ WARNING: Booking request rejected ({detail}). Target stays in the queue."); continue
+                        if outcome == BOOKING_UNKNOWN:
+                            pending[id(target_shift)] = (target_shift, (slot["date"], slot["name"]))
+                            log(f"❔ Booking not confirmed yet ({detail}); checking on the next scan."); continue
+                        booking_confirmed(target_shift, (slot["date"], slot["name"]), detail, confirm_ms)
+                if not shifts_to_book: break
+                interval = SCAN_INTERVAL_SECONDS
+                if schedule is not None:
+                    message = schedule.phase_change_message()
+                    if message: log(message)
+                    interval = schedule.interval(interval)
+                if waiting_for_token: interval = min(interval, bucket.wait_seconds())
+                await asyncio.sleep(interval)
+
+            confirm_stats.log_summary(log)
+            healer.log_summary()
+            if stop_event and stop_event.is_set():
+                log(RunEvent(EVENT_RUN_STOPPED))
+                state.set(RUN_STOPPED)
+            else:
+                log(RunEvent(EVENT_RUN_FINISHED))
+                state.set(RUN_FINISHED)
+    except Exception as e:
+        log(RunEvent(EVENT_RUN_FAILED, error=str(e), hint="Bot stopped. Check credentials, room number, or internet."))
+        state.fail(str(e))
+    finally:
+        if coordinator is not None: coordinator.unregister(account_label)
+
+def account_run_coroutine(config, run, log_queue, stop_event=None, browser=None, pool=None):
+    """Pick the engine an account is configured for ("browser" by default, or "http")."""
+    if run.get("engine") == "http":
+        return run_http_automation(config, run["shifts"], run["room"], run["cooldown"], log_queue, stop_event, credentials=run["credentials"], account_label=run["label"],
+                                   release_at=run.get("release_at"), coordinator=run.get("coordinator"), constraints=run.get("constraints"), state=run.get("state"))
+    return run_automation(config, run["shifts"], run["room"], run["cooldown"], log_queue, stop_event, credentials=run["credentials"], account_label=run["label"],
+                          browser=browser, pool=pool, release_at=run.get("release_at"), coordinator=run.get("coordinator"),
+                          constraints=run.get("constraints"), state=run.get("state"))
+
+# ==============================================================================
+# --- 📚 ROOM CATALOG (cached schedule for offline target checks) ---
+# ==============================================================================
+CATALOG_DIR = os.path.join(get_base_path(), "catalog")
+
+class RoomCatalog:
+    """Every (day heading, shift name, spots) of a room's month page, fetched once over HTTP and kept in
+    catalog/<room>-<year>-<month>.json. Lookups never touch the network: entries older than
+    `ttl_seconds` still answer but count as stale, so the caller can refresh them in the background."""
+    def __init__(self, ttl_seconds=12 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self.months = {}  # (room, year, month) -> {"fetched_at", "rows"} or None (not cached)
+
+    @staticmethod
+    def path(room, year, month): return os.path.join(CATALOG_DIR, f"{room}-{year}-{month:02d}.json")
+
+    def get(self, room, year, month):
+        key = (str(room), year, month)
+        if key not in self.months:
+            try:
+                with open(self.path(*key), 'r', encoding='utf-8') as f: self.months[key] = json.load(f)
+            except (OSError, ValueError): self.months[key] = None
+        return self.months[key]
+
+    def put(self, room, year, month, rows):
+        """Cache one month: rows are [day heading, shift name, spots]."""
+        entry = {"fetched_at": time.time(), "rows": rows}
+        self.months[(str(room), year, month)] = entry
+        try:
+            os.makedirs(CATALOG_DIR, exist_ok=True)
+            with open(self.path(room, year, month), 'w', encoding='utf-8') as f: json.dump(entry, f, ensure_ascii=False)
+        except OSError: pass
+        return entry
+
+    def is_stale(self, entry): return entry is None or time.time() - entry["fetched_at"] > self.ttl_seconds
+
+    def cached_months(self, room):
+        """(year, month) keys cached for a room, on disk or in memory."""
+        keys = {(y, m) for (r, y, m), entry in self.months.items() if r == str(room) and entry is not None}
+        try:
+            for file_name in os.listdir(CATALOG_DIR):
+                parts = file_name[:-5].split("-")
+                if file_name.endswith(".json") and len(parts) == 3 and parts[0] == str(room) and parts[1].isdigit() and parts[2].isdigit():
+                    keys.add((int(parts[1]), int(parts[2])))
+        except OSError: pass
+        return sorted(keys)
+
+    def index(self, room, months):
+        """A room index (as build_room_index makes) over the cached months, or None if none of them is cached."""
+        rows = []; found = False
+        for year, month in months:
+            entry = self.get(room, year, month)
+            if entry is None: continue
+            found = True; rows += [[date, name, spots, False, 0, 0] for date, name, spots in entry["rows"]]
+        return build_room_index(rows) if found else None
+
+    def check(self, room, shift):
+        """Does a target match anything in the cached schedule? Returns (True/False, note), or (None, "")
+        when none of its months is cached. Uses the scan loop's own matching."""
+        import datetime
+        if not room: return None, ""
+        now = datetime.date.today()
+        months = target_months(shift) or [(now.year, now.month)]  # undated targets are looked for on the current month
+        index = self.index(room, months)
+        if index is None: return None, ""
+        if match_targets(index, compile_targets([shift])): return True, ""
+        fetched = min(self.get(room, *key)["fetched_at"] for key in months if self.get(room, *key) is not None)
+        return False, f"Not in the cached schedule of room {room} ({', '.join(f'{y}-{m:02d}' for y, m in months)}, fetched {(time.time() - fetched) / 3600:.0f}h ago)"
+
+    def complete(self, room, kind, prefix, date_text=""):
+        """First cached day ("date") or shift name ("name", on `date_text`'s day when given) starting with prefix."""
+        if not room or not prefix: return None
+        day = parse_shift_date(date_text) if kind == "name" else None
+        months = target_months({"date": date_text}) if day is not None else []
+        index = self.index(room, months or self.cached_months(room)) or {}
+        seen = []
+        for slot in index.values():
+            slot_day = parse_shift_date(slot["date"])
+            if kind == "date": value = slot_day.isoformat() if slot_day is not None else slot["date"]
+            elif day is not None and slot_day != day: continue
+            elif day is None and date_text and date_text.lower() not in slot["date"].lower(): continue
+            else: value = slot["name"]
+            if value not in seen: seen.append(value)
+        prefix = prefix.casefold()
+        return next((value for value in (sorted(seen) if kind == "date" else seen) if value.casefold().startswith(prefix)), None)
+
+async def fetch_room_catalog(catalog, room, months, username, password, log):
+    """Fetch a room's month pages over HTTP (saved session, or a fresh login) and cache each one."""
+    import aiohttp
+    async with aiohttp.ClientSession(headers=HTTP_HEADERS, timeout=aiohttp.ClientTimeout(total=20)) as session:
+        if not await http_restore_session(session, username, get_month_url(room, *months[0]), log):
+            await http_login(session, username, password)
+            http_save_session(session, username)
+        for year, month in months:
+            index, _ = await http_fetch_room(session, get_month_url(room, year, month))
+            catalog.put(room, year, month, [[slot["date"], slot["name"], slot["spots"]] for slot in index.values()])
+            log(f"📚 Catalog: room {room} {year}-{month:02d} has {len(index)} shifts.")
+
+# ==============================================================================
+# --- 🧭 RUN SUPERVISOR (lifecycle states, instant stop, restarts) ---
+# ==============================================================================
+RUN_STARTING = "starting"
+RUN_LOGGED_IN = "logged-in"
+RUN_SCANNING = "scanning"
+RUN_COOLDOWN = "cooldown"
+RUN_STOPPED = "stopped"
+RUN_FAILED = "failed"
+RUN_FINISHED = "finished"
+RUN_ENDED = (RUN_STOPPED, RUN_FAILED, RUN_FINISHED)
+
+class RunState:
+    """Lifecycle of one account run. The engine moves it through starting -> logged-in -> scanning/cooldown;
+    the supervisor settles how it ended. Plain attribute writes, so the GUI thread can read it at any time."""
+    def __init__(self, label):
+        self.label = label
+        self.phase = RUN_STARTING; self.detail = ""; self.since = time.monotonic()
+        self.error = None; self.retryable = True; self.restarts = 0
+
+    def set(self, phase, detail=""):
+        if (phase, detail) != (self.phase, self.detail):
+            self.phase = phase; self.detail = detail; self.since = time.monotonic()
+
+    def fail(self, error, retryable=True):
+        """Record why the engine gave up; the supervisor decides between a restart and RUN_FAILED."""
+        self.error = error; self.retryable = retryable
+
+class RunSupervisor:
+    """Owns every account run of one Start as a task on one event loop (the warm pool's, or its own thread).
+    stop() cancels the tasks, so a run ends within milliseconds even mid-sleep or mid-cooldown.
+    A run that fails is restarted up to `restart_failed_runs` times with the targets it still has,
+    waiting `restart_delay_seconds` (doubling each time) in between."""
+    def __init__(self, config, log_queue):
+        self.log_queue = log_queue
+        self.max_restarts = max(0, config.getint('Settings', 'restart_failed_runs', fallback=2))
+        self.restart_delay = config.getfloat('Settings', 'restart_delay_seconds', fallback=5.0)
+        self.states = {}  # label -> RunState
+        self.loop = None; self._main_task = None; self.stopping = False
+
+    def start(self, runs, make_coroutine, setup=None, loop=None):
+        """Start `make_coroutine(run, **extra)` for every run; `setup` is an async context manager
+        entered once around all runs, yielding the `extra` keyword arguments (e.g. a shared browser)."""
+        for run in runs: run["state"] = self.states[run["label"]] = RunState(run["label"])
+        main = self._main(runs, make_coroutine, setup)
+        if loop is None: threading.Thread(target=asyncio.run, args=(main,), daemon=True).start()
+        else: asyncio.run_coroutine_threadsafe(main, loop)
+
+    def stop(self):
+        """Cancel every run. Safe to call from any thread."""
+        self.stopping = True
+        if self.loop is not None: self.loop.call_soon_threadsafe(lambda: self._main_task and self._main_task.cancel())
+
+    def counts(self):
+        """Number of runs per phase, in lifecycle order."""
+        phases = [state.phase for state in self.states.values()]
+        return {phase: phases.count(phase) for phase in (RUN_STARTING, RUN_LOGGED_IN, RUN_SCANNING, RUN_COOLDOWN, *RUN_ENDED) if phase in phases}
+
+    def active(self):
+        return any(state.phase not in RUN_ENDED for state in self.states.values())
+
+    def log(self, label, message): self.log_queue.put(f"[{label}] {message}" if label else message)
+
+    async def _main(self, runs, make_coroutine, setup):
+        self.loop = asyncio.get_running_loop(); self._main_task = asyncio.current_task()
+        try:
+            if self.stopping: raise asyncio.CancelledError
+            async with contextlib.AsyncExitStack() as stack:
+                extra = await stack.enter_async_context(setup()) if setup is not None else {}
+                await asyncio.gather(*(self._supervise(run, make_coroutine, extra) for run in runs))
+        except asyncio.CancelledError: pass
+        except Exception as e:
+            self.log_queue.put(RunEvent(EVENT_RUN_FAILED, error=str(e), hint="Bot stopped. Could not start the shared browser."))
+            for state in self.states.values():
+                if state.phase not in RUN_ENDED: state.set(RUN_FAILED, str(e))
+        finally:
+            for state in self.states.values():
+                if state.phase not in RUN_ENDED: state.set(RUN_STOPPED)
+
+    async def _supervise(self, run, make_coroutine, extra):
+        state = run["state"]
+        try:
+            while True:
+                state.error = None
+                try: await make_coroutine(run, **extra)
+                except Exception as e:
+                    self.log_queue.put(RunEvent(EVENT_RUN_FAILED, run["label"], error=str(e))); state.fail(str(e))
+                if state.error is None:
+                    if state.phase not in RUN_ENDED: state.set(RUN_FINISHED)
+                    return
+                if not (state.retryable and run["shifts"] and state.restarts < self.max_restarts and not self.stopping):
+                    state.set(RUN_FAILED, state.error); return
+                delay = min(60.0, self.restart_delay * 2 ** state.restarts)
+                state.restarts += 1
+                state.set(RUN_STARTING, f"restart {state.restarts}/{self.max_restarts}")
+                self.log(run["label"], f"🔁 Restarting in {delay:.1f}s (attempt {state.restarts}/{self.max_restarts}, {len(run['shifts'])} target shifts left)...")
+                await asyncio.sleep(delay)
+                # The failed run left the coordinator on exit; join again with the targets that are left
+                if run.get("coordinator") is not None: run["coordinator"].register([run["label"]], run["shifts"])
+        except asyncio.CancelledError:
+            if state.phase not in RUN_ENDED:
+                state.set(RUN_STOPPED); self.log_queue.put(RunEvent(EVENT_RUN_STOPPED, run["label"], by_user=False))
+
+# ==============================================================================
+# --- 🔥 WARM BROWSER POOL (survives Stop/Start) ---
+# ==============================================================================
+class WarmBrowserPool:
+    """One Chromium on a background event loop, keeping a logged-in context per account parked on
+    the room page between runs. Start attaches to it; Stop only pauses scanning."""
+    def __init__(self, config, log_queue):
+        self.log_queue = log_queue
+        self.max_contexts = config.getint('Settings', 'pool_max_contexts', fallback=10)
+        self.idle_seconds = config.getfloat('Settings', 'pool_idle_minutes', fallback=30) * 60
+        self.memory_cap_mb = config.getfloat('Settings', 'pool_memory_cap_mb', fallback=0)  # 0 = no cap
+        self.health_seconds = config.getfloat('Settings', 'pool_health_seconds', fallback=30)
+        self.entries = {}  # username -> {"context", "page", "password", "shifts_url", "in_use", "last_used"}
+        self.loop = asyncio.new_event_loop()
+        self._playwright = None; self._browser = None; self._lock = None
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._maintain(), self.loop)
+
+    def log(self, message): self.log_queue.put(f"[pool] {message}")
+
+    async def _get_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            self.entries.clear()  # contexts died with the old browser
+            if self._playwright is None:
+                os.environ['PLAYWRIGHT_BROWSERS_PATH'] = str(get_playwright_browsers_path())
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=False, slow_mo=25)
+        return self._browser
+
+    async def _healthy(self, entry):
+        try:
+            return not entry["page"].is_closed() and "/login/" not in entry["page"].url and await asyncio.wait_for(entry["page"].evaluate("1"), 5) == 1
+        except Exception:
+            return False
+
+    async def acquire(self, username, password, shifts_url, log):
+        """Return (context, page) for the account on shifts_url, reusing a warm context when possible."""
+        if self._lock is None: self._lock = asyncio.Lock()
+        async with self._lock:
+            entry = self.entries.get(username)
+            if entry is not None and not entry["in_use"] and entry["password"] == password and await self._healthy(entry):
+                entry["in_use"] = True; entry["last_used"] = time.monotonic()
+                if entry["shifts_url"] != shifts_url:
+                    log(f"🔗 URL: {shifts_url}")
+                    await entry["page"].goto(shifts_url); entry["shifts_url"] = shifts_url
+                log("🔥 Attached to warm browser (already logged in on the room page).")
+                return entry["context"], entry["page"]
+            if entry is not None and not entry["in_use"]: await self._evict(username, "replaced")
+            await self._enforce_limits(reserve=1)
+            browser = await self._get_browser()
+        context, page = await open_logged_in_page(browser, shifts_url, username, password, log)
+        self.entries[username] = {"context": context, "page": page, "password": password, "shifts_url": shifts_url,
+                                  "in_use": True, "last_used": time.monotonic()}
+        return context, page
+
+    def release(self, username):
+        """Hand a page back after a run; it stays logged in on the room page."""
+        entry = self.entries.get(username)
+        if entry is not None:
+            entry["in_use"] = False; entry["last_used"] = time.monotonic()
+
+    async def _evict(self, username, reason):
+        entry = self.entries.pop(username, None)
+        if entry is None: return
+        try: await entry["context"].close()
+        except Exception: pass
+        self.log(f"♻️ Closed warm context for {username.split('@')[0][:3]}*** ({reason})")
+
+    async def _memory_mb(self):
+        """JS heap in use across warm pages (Chromium's performance.memory); a cheap stand-in for RSS."""
+        total = 0
+        for entry in list(self.entries.values()):
+            try: total += await entry["page"].evaluate("() => performance.memory ? performance.memory.usedJSHeapSize : 0")
+            except Exception: pass
+        return total / (1024 * 1024)
+
+    async def _enforce_limits(self, reserve=0):
+        """Evict least recently used idle contexts to stay under the context count and memory caps."""
+        idle = sorted((e["last_used"], name) for name, e in self.entries.items() if not e["in_use"])
+        while idle and len(self.entries) + reserve > self.max_contexts:
+            await self._evict(idle.pop(0)[1], "pool full")
+        while idle and self.memory_cap_mb and await self._memory_mb() > self.memory_cap_mb:
+            await self._evict(idle.pop(0)[1], "memory cap")
+
+    async def _maintain(self):
+        """Background health checks: drop idle contexts past the idle timeout and replace dead ones."""
+        while True:
+            await asyncio.sleep(self.health_seconds)
+            if self._lock is None: continue
+            async with self._lock:
+                for username, entry in list(self.entries.items()):
+                    if entry["in_use"]: continue
+                    if time.monotonic() - entry["last_used"] > self.idle_seconds:
+                        await self._evict(username, "idle"); continue
+                    if not await self._healthy(entry):
+                        await self._evict(username, "unhealthy")
+                        try:
+                            context, page = await open_logged_in_page(await self._get_browser(), entry["shifts_url"], username, entry["password"], self.log)
+                            self.entries[username] = {**entry, "context": context, "page": page, "last_used": time.monotonic()}
+                        except Exception as e:
+                            self.log(f"⚠️ WARNING: Could not replace warm context ({e})")
+                await self._enforce_limits()
+
+# ==============================================================================
+# --- 🖼️ UI SCHEDULER (one frame loop, event-driven wakeups) ---
+# ==============================================================================
+class UiScheduler:
+    """The GUI's only timer. Jobs are marked dirty and run together in the next frame (at most one
+    frame per `frame_ms`), in the order they were added, so a job marked by an earlier one still runs
+    in the same frame. Worker threads call wake() instead of being polled; with nothing dirty no timer
+    is pending except a `poll_ms` safety net for the jobs added with poll=True."""
+    WAKE_EVENT = "<<UiWake>>"
+
+    def __init__(self, root, log, frame_ms=16, poll_ms=1000):
+        self.root = root; self.log = log; self.frame_ms = frame_ms; self.poll_ms = poll_ms
+        self.jobs = {}; self.polled = []; self.dirty = set(); self.frame_pending = False
+        self.failing = set()  # jobs whose error was already reported
+        self._wake = threading.Event()
+        root.bind(self.WAKE_EVENT, lambda event: self.mark(*self.polled))
+        # event_generate from another thread waits for the Tk thread, so a waker thread makes the call, not the run
+        threading.Thread(target=self._waker, daemon=True).start()
+
+    def add(self, name, job, poll=False):
+        self.jobs[name] = job
+        if poll: self.polled.append(name)
+
+    def mark(self, *names):
+        """Ask for these jobs in the next frame (Tk thread only)."""
+        self.dirty.update(names)
+        if self.dirty and not self.frame_pending:
+            self.frame_pending = True; self.root.after(self.frame_ms, self._frame)
+
+    def wake(self):
+        """Thread-safe: run the polled jobs soon. Wakes arriving before the frame collapse into one."""
+        self._wake.set()
+
+    def start(self):
+        self.mark(*self.jobs)
+        self.root.after(self.poll_ms, self._poll)
+
+    def _frame(self):
+        self.frame_pending = False
+        for name, job in self.jobs.items():
+            if name in self.dirty:
+                self.dirty.discard(name)
+                try: job(); self.failing.discard(name)
+                except Exception as e:
+                    if name not in self.failing: self.failing.add(name); self.log(f"⚠️ WARNING: UI update '{name}' failed ({e})")
+        if self.dirty: self.mark()
+
+    def _poll(self):
+        self.mark(*self.polled)
+        self.root.after(self.poll_ms, self._poll)
+
+    def _waker(self):
+        while True:
+            self._wake.wait(); self._wake.clear()
+            try: self.root.event_generate(self.WAKE_EVENT, when="tail")
+            except Exception: pass  # window not up yet, or already closed; the poll picks it up
+            time.sleep(self.frame_ms / 1000)
+
+class WakingQueue(queue.Queue):
+    """The log queue: every put also calls `on_put` (the scheduler's wake) so the GUI never has to poll it."""
+    def __init__(self):
+        super().__init__(); self.on_put = None
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.on_put is not None: self.on_put()
+
+# ==============================================================================
+# --- 📋 VIRTUAL LISTS (row pool + diffed updates) ---
+# ==============================================================================
+class VirtualList:
+    """A scrollable list that only keeps the rows that fit in view as widgets and rebinds them to
+    items as the view scrolls. `make_row(parent)` builds one row (its callbacks read `row.index`),
+    `row_state(index, item)` returns what the row should show (any comparable value) and
+    `apply_row(row, state)` pushes a state into the widgets. A refresh only calls apply_row for
+    rows whose state changed, so a reorder touches the two swapped rows and nothing else."""
+    def __init__(self, parent, make_row, row_state, apply_row, height=140, row_height=38, empty_text=None):
+        self.make_row = make_row; self.row_state = row_state; self.apply_row = apply_row
+        self.row_height = row_height
+        self.frame = ctk.CTkFrame(parent, height=height)
+        self.frame.pack_propagate(False)
+        self.scrollbar = ctk.CTkScrollbar(self.frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 2), pady=2)
+        self.body = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.empty_label = ctk.CTkLabel(self.body, text=empty_text, text_color="gray") if empty_text else None
+        self.items = []; self.top = 0; self.visible = max(1, height // row_height)
+        self.rows = []; self.states = []  # row pool and the state each row currently shows (None = hidden)
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        for child in widget.winfo_children(): self.bind_wheel(child)
+
+    def set_items(self, items):
+        self.items = items
+        self.refresh()
+
+    def scroll(self, rows):
+        top = max(0, min(self.top + rows, len(self.items) - self.visible))
+        if top != self.top:
+            self.top = top; self.refresh()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto": self.scroll(round(float(amount) * len(self.items)) - self.top)
+        else: self.scroll(int(amount) * (self.visible if unit == "pages" else 1))
+
+    def on_resize(self, event):
+        if self.rows and self.rows[0].winfo_height() > 1: self.row_height = self.rows[0].winfo_height() + 4  # pady=2 on both sides
+        visible = max(1, event.height // self.row_height)
+        if visible != self.visible:
+            self.visible = visible; self.refresh()
+
+    def refresh(self):
+        """Show items[top:top + visible], touching only rows whose state changed."""
+        self.top = max(0, min(self.top, len(self.items) - self.visible))
+        for slot in range(max(self.visible, len(self.rows))):
+            index = self.top + slot
+            if slot < self.visible and index < len(self.items):
+                if slot == len(self.rows):
+                    row = self.make_row(self.body); self.bind_wheel(row)
+                    self.rows.append(row); self.states.append(None)
+                row = self.rows[slot]; row.index = index
+                state = self.row_state(index, self.items[index])
+                if self.states[slot] is None: row.pack(fill="x", padx=4, pady=2)
+                if state != self.states[slot]:
+                    self.apply_row(row, state); self.states[slot] = state
+            elif slot < len(self.rows) and self.states[slot] is not None:
+                self.rows[slot].pack_forget(); self.states[slot] = None
+        if self.empty_label is not None:
+            if self.items: self.empty_label.pack_forget()
+            else: self.empty_label.pack(pady=6)
+        n = len(self.items)
+        self.scrollbar.set(self.top / n, min(1.0, (self.top + self.visible) / n)) if n else self.scrollbar.set(0.0, 1.0)
+
+# ==============================================================================
+# --- 📜 LIVE LOG PIPELINE (batched, bounded) ---
+# ==============================================================================
+LOG_MAX_LINES = 2000  # the Live Log keeps this many lines; older ones scroll out of the buffer
+LOG_TAG_COLORS = {"success": "#4ade80", "error": "#f87171", "warning": "#fb923c", "tip": "#60a5fa"}
+
+def log_tag(message):
+    """Color tag for a log line (None for plain lines)."""
+    if "✅" in message or "🎉" in message or "BOOKED:" in message: return "success"
+    if "❌" in message or "ERROR" in message or "FATAL" in message: return "error"
+    if "⚠️" in message or "WARNING" in message: return "warning"
+    if "💡" in message or "TIP:" in message: return "tip"
+    return None
+
+class EventBus:
+    """Hands RunEvents to the handlers subscribed to their kind ("*" gets every event). GUI thread only.
+    A failing handler is reported through `log` and does not stop the others."""
+    def __init__(self, log):
+        self.handlers = {}; self.log = log
+
+    def subscribe(self, kind, handler):
+        self.handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, event):
+        for handler in self.handlers.get(event.kind, []) + self.handlers.get("*", []):
+            try: handler(event)
+            except Exception as e: self.log(f"⚠️ WARNING: {event.kind} handler failed ({e})")
+
+class LogCollapser:
+    """Folds each account's scan_cycle heartbeat into a single line with a counter.
+    The line stays open until that account logs anything else; the next heartbeat then starts a new one."""
+    def __init__(self):
+        self.open = {}  # account prefix -> [message, count] of its open scan line
+
+    def fold(self, items):
+        """Turn one batch of queued items (log strings and RunEvents) into entries [key, message, count, continues]:
+        `key` is the account prefix for a scan line (None otherwise) and `continues` says the entry
+        rewrites that account's open line from an earlier batch instead of adding a new one."""
+        entries = []; in_batch = {}  # prefix -> its scan entry in this batch
+        for item in items:
+            message = str(item)
+            if isinstance(item, RunEvent): prefix = f"[{item.label}] " if item.label else ""
+            else: prefix = message[:message.find("] ") + 2] if message.startswith("[") else ""
+            if not (isinstance(item, RunEvent) and item.kind == EVENT_SCAN_CYCLE):
+                self.open.pop(prefix, None); in_batch.pop(prefix, None)
+                entries.append([None, message, 1, False]); continue
+            line = self.open.get(prefix)
+            if line is not None and line[0] == message: line[1] += 1
+            else: line = self.open[prefix] = [message, 1]
+            entry = in_batch.get(prefix)
+            if entry is not None and entry[1] == message: entry[2] = line[1]
+            else:
+                entry = in_batch[prefix] = [prefix, message, line[1], line[1] > 1]
+                entries.append(entry)
+        return entries
+
+    def forget(self, prefix=None):
+        """Close one account's open scan line (or all of them) so the next heartbeat starts a new line."""
+        if prefix is None: self.open.clear()
+        else: self.open.pop(prefix, None)
 
 # ==============================================================================
 # --- 🎨 MAIN GUI APPLICATION CLASS ---
@@ -188,15 +2555,31 @@ class BotApp(ctk.CTk):
         self.config = None
         self.target_shifts = []
         self.accounts = []
-        self.log_queue = queue.Queue()
-        self.bot_threads = []
+        self.log_queue = WakingQueue()
+        self.ui = UiScheduler(self, self.log_queue.put)
+        self.log_queue.on_put = self.ui.wake
+        self.supervisor = None  # RunSupervisor of the current Start
+        self.run_usernames = {}  # run label -> username, for booking_history.jsonl
+        self.browser_pool = None  # WarmBrowserPool, created on first Start when warm_pool is enabled
         self.stop_event = threading.Event()
         self.bot_status = "idle"  # idle, running, stopping
         self.current_theme = "dark"  # Track current theme
         self.presets = self.load_presets()  # Load saved room presets
         self.accounts = self.load_accounts()  # Load saved accounts (multi-account)
         self.log_message_count = 0  # Track number of log messages
+        self.log_collapser = LogCollapser()
+        self.catalog = RoomCatalog()  # TTL set from config once it is loaded
+        self.events = EventBus(self.log_queue.put)
+        self.pending_sounds = set()  # played once per log batch
+        self.events.subscribe(EVENT_BOOKING_CONFIRMED, lambda event: self.pending_sounds.add("success"))
+        self.events.subscribe(EVENT_BOOKING_CONFIRMED, self.record_booking)
+        self.events.subscribe(EVENT_RUN_FAILED, lambda event: self.pending_sounds.add("error"))
+        self.events.subscribe(EVENT_RUN_FINISHED, lambda event: self.pending_sounds.add("complete"))
+        self.events.subscribe(EVENT_SCAN_CYCLE, lambda event: self.ui.mark("progress"))
+        self.log_scan_marks = {}  # account prefix -> (Tk mark at the start of its open scan line, line text)
+        self.log_mark_seq = 0
         self.active_runs = 0  # Track how many account runs are active
+        self._progress_direction = 1
         self.title("Wardyati Shift Booker"); self.geometry("1100x1100"); ctk.set_appearance_mode("dark"); ctk.set_default_color_theme("green")
 
         # Scrollable root container so all sections remain reachable on smaller screens
@@ -255,8 +2638,9 @@ class BotApp(ctk.CTk):
         add_account_btn = ctk.CTkButton(accounts_frame, text="Add Account", command=self.add_account)
         add_account_btn.grid(row=1, column=2, padx=10, pady=6, sticky="ew")
 
-        self.accounts_scroll = ctk.CTkScrollableFrame(accounts_frame, height=140)
-        self.accounts_scroll.grid(row=2, column=0, columnspan=3, padx=10, pady=(4, 10), sticky="nsew")
+        self.accounts_list = VirtualList(accounts_frame, self.make_account_row, self.account_row_state, self.apply_account_row,
+                                         height=140, row_height=44, empty_text="Add at least one account to run the bot.")
+        self.accounts_list.frame.grid(row=2, column=0, columnspan=3, padx=10, pady=(4, 10), sticky="nsew")
         self.refresh_accounts_display()
 
         # Session + add shift
@@ -265,18 +2649,18 @@ class BotApp(ctk.CTk):
         session_frame.grid_columnconfigure(1, weight=1); session_frame.grid_columnconfigure(3, weight=1)
         ctk.CTkLabel(session_frame, text="Room Number", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=10, pady=8, sticky="w")
         self.room_entry = ctk.CTkEntry(session_frame, placeholder_text="e.g., 2761"); self.room_entry.grid(row=0, column=1, padx=10, pady=8, sticky="ew")
-        self.room_entry.bind("<KeyRelease>", lambda e: self.refresh_stats())
+        self.room_entry.bind("<KeyRelease>", lambda e: self.ui.mark("stats"))
         ctk.CTkLabel(session_frame, text="Cooldown (sec)", font=ctk.CTkFont(weight="bold")).grid(row=0, column=2, padx=10, pady=8, sticky="w")
         self.cooldown_entry = ctk.CTkEntry(session_frame, placeholder_text="e.g., 15"); self.cooldown_entry.grid(row=0, column=3, padx=10, pady=8, sticky="ew")
-        self.cooldown_entry.bind("<KeyRelease>", lambda e: self.refresh_stats())
+        self.cooldown_entry.bind("<KeyRelease>", lambda e: self.ui.mark("stats"))
         ctk.CTkLabel(session_frame, text="Date", font=ctk.CTkFont(weight="bold")).grid(row=1, column=0, padx=10, pady=8, sticky="w")
-        self.date_entry = ctk.CTkEntry(session_frame, placeholder_text="Copy exact date from Wardyati (e.g., 2025-12-01)")
+        self.date_entry = ctk.CTkEntry(session_frame, placeholder_text="e.g., 2025-12-01 or a range 2025-12-01..2025-12-15")
         self.date_entry.grid(row=1, column=1, padx=10, pady=8, sticky="ew")
-        self.date_entry.bind("<KeyRelease>", self.validate_inputs); self.date_entry.bind("<Return>", lambda e: self.name_entry.focus())
+        self.date_entry.bind("<KeyRelease>", lambda e: (self.autocomplete_entry(self.date_entry, "date", e), self.ui.mark("validate"))); self.date_entry.bind("<Return>", lambda e: self.name_entry.focus())
         ctk.CTkLabel(session_frame, text="Shift Name", font=ctk.CTkFont(weight="bold")).grid(row=1, column=2, padx=10, pady=8, sticky="w")
-        self.name_entry = ctk.CTkEntry(session_frame, placeholder_text='e.g., "Morning Post"')
+        self.name_entry = ctk.CTkEntry(session_frame, placeholder_text='Exact name, e.g., "Morning Post" (or re:Morning|Evening)')
         self.name_entry.grid(row=1, column=3, padx=10, pady=8, sticky="ew")
-        self.name_entry.bind("<KeyRelease>", self.validate_inputs); self.name_entry.bind("<Return>", lambda e: self.add_shift() if self.add_button.cget("state") == "normal" else None)
+        self.name_entry.bind("<KeyRelease>", lambda e: (self.autocomplete_entry(self.name_entry, "name", e), self.ui.mark("validate"))); self.name_entry.bind("<Return>", lambda e: self.add_shift() if self.add_button.cget("state") == "normal" else None)
         self.validation_label = ctk.CTkLabel(session_frame, text="", font=ctk.CTkFont(size=12))
         self.validation_label.grid(row=2, column=0, columnspan=4, padx=10, pady=(0, 4), sticky="w")
         actions_frame = ctk.CTkFrame(session_frame, fg_color="transparent"); actions_frame.grid(row=3, column=0, columnspan=4, padx=10, pady=(2, 8), sticky="ew")
@@ -287,6 +2671,17 @@ class BotApp(ctk.CTk):
         self.start_button.grid(row=0, column=1, padx=6, pady=4, sticky="ew")
         self.stop_button = ctk.CTkButton(actions_frame, text="🛑 Stop Bot", command=self.stop_bot, height=38, font=ctk.CTkFont(size=15, weight="bold"), fg_color="red", hover_color="darkred", state="disabled")
         self.stop_button.grid(row=0, column=2, padx=6, pady=4, sticky="ew")
+        ctk.CTkLabel(session_frame, text="Release time", font=ctk.CTkFont(weight="bold")).grid(row=4, column=0, padx=10, pady=(0, 8), sticky="w")
+        self.release_entry = ctk.CTkEntry(session_frame, placeholder_text="Optional: when shifts drop, e.g. 20:00 or 2025-12-01 20:00 (bot pre-warms and bursts)")
+        self.release_entry.grid(row=4, column=1, columnspan=3, padx=10, pady=(0, 8), sticky="ew")
+        ctk.CTkLabel(session_frame, text="Weekdays", font=ctk.CTkFont(weight="bold")).grid(row=5, column=0, padx=10, pady=(0, 8), sticky="w")
+        self.weekdays_entry = ctk.CTkEntry(session_frame, placeholder_text="Optional: e.g., Fri, Sat (with a date range)")
+        self.weekdays_entry.grid(row=5, column=1, padx=10, pady=(0, 8), sticky="ew")
+        self.weekdays_entry.bind("<KeyRelease>", lambda e: self.ui.mark("validate"))
+        ctk.CTkLabel(session_frame, text="Weight", font=ctk.CTkFont(weight="bold")).grid(row=5, column=2, padx=10, pady=(0, 8), sticky="w")
+        self.weight_entry = ctk.CTkEntry(session_frame, placeholder_text="Optional: higher is booked first")
+        self.weight_entry.grid(row=5, column=3, padx=10, pady=(0, 8), sticky="ew")
+        self.weight_entry.bind("<KeyRelease>", lambda e: self.ui.mark("validate"))
 
         # Shifts list
         display_frame = ctk.CTkFrame(self.scroll_container, corner_radius=14)
@@ -295,8 +2690,9 @@ class BotApp(ctk.CTk):
         header_frame = ctk.CTkFrame(display_frame, fg_color="transparent"); header_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=8)
         ctk.CTkLabel(header_frame, text="🎯 Target Shifts", font=ctk.CTkFont(size=16, weight="bold")).pack(side="left")
         self.clear_all_button = ctk.CTkButton(header_frame, text="Clear All", width=100, height=30, command=self.clear_all_shifts); self.clear_all_button.pack(side="right")
-        self.shifts_scroll_frame = ctk.CTkScrollableFrame(display_frame, height=140)
-        self.shifts_scroll_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        ctk.CTkButton(header_frame, text="📚 Pick from Catalog", width=150, height=30, command=self.open_catalog_picker).pack(side="right", padx=6)
+        self.shifts_list = VirtualList(display_frame, self.make_shift_row, self.shift_row_state, self.apply_shift_row, height=140, row_height=38)
+        self.shifts_list.frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
 
         # Log panel
         log_frame = ctk.CTkFrame(self.scroll_container, corner_radius=14)
@@ -313,9 +2709,14 @@ class BotApp(ctk.CTk):
         ctk.CTkLabel(log_controls_frame, text="Shortcuts: F5=Start | Esc=Stop | Ctrl+Enter=Add", font=ctk.CTkFont(size=10), text_color="gray70").pack(side="left")
         self.log_textbox = ctk.CTkTextbox(log_frame, state="disabled", font=ctk.CTkFont(size=13), height=500)
         self.log_textbox.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
-        self.update_log_from_queue(); self.after(100, self.initial_setup)
-        # Initialize validation
-        self.validate_inputs()
+        for tag, color in LOG_TAG_COLORS.items(): self.log_textbox.tag_config(tag, foreground=color)
+        # Frame jobs, in the order they run within a frame
+        self.ui.add("validate", self.validate_inputs)
+        self.ui.add("log", self.update_log_from_queue, poll=True)
+        self.ui.add("runs", self.check_run_completion, poll=True)
+        self.ui.add("stats", self.refresh_stats)
+        self.ui.add("progress", self.step_progress_bar)
+        self.ui.start(); self.after(100, self.initial_setup)
 
         # Global keyboard shortcuts
         self.bind("<F5>", self.shortcut_start_bot)
@@ -329,6 +2730,7 @@ class BotApp(ctk.CTk):
     def run_setup_tasks(self):
         self.config = load_or_create_config(self)
         if self.config is None: self.after(100, self.destroy); return
+        self.catalog.ttl_seconds = self.config.getfloat('Settings', 'catalog_ttl_hours', fallback=12) * 3600
         if not self.accounts and self.config is not None and self.config.has_section('Credentials'):
             username = self.config.get('Credentials', 'username', fallback="").strip()
             password = self.config.get('Credentials', 'password', fallback="").strip()
@@ -343,18 +2745,20 @@ class BotApp(ctk.CTk):
     def add_shift(self):
         date = self.date_entry.get().strip(); name = self.name_entry.get().strip()
         if date and name:
-            self.target_shifts.append({"date": date, "name": name})
+            try: shift = make_target(date, name, self.weekdays_entry.get().strip(), self.weight_entry.get().strip())
+            except ValueError as e: self.log_queue.put(f"⚠️ {e}"); return
+            self.target_shifts.append(shift)
             self.update_shifts_display()
-            self.refresh_stats()
             self.date_entry.delete(0, 'end'); self.name_entry.delete(0, 'end'); self.date_entry.focus()
-            self.validate_inputs()  # Reset validation after clearing fields
-            self.log_queue.put(f"✅ Added shift: {date} | {name}")
+            self.weekdays_entry.delete(0, 'end'); self.weight_entry.delete(0, 'end')
+            self.ui.mark("validate")  # Reset validation after clearing fields
+            self.log_queue.put(f"✅ Added shift: {describe_target(shift)}")
         else: self.log_queue.put("⚠️ Please enter both a date and a shift name.")
 
     def validate_inputs(self, event=None):
         date_text = self.date_entry.get().strip()
         name_text = self.name_entry.get().strip()
-        self.refresh_stats()
+        self.ui.mark("stats")
 
         # Reset validation
         self.validation_label.configure(text="", text_color="white")
@@ -378,18 +2782,30 @@ class BotApp(ctk.CTk):
         if len(date_text) < 10:
             self.validation_label.configure(text="⚠️ Date seems too short. Copy full date from Wardyati", text_color="orange")
             self.add_button.configure(state="disabled")
-            self.refresh_stats(); return
+            return
+
+        try: shift = make_target(date_text, name_text, self.weekdays_entry.get().strip(), self.weight_entry.get().strip())
+        except ValueError as e:
+            self.validation_label.configure(text=f"⚠️ {e}", text_color="orange")
+            self.add_button.configure(state="disabled")
+            return
+
+        # Cached room schedule: catches typos now instead of a scan loop that never matches
+        found, note = self.catalog.check(self.room_entry.get().strip(), shift)
+        if found is False:
+            self.validation_label.configure(text=f"⚠️ {note}. Check for typos, or refresh the catalog.", text_color="orange")
+            self.add_button.configure(state="normal")
+            return
 
         # All validations passed
-        self.validation_label.configure(text="✅ Ready to add shift", text_color="green")
+        self.validation_label.configure(text="✅ Found in the room catalog. Ready to add shift" if found else "✅ Ready to add shift", text_color="green")
         self.add_button.configure(state="normal")
-        self.refresh_stats()
 
     def remove_shift(self, index):
         if 0 <= index < len(self.target_shifts):
             removed_shift = self.target_shifts.pop(index)
             self.update_shifts_display()
-            self.refresh_stats()
+            self.ui.mark("stats")
             self.log_queue.put(f"🗑️ Removed shift: {removed_shift['date']} | {removed_shift['name']}")
 
     def move_shift_up(self, index):
@@ -400,7 +2816,7 @@ class BotApp(ctk.CTk):
             self.update_shifts_display()
             shift = self.target_shifts[index-1]
             self.log_queue.put(f"↑ Moved up: {shift['date']} | {shift['name']}")
-            self.refresh_stats()
+            self.ui.mark("stats")
 
     def move_shift_down(self, index):
         """Move shift down in the list (lower priority)"""
@@ -410,7 +2826,7 @@ class BotApp(ctk.CTk):
             self.update_shifts_display()
             shift = self.target_shifts[index+1]
             self.log_queue.put(f"↓ Moved down: {shift['date']} | {shift['name']}")
-            self.refresh_stats()
+            self.ui.mark("stats")
 
     def clear_all_shifts(self):
         if self.target_shifts:
@@ -418,65 +2834,47 @@ class BotApp(ctk.CTk):
             if messagebox.askyesno("Clear All Shifts", f"Are you sure you want to remove all {len(self.target_shifts)} shifts?"):
                 self.target_shifts.clear()
                 self.update_shifts_display()
-                self.refresh_stats()
+                self.ui.mark("stats")
                 self.log_queue.put("🗑️ All shifts cleared.")
         else:
             self.log_queue.put("ℹ️ No shifts to clear.")
 
     def update_shifts_display(self):
-        # Clear existing shift widgets
-        for widget in self.shifts_scroll_frame.winfo_children():
-            widget.destroy()
-
-        # Add each shift as an interactive row
-        for i, shift in enumerate(self.target_shifts):
-            shift_frame = ctk.CTkFrame(self.shifts_scroll_frame)
-            shift_frame.pack(fill="x", padx=5, pady=2)
-
-            # Shift info label
-            info_text = f"{i+1}. {shift['date']} | {shift['name']}"
-            shift_label = ctk.CTkLabel(shift_frame, text=info_text, anchor="w")
-            shift_label.pack(side="left", fill="x", expand=True, padx=10, pady=5)
-
-            # Buttons frame (for reorder and remove)
-            buttons_frame = ctk.CTkFrame(shift_frame)
-            buttons_frame.pack(side="right", padx=5, pady=2)
-
-            # Up button (only if not first)
-            if i > 0:
-                up_btn = ctk.CTkButton(
-                    buttons_frame,
-                    text="↑",
-                    width=25,
-                    height=25,
-                    command=lambda idx=i: self.move_shift_up(idx)
-                )
-                up_btn.pack(side="left", padx=1)
-
-            # Down button (only if not last)
-            if i < len(self.target_shifts) - 1:
-                down_btn = ctk.CTkButton(
-                    buttons_frame,
-                    text="↓",
-                    width=25,
-                    height=25,
-                    command=lambda idx=i: self.move_shift_down(idx)
-                )
-                down_btn.pack(side="left", padx=1)
-
-            # Remove button
-            remove_btn = ctk.CTkButton(
-                buttons_frame,
-                text="❌",
-                width=25,
-                height=25,
-                command=lambda idx=i: self.remove_shift(idx)
-            )
-            remove_btn.pack(side="left", padx=1)
+        """Show the current target list (only rows in view exist; only changed rows are updated)."""
+        self.shifts_list.set_items(self.target_shifts)
 
         # Update clear button state
         self.clear_all_button.configure(state="normal" if self.target_shifts else "disabled")
-        self.refresh_stats()
+        self.ui.mark("stats")
+
+    def make_shift_row(self, parent):
+        """One target-shift row: info label plus ↑/↓/❌ buttons acting on whatever index the row shows."""
+        row = ctk.CTkFrame(parent)
+        row.info_label = ctk.CTkLabel(row, text="", anchor="w")
+        row.info_label.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+
+        # Buttons frame (for reorder and remove)
+        buttons_frame = ctk.CTkFrame(row)
+        buttons_frame.pack(side="right", padx=5, pady=2)
+        row.up_btn = ctk.CTkButton(buttons_frame, text="↑", width=25, height=25, command=lambda: self.move_shift_up(row.index))
+        row.down_btn = ctk.CTkButton(buttons_frame, text="↓", width=25, height=25, command=lambda: self.move_shift_down(row.index))
+        row.remove_btn = ctk.CTkButton(buttons_frame, text="❌", width=25, height=25, command=lambda: self.remove_shift(row.index))
+        row.remove_btn.pack(side="left", padx=1)
+        row.arrows = None
+        return row
+
+    def shift_row_state(self, index, shift):
+        return (f"{index+1}. {describe_target(shift)}", index > 0, index < len(self.target_shifts) - 1)
+
+    def apply_shift_row(self, row, state):
+        text, has_up, has_down = state
+        if row.info_label.cget("text") != text: row.info_label.configure(text=text)
+        # Up only if not first, down only if not last
+        if row.arrows != (has_up, has_down):
+            row.up_btn.pack_forget(); row.down_btn.pack_forget()
+            if has_up: row.up_btn.pack(side="left", padx=1, before=row.remove_btn)
+            if has_down: row.down_btn.pack(side="left", padx=1, before=row.remove_btn)
+            row.arrows = (has_up, has_down)
 
     def refresh_stats(self):
         """Update the quick stat pills (counts/room/cooldown)."""
@@ -501,28 +2899,19 @@ class BotApp(ctk.CTk):
 
         # Control progress bar visibility and animation
         if status == "running":
-            self.progress_bar.grid()
-            self.animate_progress_bar()
+            self.progress_bar.grid()  # steps along with the scan cycles (step_progress_bar)
         elif status in ["idle", "error", "stopping"]:
             self.progress_bar.grid_remove()  # Hide progress bar
         elif status == "initializing":
             self.progress_bar.grid()
             self.progress_bar.set(0.5)  # Static 50% for initialization
 
-    def animate_progress_bar(self):
-        """Animate progress bar with scanning pattern"""
+    def step_progress_bar(self):
+        """Move the scanning indicator one step (0 → 1 → 0). Runs only in frames where a scan cycle
+        was reported, so the bar shows real scanning activity and costs nothing while idle."""
         if self.bot_status != "running":
             return
-
-        # Get current progress
-        current = self.progress_bar.get()
-
-        # Create scanning pattern (0 → 1 → 0)
-        if not hasattr(self, '_progress_direction'):
-            self._progress_direction = 1
-
-        # Update progress
-        next_progress = current + (0.02 * self._progress_direction)
+        next_progress = self.progress_bar.get() + (0.02 * self._progress_direction)
 
         # Reverse direction at endpoints
         if next_progress >= 1.0:
@@ -534,13 +2923,10 @@ class BotApp(ctk.CTk):
 
         self.progress_bar.set(next_progress)
 
-        # Continue animation if still running
-        if self.bot_status == "running":
-            self.after(50, self.animate_progress_bar)  # Update every 50ms
-
     def play_notification_sound(self, sound_type="success"):
         """Play notification sound for important events"""
         try:
+            import winsound  # Windows only; elsewhere the ImportError is ignored below
             if sound_type == "success":
                 # Success sound: High-pitched beep sequence
                 winsound.Beep(800, 200)  # 800Hz for 200ms
@@ -575,6 +2961,7 @@ class BotApp(ctk.CTk):
         self.log_textbox.configure(state="normal")
         self.log_textbox.delete("1.0", "end")
         self.log_textbox.configure(state="disabled")
+        for prefix in list(self.log_scan_marks): self.forget_scan_line(prefix)
         self.log_message_count = 0
         self.update_log_stats()
         self.add_log_message("🗑️ Log cleared.")
@@ -584,45 +2971,64 @@ class BotApp(ctk.CTk):
         self.log_stats_label.configure(text=f"Messages: {self.log_message_count}")
 
     def add_log_message(self, message):
-        """Add a formatted message to the log with timestamp and styling"""
+        """Add a formatted message (a string or a RunEvent) to the log with timestamp and styling"""
+        self.add_log_messages([message])
+
+    def forget_scan_line(self, prefix):
+        """Stop updating an account's scan line in place (it was trimmed, or the log was cleared)."""
+        mark, _ = self.log_scan_marks.pop(prefix, (None, None))
+        if mark is not None: self.log_textbox.mark_unset(mark)
+        self.log_collapser.forget(prefix)
+
+    def add_log_messages(self, messages):
+        """Write a batch of messages (strings or RunEvents) in one pass. Repeated scan lines are folded into a counter,
+        consecutive lines with the same color go in with one insert, and the textbox works as a
+        ring buffer of the newest `log_max_lines` lines (trimmed in steps of a tenth)."""
+        if not messages: return
         import datetime
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-
-        # Format message with timestamp and better spacing
-        formatted_message = f"[{timestamp}] {message}"
-
-        self.log_textbox.configure(state="normal")
-
-        # Add message with appropriate formatting
-        if "✅" in message or "🎉" in message or "BOOKED:" in message:
-            # Success messages in green
-            self.log_textbox.insert("end", formatted_message + "\n", "success")
-        elif "❌" in message or "ERROR" in message or "FATAL" in message:
-            # Error messages in red
-            self.log_textbox.insert("end", formatted_message + "\n", "error")
-        elif "⚠️" in message or "WARNING" in message:
-            # Warning messages in orange
-            self.log_textbox.insert("end", formatted_message + "\n", "warning")
-        elif "💡" in message or "TIP:" in message:
-            # Tips in blue
-            self.log_textbox.insert("end", formatted_message + "\n", "tip")
-        else:
-            # Regular messages
-            self.log_textbox.insert("end", formatted_message + "\n")
-
-        # Configure text tags for colors (if not already done)
-        try:
-            self.log_textbox.tag_config("success", foreground="#4ade80")  # Green
-            self.log_textbox.tag_config("error", foreground="#f87171")    # Red
-            self.log_textbox.tag_config("warning", foreground="#fb923c")  # Orange
-            self.log_textbox.tag_config("tip", foreground="#60a5fa")      # Blue
-        except:
-            pass
-
-        self.log_textbox.see("end")
-        self.log_textbox.configure(state="disabled")
-
-        self.log_message_count += 1
+        max_lines = self.config.getint('Settings', 'log_max_lines', fallback=LOG_MAX_LINES) if self.config else LOG_MAX_LINES
+        entries = self.log_collapser.fold(messages)
+        # New lines that would be trimmed straight away are never inserted
+        new_lines = [i for i, entry in enumerate(entries) if not entry[3]]
+        skip = set(new_lines[:-max_lines])
+        box = self.log_textbox
+        box.configure(state="normal")
+        run_text, run_tag = [], None
+        def flush_run():
+            if run_text: box.insert("end", "".join(run_text), run_tag)
+            run_text.clear()
+        for i, (prefix, message, count, continues) in enumerate(entries):
+            if i in skip:
+                if prefix is not None: self.forget_scan_line(prefix)
+                continue
+            line = f"[{timestamp}] {message}" + (f" (x{count})" if count > 1 else "")
+            tag = log_tag(message)
+            if continues and prefix in self.log_scan_marks:
+                mark = self.log_scan_marks[prefix][0]
+                box.delete(mark, f"{mark} lineend"); box.insert(mark, line, tag)
+                self.log_scan_marks[prefix] = (mark, line); continue
+            if tag != run_tag or prefix is not None:
+                flush_run(); run_tag = tag
+            if prefix is None:
+                run_text.append(line + "\n"); continue
+            # A scan line gets a mark at its start so later heartbeats can rewrite it
+            if prefix in self.log_scan_marks: mark = self.log_scan_marks.pop(prefix)[0]
+            else: self.log_mark_seq += 1; mark = f"scan{self.log_mark_seq}"
+            box.mark_set(mark, box.index("end-1c")); box.mark_gravity(mark, "left")
+            box.insert("end", line + "\n", tag)
+            self.log_scan_marks[prefix] = (mark, line)
+        flush_run()
+
+        lines = int(box.index("end-1c").split(".")[0]) - 1
+        if lines > max_lines + max_lines // 10:
+            box.delete("1.0", f"{lines - max_lines + 1}.0")
+            for prefix, (mark, line) in list(self.log_scan_marks.items()):
+                if box.get(mark, f"{mark} lineend") != line: self.forget_scan_line(prefix)
+        box.see("end")
+        box.configure(state="disabled")
+
+        self.log_message_count += len(messages)
         self.update_log_stats()
 
     def account_display_name(self, account, index=None):
@@ -679,68 +3085,241 @@ class BotApp(ctk.CTk):
         except Exception:
             self.log_queue.put("Гs Л,? WARNING: Unable to save accounts file.")
 
+    def autocomplete_entry(self, entry, kind, event):
+        """Inline completion from the cached room catalog: fill in the rest and select it, so typing on replaces it."""
+        if len(event.char or "") != 1 or not event.char.isprintable(): return
+        text = entry.get()
+        if entry.index("insert") != len(text): return
+        completion = self.catalog.complete(self.room_entry.get().strip(), kind, text, self.date_entry.get().strip())
+        if completion and len(completion) > len(text):
+            entry.delete(0, "end"); entry.insert(0, text + completion[len(text):])
+            entry.select_range(len(text), "end"); entry.icursor(len(text))
+
+    def refresh_catalog(self, room, months, on_done=None):
+        """Fetch catalog months in the background with the first account's login (no browser)."""
+        if not self.accounts:
+            self.log_queue.put("ERROR: Add an account first; the catalog is fetched with its login.")
+            return
+        account = self.accounts[0]
+        def worker():
+            try: asyncio.run(fetch_room_catalog(self.catalog, room, months, account.get("username", ""), account.get("password", ""), self.log_queue.put))
+            except ImportError: self.log_queue.put("ERROR: The room catalog needs aiohttp (run: pip install aiohttp).")
+            except Exception as e: self.log_queue.put(f"⚠️ WARNING: Could not fetch the room catalog ({e})")
+            if on_done is not None: self.after(0, on_done)
+        self.log_queue.put(f"📚 Fetching the schedule of room {room} ({', '.join(f'{y}-{m:02d}' for y, m in months)})...")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def open_catalog_picker(self):
+        """Pick target shifts from the cached room schedule; stale or missing months are fetched in the background."""
+        import datetime
+        room = self.room_entry.get().strip()
+        if not room.isdigit():
+            self.log_queue.put("ERROR: Enter the Room Number first.")
+            return
+        today = datetime.date.today()
+        day = parse_shift_date(self.date_entry.get())
+        start_month = (day.year, day.month) if day is not None else (today.year, today.month)
+
+        picker = ctk.CTkToplevel(self)
+        picker.title(f"Room {room} catalog")
+        picker.geometry("560x520")
+        picker.grab_set()
+
+        top_frame = ctk.CTkFrame(picker, fg_color="transparent"); top_frame.pack(fill="x", padx=12, pady=(12, 4))
+        ctk.CTkLabel(top_frame, text="Month (YYYY-MM)", font=ctk.CTkFont(weight="bold")).pack(side="left")
+        month_entry = ctk.CTkEntry(top_frame, width=90); month_entry.pack(side="left", padx=6)
+        month_entry.insert(0, f"{start_month[0]}-{start_month[1]:02d}")
+        status_label = ctk.CTkLabel(picker, text="", text_color="gray80"); status_label.pack(fill="x", padx=12)
+        filter_entry = ctk.CTkEntry(picker, placeholder_text="Filter by date or name"); filter_entry.pack(fill="x", padx=12, pady=4)
+
+        selected = set()  # (date, name) keys ticked
+        shown = []        # slots currently listed
+        def make_row(parent):
+            row = ctk.CTkFrame(parent, fg_color="transparent")
+            row.var = ctk.BooleanVar(value=False)
+            def toggle():
+                key = (shown[row.index]["date"], shown[row.index]["name"])
+                if row.var.get(): selected.add(key)
+                else: selected.discard(key)
+            row.check = ctk.CTkCheckBox(row, text="", variable=row.var, onvalue=True, offvalue=False, command=toggle)
+            row.check.pack(side="left", padx=4)
+            return row
+        def row_state(index, slot):
+            spots = "" if slot["spots"] is None else f" | {slot['spots']} spots"
+            return (f"{slot['date']} | {slot['name']}{spots}", (slot["date"], slot["name"]) in selected)
+        def apply_row(row, state):
+            row.check.configure(text=state[0]); row.var.set(state[1])
+        shift_list = VirtualList(picker, make_row, row_state, apply_row, height=330, row_height=32, empty_text="Nothing cached for this month yet.")
+        shift_list.frame.pack(fill="both", expand=True, padx=12, pady=4)
+
+        def month_key():
+            try:
+                year, month = (int(part) for part in month_entry.get().strip().split("-"))
+                return (year, month) if 1 <= month <= 12 else None
+            except ValueError: return None
+        def show(fetch_if_stale=True):
+            key = month_key()
+            if key is None:
+                status_label.configure(text="⚠️ Month must look like 2025-12"); return
+            entry = self.catalog.get(room, *key)
+            query = filter_entry.get().strip().casefold()
+            index = self.catalog.index(room, [key]) or {}
+            shown[:] = [slot for slot in index.values() if query in f"{slot['date']} {slot['name']}".casefold()]
+            shift_list.set_items(shown)
+            if entry is None: status_label.configure(text="Not cached yet.")
+            else: status_label.configure(text=f"{len(index)} shifts, fetched {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['fetched_at']))}"
+                                                   + (" (stale)" if self.catalog.is_stale(entry) else ""))
+            if fetch_if_stale and self.catalog.is_stale(entry):
+                status_label.configure(text=status_label.cget("text") + " Refreshing...")
+                self.refresh_catalog(room, [key], on_done=lambda: picker.winfo_exists() and show(fetch_if_stale=False))
+        month_entry.bind("<Return>", lambda e: show())
+        filter_entry.bind("<KeyRelease>", lambda e: show(fetch_if_stale=False))
+        ctk.CTkButton(top_frame, text="Load", width=60, command=show).pack(side="left", padx=4)
+        ctk.CTkButton(top_frame, text="Refresh from site", width=130,
+                      command=lambda: month_key() and self.refresh_catalog(room, [month_key()], on_done=lambda: picker.winfo_exists() and show(fetch_if_stale=False))).pack(side="left", padx=4)
+
+        def add_selected():
+            added = 0
+            for date, name in sorted(selected):
+                day = parse_shift_date(date)
+                shift = make_target(day.isoformat() if day is not None else date, name)
+                if any(s["date"] == shift["date"] and s["name"] == shift["name"] for s in self.target_shifts): continue
+                self.target_shifts.append(shift); added += 1
+            self.update_shifts_display()
+            self.log_queue.put(f"✅ Added {added} shift(s) from the room {room} catalog.")
+            picker.destroy()
+        buttons = ctk.CTkFrame(picker, fg_color="transparent"); buttons.pack(fill="x", padx=12, pady=(4, 12))
+        ctk.CTkButton(buttons, text="Add selected", command=add_selected).pack(side="left", expand=True, fill="x", padx=4)
+        ctk.CTkButton(buttons, text="Close", fg_color="gray", command=picker.destroy).pack(side="left", expand=True, fill="x", padx=4)
+        show()
+
     def refresh_accounts_display(self):
         """Render account rows with shared/custom controls."""
-        for widget in self.accounts_scroll.winfo_children():
-            widget.destroy()
-
-        if not self.accounts:
-            ctk.CTkLabel(self.accounts_scroll, text="Add at least one account to run the bot.", text_color="gray").pack(pady=6)
+        self.accounts_list.set_items(self.accounts)
+
+    def make_account_row(self, parent):
+        """One account row; its controls act on whatever account index the row shows."""
+        row = ctk.CTkFrame(parent)
+        row.title_label = ctk.CTkLabel(row, text="", font=ctk.CTkFont(weight="bold"))
+        row.title_label.pack(side="left", padx=6, pady=6)
+        row.summary_label = ctk.CTkLabel(row, text="", text_color="gray80")
+        row.summary_label.pack(side="left", padx=6)
+
+        row.shared_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(
+            row,
+            text="Use main list",
+            variable=row.shared_var,
+            onvalue=True,
+            offvalue=False,
+            command=lambda: self.toggle_use_shared(row.index, row.shared_var.get())
+        ).pack(side="left", padx=4)
+
+        row.http_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            row,
+            text="No browser (HTTP)",
+            variable=row.http_var,
+            onvalue=True,
+            offvalue=False,
+            command=lambda: self.toggle_http_engine(row.index, row.http_var.get())
+        ).pack(side="left", padx=4)
+
+        # Buttons container for right alignment
+        btns_frame = ctk.CTkFrame(row, fg_color="transparent")
+        btns_frame.pack(side="right", padx=4)
+
+        row.cfg_btn = ctk.CTkButton(btns_frame, text="Config", width=60, command=lambda: self.open_account_config(row.index))
+        row.cfg_btn.pack(side="left", padx=2)
+        ctk.CTkButton(btns_frame, text="Rules", width=60, command=lambda: self.open_account_rules(row.index)).pack(side="left", padx=2)
+        ctk.CTkButton(
+            btns_frame,
+            text="Edit",
+            width=60,
+            fg_color="orange",
+            hover_color="darkorange",
+            command=lambda: self.edit_account_credentials(row.index)
+        ).pack(side="left", padx=2)
+        ctk.CTkButton(
+            btns_frame,
+            text="Remove",
+            width=60,
+            fg_color="red",
+            hover_color="darkred",
+            command=lambda: self.remove_account(row.index)
+        ).pack(side="left", padx=2)
+        return row
+
+    def account_row_state(self, index, account):
+        use_shared = account.get("use_shared", True)
+        summary_text = "Using main room & shift list" if use_shared else f"Custom: room {account.get('room', '—')} | shifts {len(account.get('shifts', []))}"
+        return (f"{index+1}. {account.get('username', '')}", summary_text, use_shared, account.get("engine", "browser") == "http")
+
+    def apply_account_row(self, row, state):
+        title, summary_text, use_shared, http = state
+        row.title_label.configure(text=title); row.summary_label.configure(text=summary_text)
+        row.shared_var.set(use_shared); row.http_var.set(http)
+        row.cfg_btn.configure(state="normal" if not use_shared else "disabled")
+
+    def open_account_rules(self, index):
+        """Open a dialog to set booking rules (limits, rest gap, forbidden sequences) for an account."""
+        if not (0 <= index < len(self.accounts)):
             return
+        account = self.accounts[index]
+        rules = account.get("constraints", {})
 
-        for idx, account in enumerate(self.accounts):
-            row = ctk.CTkFrame(self.accounts_scroll)
-            row.pack(fill="x", padx=4, pady=3)
-
-            title = ctk.CTkLabel(row, text=f"{idx+1}. {account.get('username', '')}", font=ctk.CTkFont(weight="bold"))
-            title.pack(side="left", padx=6, pady=6)
-
-            summary_text = "Using main room & shift list" if account.get("use_shared", True) else f"Custom: room {account.get('room', '—')} | shifts {len(account.get('shifts', []))}"
-            ctk.CTkLabel(row, text=summary_text, text_color="gray80").pack(side="left", padx=6)
-
-            shared_var = ctk.BooleanVar(value=account.get("use_shared", True))
-            toggle = ctk.CTkCheckBox(
-                row,
-                text="Use main list",
-                variable=shared_var,
-                onvalue=True,
-                offvalue=False,
-                command=lambda i=idx, var=shared_var: self.toggle_use_shared(i, var.get())
-            )
-            toggle.pack(side="left", padx=4)
-
-            # Buttons container for right alignment
-            btns_frame = ctk.CTkFrame(row, fg_color="transparent")
-            btns_frame.pack(side="right", padx=4)
-
-            cfg_btn = ctk.CTkButton(
-                btns_frame,
-                text="Config",
-                width=60,
-                command=lambda i=idx: self.open_account_config(i),
-                state="normal" if not account.get("use_shared", True) else "disabled"
-            )
-            cfg_btn.pack(side="left", padx=2)
-
-            edit_btn = ctk.CTkButton(
-                btns_frame,
-                text="Edit",
-                width=60,
-                fg_color="orange",
-                hover_color="darkorange",
-                command=lambda i=idx: self.edit_account_credentials(i)
-            )
-            edit_btn.pack(side="left", padx=2)
-
-            remove_btn = ctk.CTkButton(
-                btns_frame,
-                text="Remove",
-                width=60,
-                fg_color="red",
-                hover_color="darkred",
-                command=lambda i=idx: self.remove_account(i)
-            )
-            remove_btn.pack(side="left", padx=2)
+        rules_window = ctk.CTkToplevel(self)
+        rules_window.title(f"Booking Rules: {self.account_display_name(account, index)}")
+        rules_window.geometry("520x460")
+        rules_window.transient(self)
+        rules_window.grab_set()
+
+        form_frame = ctk.CTkFrame(rules_window)
+        form_frame.pack(fill="both", expand=True, padx=12, pady=10)
+        form_frame.grid_columnconfigure(1, weight=1)
+
+        def field(row, label, value, placeholder):
+            ctk.CTkLabel(form_frame, text=label, font=ctk.CTkFont(weight="bold")).grid(row=row, column=0, padx=6, pady=6, sticky="w")
+            entry = ctk.CTkEntry(form_frame, placeholder_text=placeholder)
+            if value: entry.insert(0, str(value))
+            entry.grid(row=row, column=1, padx=6, pady=6, sticky="ew")
+            return entry
+
+        week_entry = field(0, "Max shifts / week", rules.get("max_per_week", ""), "blank = no limit")
+        month_entry = field(1, "Max shifts / month", rules.get("max_per_month", ""), "blank = no limit")
+        rest_entry = field(2, "Min rest (hours)", rules.get("min_rest_hours", ""), "e.g., 11 (needs shift hours)")
+        hours_entry = field(3, "Shift hours", rules.get("shift_hours", ""), "Morning=08:00-16:00; Night=20:00-08:00")
+        forbidden_entry = field(4, "Forbidden next-day", rules.get("forbidden", ""), "Night>Morning; Night>Mid")
+        one_per_day_var = ctk.BooleanVar(value=bool(rules.get("one_per_day", False)))
+        ctk.CTkCheckBox(form_frame, text="No two shifts on the same day", variable=one_per_day_var).grid(row=5, column=0, columnspan=2, padx=6, pady=8, sticky="w")
+
+        def save_rules():
+            new_rules = {
+                "max_per_week": week_entry.get().strip(),
+                "max_per_month": month_entry.get().strip(),
+                "min_rest_hours": rest_entry.get().strip(),
+                "shift_hours": hours_entry.get().strip(),
+                "forbidden": forbidden_entry.get().strip(),
+                "one_per_day": bool(one_per_day_var.get())
+            }
+            for key in ("max_per_week", "max_per_month"):
+                if new_rules[key] and not new_rules[key].isdigit():
+                    messagebox.showerror("Invalid rule", "Limits must be whole numbers.")
+                    return
+            try:
+                BookingConstraints(new_rules)
+            except ValueError as e:
+                messagebox.showerror("Invalid rule", str(e))
+                return
+            account["constraints"] = new_rules
+            self.save_accounts()
+            self.log_queue.put(f"Saved booking rules for {self.account_display_name(account, index)}")
+            rules_window.destroy()
+
+        button_bar = ctk.CTkFrame(rules_window)
+        button_bar.pack(fill="x", padx=12, pady=10)
+        ctk.CTkButton(button_bar, text="Save Rules", command=save_rules).pack(side="left", padx=6)
+        ctk.CTkButton(button_bar, text="Cancel", fg_color="gray", hover_color="darkgray", command=rules_window.destroy).pack(side="right", padx=6)
 
     def edit_account_credentials(self, index):
         """Open a dialog to edit account username/password."""
@@ -824,6 +3403,12 @@ class BotApp(ctk.CTk):
             self.save_accounts()
             self.refresh_accounts_display()
 
+    def toggle_http_engine(self, index, use_http):
+        """Switch an account between the browser engine and the browserless HTTP engine."""
+        if 0 <= index < len(self.accounts):
+            self.accounts[index]["engine"] = "http" if use_http else "browser"
+            self.save_accounts()
+
     def open_account_config(self, index):
         """Open a small dialog to set custom room/cooldown/shifts for an account."""
         if not (0 <= index < len(self.accounts)):
@@ -861,6 +3446,12 @@ class BotApp(ctk.CTk):
         ctk.CTkLabel(shift_frame, text="Shift Name", font=ctk.CTkFont(weight="bold")).grid(row=0, column=2, padx=6, pady=4, sticky="w")
         shift_name_entry = ctk.CTkEntry(shift_frame, placeholder_text="Morning Post")
         shift_name_entry.grid(row=0, column=3, padx=6, pady=4, sticky="ew")
+        ctk.CTkLabel(shift_frame, text="Weekdays", font=ctk.CTkFont(weight="bold")).grid(row=1, column=0, padx=6, pady=4, sticky="w")
+        shift_weekdays_entry = ctk.CTkEntry(shift_frame, placeholder_text="Optional: Fri, Sat")
+        shift_weekdays_entry.grid(row=1, column=1, padx=6, pady=4, sticky="ew")
+        ctk.CTkLabel(shift_frame, text="Weight", font=ctk.CTkFont(weight="bold")).grid(row=1, column=2, padx=6, pady=4, sticky="w")
+        shift_weight_entry = ctk.CTkEntry(shift_frame, placeholder_text="Optional")
+        shift_weight_entry.grid(row=1, column=3, padx=6, pady=4, sticky="ew")
         shift_frame.grid_columnconfigure(1, weight=1); shift_frame.grid_columnconfigure(3, weight=1)
 
         shifts_scroll = ctk.CTkScrollableFrame(config_window, height=220)
@@ -875,7 +3466,7 @@ class BotApp(ctk.CTk):
             for i, shift in enumerate(shifts_local):
                 row_local = ctk.CTkFrame(shifts_scroll)
                 row_local.pack(fill="x", padx=4, pady=2)
-                ctk.CTkLabel(row_local, text=f"{i+1}. {shift['date']} | {shift['name']}").pack(side="left", padx=6)
+                ctk.CTkLabel(row_local, text=f"{i+1}. {describe_target(shift)}").pack(side="left", padx=6)
                 ctk.CTkButton(row_local, text="Remove", width=70, fg_color="red", hover_color="darkred",
                               command=lambda idx=i: (shifts_local.pop(idx), refresh_shifts_local())).pack(side="right", padx=4)
 
@@ -883,9 +3474,15 @@ class BotApp(ctk.CTk):
             date_text = shift_date_entry.get().strip()
             name_text = shift_name_entry.get().strip()
             if date_text and name_text:
-                shifts_local.append({"date": date_text, "name": name_text})
+                try: shift = make_target(date_text, name_text, shift_weekdays_entry.get().strip(), shift_weight_entry.get().strip())
+                except ValueError as e:
+                    messagebox.showerror("Invalid shift", str(e))
+                    return
+                shifts_local.append(shift)
                 shift_date_entry.delete(0, 'end')
                 shift_name_entry.delete(0, 'end')
+                shift_weekdays_entry.delete(0, 'end')
+                shift_weight_entry.delete(0, 'end')
                 refresh_shifts_local()
             else:
                 messagebox.showerror("Missing data", "Please enter both date and shift name.")
@@ -1016,7 +3613,7 @@ class BotApp(ctk.CTk):
             self.cooldown_entry.insert(0, str(preset_data['cooldown']))
             self.target_shifts = preset_data.get('shifts', []).copy()
             self.update_shifts_display()
-            self.refresh_stats()
+            self.ui.mark("stats")
             presets_window.destroy()
             self.log_queue.put(f"📋 Loaded preset: {preset_name}")
 
@@ -1163,19 +3760,20 @@ class BotApp(ctk.CTk):
             self.stop_bot()
 
     def stop_bot(self):
-        running = any(t.is_alive() for t in self.bot_threads)
+        running = self.supervisor is not None and self.supervisor.active()
         if running:
             from tkinter import messagebox
             if messagebox.askyesno("Stop Bot", "Are you sure you want to stop the bot?"):
                 self.update_status("stopping", "Stopping bot...")
                 self.stop_event.set()
+                self.supervisor.stop()
                 self.log_queue.put("dY>` Stopping bot...")
                 self.stop_button.configure(state="disabled")
         else:
             self.log_queue.put("No bot is currently running.")
 
     def start_bot_thread(self):
-        if any(t.is_alive() for t in self.bot_threads):
+        if self.supervisor is not None and self.supervisor.active():
             self.log_queue.put("Bot is already running.")
             return
 
@@ -1186,6 +3784,17 @@ class BotApp(ctk.CTk):
         shared_room = self.room_entry.get().strip()
         shared_cooldown = self.cooldown_entry.get().strip()
         shared_shifts = self.target_shifts.copy()
+        try: release_at = parse_release_time(self.release_entry.get())
+        except ValueError:
+            self.log_queue.put("ERROR: Release time must look like 20:00 or 2025-12-01 20:00.")
+            return
+        if release_at is not None and release_at < time.time() - 60:
+            self.log_queue.put("ERROR: Release time is in the past.")
+            return
+        try: make_booking_policy(self.config)
+        except ValueError as e:
+            self.log_queue.put(f"ERROR: {e}")
+            return
 
         runs = []
         for idx, account in enumerate(self.accounts):
@@ -1206,7 +3815,7 @@ class BotApp(ctk.CTk):
                 if not shared_shifts:
                     self.log_queue.put("ERROR: Add at least one shift to the main list (or switch the account to custom).")
                     return
-                runs.append({"room": shared_room, "cooldown": int(shared_cooldown), "shifts": shared_shifts.copy(), "credentials": account, "label": label})
+                runs.append({"room": shared_room, "cooldown": int(shared_cooldown), "shifts": shared_shifts.copy(), "credentials": account, "label": label, "engine": account.get("engine", "browser"), "release_at": release_at, "shared": True})
             else:
                 room_val = str(account.get("room", "")).strip()
                 cooldown_val = str(account.get("cooldown", "")).strip()
@@ -1223,7 +3832,25 @@ class BotApp(ctk.CTk):
                 if not shifts_val:
                     self.log_queue.put(f"ERROR: Add shifts to account {label} or switch it to shared mode.")
                     return
-                runs.append({"room": room_val, "cooldown": int(cooldown_val), "shifts": shifts_val.copy(), "credentials": account, "label": label})
+                runs.append({"room": room_val, "cooldown": int(cooldown_val), "shifts": shifts_val.copy(), "credentials": account, "label": label, "engine": account.get("engine", "browser"), "release_at": release_at, "shared": False})
+
+        # Compile target patterns and rules up front so a typo stops Start instead of an account
+        for run in runs:
+            try: compile_targets(run["shifts"])
+            except ValueError as e:
+                self.log_queue.put(f"ERROR: Target shifts for account {run['label']}: {e}")
+                return
+            try: constraints = BookingConstraints(run["credentials"].get("constraints"))
+            except ValueError as e:
+                self.log_queue.put(f"ERROR: Rules for account {run['label']}: {e}")
+                return
+            if not constraints.is_empty():
+                # Shifts booked on earlier Starts count toward this one's limits
+                constraints.seed(load_booking_history(run["credentials"].get("username", "")))
+            run["constraints"] = None if constraints.is_empty() else constraints
+            for shift in run["shifts"]:
+                found, note = self.catalog.check(run["room"], shift)
+                if found is False: self.log_queue.put(f"⚠️ WARNING: {describe_target(shift)}: {note}.")
 
         from tkinter import messagebox
         message_lines = [f"Accounts to start: {len(runs)}"]
@@ -1231,58 +3858,83 @@ class BotApp(ctk.CTk):
         message_lines.append(f"- Shared config: {shared_mode_accounts}")
         message_lines.append(f"- Custom config: {len(runs) - shared_mode_accounts}")
         message_lines.append(f"Shared room: {shared_room or 'n/a'} | cooldown: {shared_cooldown or 'n/a'}")
+        if release_at is not None:
+            message_lines.append(f"Release time: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(release_at))}")
         if not messagebox.askyesno("Confirm Start Bot", "\n".join(message_lines)):
             return
 
+        # Accounts on the main list share one coordinator so they don't race for the same shifts
+        shared_runs = [r for r in runs if r["shared"]]
+        if len(shared_runs) > 1 and self.config.getboolean('Settings', 'coordinate_accounts', fallback=True):
+            coordinator = TargetCoordinator()
+            coordinator.register([r["label"] for r in shared_runs], shared_shifts)
+            for r in shared_runs: r["coordinator"] = coordinator
+
         self.stop_event.clear()
         self.update_status("running", "Bot is scanning for shifts...")
         self.start_button.configure(state="disabled", text=f"Running {len(runs)} account(s)...")
         self.add_button.configure(state="disabled")
         self.stop_button.configure(state="normal")
-        self.refresh_stats()
+        self.ui.mark("stats")
         self.active_runs = len(runs)
-        self.bot_threads = []
 
-        for run in runs:
-            thread = threading.Thread(target=lambda r=run: asyncio.run(run_automation(self.config, r["shifts"], r["room"], r["cooldown"], self.log_queue, self.stop_event, credentials=r["credentials"], account_label=r["label"])), daemon=True)
-            self.bot_threads.append(thread)
-            thread.start()
+        self.run_usernames = {run["label"]: run["credentials"].get("username", "") for run in runs}
+        # Every account run is a task on one event loop, owned by the supervisor
+        self.supervisor = RunSupervisor(self.config, self.log_queue)
+        if self.config.getboolean('Settings', 'warm_pool', fallback=False):
+            # Runs execute on the pool's loop so their pages outlive the run
+            if self.browser_pool is None: self.browser_pool = WarmBrowserPool(self.config, self.log_queue)
+            pool = self.browser_pool
+            self.supervisor.start(runs, lambda r: account_run_coroutine(self.config, r, self.log_queue, self.stop_event, pool=pool), loop=pool.loop)
+        elif self.config.getboolean('Settings', 'shared_browser', fallback=False):
+            # One Chromium for all accounts; each account gets its own BrowserContext
+            self.supervisor.start(runs, lambda r, browser: account_run_coroutine(self.config, r, self.log_queue, self.stop_event, browser=browser), setup=shared_browser_session)
+        else:
+            self.supervisor.start(runs, lambda r: account_run_coroutine(self.config, r, self.log_queue, self.stop_event))
 
     def check_run_completion(self):
-        """Reset UI when all automation threads have finished."""
-        self.bot_threads = [t for t in self.bot_threads if t.is_alive()]
-        self.active_runs = len(self.bot_threads)
-        if not self.bot_threads:
-            if self.bot_status != "error":
-                self.update_status("idle", "Ready to start")
-            self.start_button.configure(state="normal", text="Start Bot")
-            self.add_button.configure(state="normal")
-            self.stop_button.configure(state="disabled")
+        """Follow the supervisor's run states; reset the UI once every account run has ended."""
+        if self.supervisor is None: return
+        counts = self.supervisor.counts()
+        self.active_runs = sum(n for phase, n in counts.items() if phase not in RUN_ENDED)
+        if self.active_runs:
+            if self.bot_status == "running":
+                text = "Running: " + ", ".join(f"{n} {phase}" for phase, n in counts.items())
+                if self.status_text.cget("text") != text: self.status_text.configure(text=text)
+            return
+        self.supervisor = None
+        if counts.get(RUN_FAILED): self.update_status("error", f"{counts[RUN_FAILED]} account run(s) failed")
+        else: self.update_status("idle", "Ready to start")
+        self.start_button.configure(state="normal", text="Start Bot")
+        self.add_button.configure(state="normal")
+        self.stop_button.configure(state="disabled")
+
+    def record_booking(self, event):
+        """Append a confirmed booking to booking_history.jsonl."""
+        try:
+            with open(BOOKING_HISTORY_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "account": event.label, "username": self.run_usernames.get(event.label),
+                                    "date": event.data.get("date"),
+                                    "name": event.data.get("name"), "detail": event.data.get("detail"), "confirm_ms": event.data.get("confirm_ms")},
+                                   ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.log_queue.put(f"⚠️ WARNING: Could not save booking history ({e})")
 
     def update_log_from_queue(self):
+        """Frame job: move everything queued since the last frame into the log as one batch,
+        publishing the RunEvents in it to the GUI's subscribers."""
+        batch = []
         try:
-            while True:
-                message = self.log_queue.get_nowait()
-                # Use the new formatted logging method
-                self.add_log_message(message)
-
-                # Play sound notifications for important events
-                if "🎉 Shift booked successfully!" in message or "✅ BOOKED:" in message:
-                    # Play success sound in background thread
-                    threading.Thread(target=lambda: self.play_notification_sound("success"), daemon=True).start()
-                elif "FATAL ERROR" in message or "Setup Failed" in message:
-                    # Play error sound in background thread
-                    threading.Thread(target=lambda: self.play_notification_sound("error"), daemon=True).start()
-                elif "BOT FINISHED" in message and "🎉 All target shifts processed!" in message:
-                    # Play completion sound in background thread
-                    threading.Thread(target=lambda: self.play_notification_sound("complete"), daemon=True).start()
-
-                if "BOT FINISHED" in message or "FATAL ERROR" in message or "Setup Failed" in message or "🛑 Bot stopped" in message:
-                    if "FATAL ERROR" in message or "Setup Failed" in message:
-                        self.update_status("error", "Error occurred")
-                    self.check_run_completion()
+            while True: batch.append(self.log_queue.get_nowait())
         except queue.Empty: pass
-        finally: self.after(100, self.update_log_from_queue)
+        if batch: self.ui.mark("runs")
+        for item in batch:
+            if isinstance(item, RunEvent): self.events.publish(item)
+        self.add_log_messages(batch)
+        for sound in self.pending_sounds:
+            # Play in a background thread so the GUI never waits on the speaker
+            threading.Thread(target=lambda sound=sound: self.play_notification_sound(sound), daemon=True).start()
+        self.pending_sounds.clear()
 
 # ==============================================================================
 # --- 🚀 SCRIPT EXECUTION ---
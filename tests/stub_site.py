@@ -0,0 +1,182 @@
+"""A local stand-in for wardyati.com (aiohttp.web) for the tests and benchmarks: login with a CSRF
+token and a session cookie, one room page rendered in the markup of fixtures/room_page.html,
+hold requests with scripted outcomes, and WebSocket / XHR endpoints replaying recorded push frames."""
+import asyncio
+import json
+import os
+import secrets
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), 'r', encoding='utf-8') as f: return f.read()
+
+HOLD_OK, HOLD_REJECT, HOLD_EXPIRE = "ok", "reject", "expire"
+
+# The push client the page runs when `push` is on: one WebSocket plus one XHR poll, like the live room
+PUSH_CLIENT_JS = """
+<script>
+  const socket = new WebSocket(`ws://${location.host}/rooms/ROOM/ws/`);
+  socket.onmessage = () => {};
+  setTimeout(() => fetch(`/rooms/ROOM/updates/`, {headers: {"HX-Request": "true"}}), 50);
+</script>
+"""
+
+class StubSite:
+    """`days` is {day heading: [{"id", "name", "spots", "open"}]}; a shift's button is enabled while
+    "open" is true. `hold_outcomes` scripts the answers to the next hold requests (HOLD_OK once it
+    runs out): HOLD_REJECT answers 409, HOLD_EXPIRE drops the session and redirects to the login page."""
+    def __init__(self, days, room="1", username="nurse@example.com", password="secret", push_frames=(), push=False):
+        self.days = days; self.room = room
+        self.username = username; self.password = password
+        self.push_frames = list(push_frames); self.push = push
+        self.hold_outcomes = []
+        self.sessions = set()
+        self.logins = 0; self.room_requests = 0
+        self.holds = []  # (shift id, X-CSRFToken header, csrftoken cookie)
+        self.url = None
+        self._runner = None
+
+    # --- state -------------------------------------------------------------------
+    def shift(self, shift_id):
+        return next(s for shifts in self.days.values() for s in shifts if s["id"] == shift_id)
+
+    def set_shift(self, shift_id, **values):
+        self.shift(shift_id).update(values)
+
+    def new_session(self):
+        token = secrets.token_hex(16); self.sessions.add(token)
+        return token
+
+    # --- pages -------------------------------------------------------------------
+    def render_room(self, csrf_token):
+        cards = []
+        for heading, shifts in self.days.items():
+            instances = []
+            for s in shifts:
+                disabled = "" if s.get("open") else " disabled"
+                instances.append(f"""
+            <div class="arena_shift_instance d-flex justify-content-between align-items-center">
+              <div class="text-start">{s["name"]}</div>
+              <span class="number-container badge" data-number="{s["spots"]}">{s["spots"]}</span>
+              <button class="btn btn-sm btn-outline-primary button_hold"{disabled}
+                      hx-post="/rooms/{self.room}/shift-instances/{s["id"]}/hold/" hx-target="closest .arena_shift_instance" hx-swap="outerHTML">حجز</button>
+            </div>""")
+            cards.append(f"""
+        <div class="arena-day-card card mb-3">
+          <div class="card-header"><h5 class="mb-0">{heading}</h5></div>
+          <div class="card-body">{"".join(instances)}
+          </div>
+        </div>""")
+        push_client = PUSH_CLIENT_JS.replace("ROOM", self.room) if self.push else ""
+        return f"""<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head><meta charset="utf-8"><title>الغرفة {self.room} | وردياتي</title></head>
+<body hx-headers='{{"X-CSRFToken": "{csrf_token}"}}'>
+  <form method="post" action="/logout/"><input type="hidden" name="csrfmiddlewaretoken" value="{csrf_token}"></form>
+  <main class="container my-3">{"".join(cards)}
+  </main>{push_client}
+</body>
+</html>"""
+
+    def _logged_in(self, request):
+        return request.cookies.get("sessionid") in self.sessions
+
+    def _csrf_cookie(self, request, response):
+        token = request.cookies.get("csrftoken")
+        if not token:
+            token = secrets.token_hex(16); response.set_cookie("csrftoken", token)
+        return token
+
+    def _to_login(self, request):
+        return web.HTTPFound(f"/login/?next={request.path}")
+
+    async def login_page(self, request):
+        response = web.Response(content_type="text/html")
+        response.text = read_fixture("login_page.html").replace("{csrf_token}", self._csrf_cookie(request, response))
+        return response
+
+    async def login(self, request):
+        form = await request.post()
+        if (form.get("csrfmiddlewaretoken") != request.cookies.get("csrftoken")
+                or (form.get("username"), form.get("password")) != (self.username, self.password)):
+            return await self.login_page(request)  # Django re-renders the form with the errors
+        self.logins += 1
+        response = web.HTTPFound(request.query.get("next") or "/")
+        response.set_cookie("sessionid", self.new_session())
+        raise response
+
+    async def home(self, request):
+        if not self._logged_in(request): raise self._to_login(request)
+        return web.Response(text="<h1>وردياتي</h1>", content_type="text/html")
+
+    async def room_page(self, request):
+        if not self._logged_in(request): raise self._to_login(request)
+        self.room_requests += 1
+        response = web.Response(content_type="text/html")
+        response.text = self.render_room(self._csrf_cookie(request, response))
+        return response
+
+    async def hold(self, request):
+        if not self._logged_in(request): raise self._to_login(request)
+        shift_id = int(request.match_info["shift_id"])
+        self.holds.append((shift_id, request.headers.get("X-CSRFToken"), request.cookies.get("csrftoken")))
+        if request.headers.get("X-CSRFToken") != request.cookies.get("csrftoken"):
+            return web.Response(status=403, text="CSRF verification failed.")
+        outcome = self.hold_outcomes.pop(0) if self.hold_outcomes else HOLD_OK
+        if outcome == HOLD_EXPIRE:
+            self.sessions.discard(request.cookies.get("sessionid"))
+            raise self._to_login(request)
+        shift = self.shift(shift_id)
+        if outcome == HOLD_REJECT or not shift.get("open") or shift["spots"] <= 0:
+            return web.Response(status=409, text="This shift is no longer available.")
+        shift["spots"] -= 1; shift["open"] = shift["spots"] > 0; shift["booked"] = True
+        return web.Response(text=f'<div class="arena_shift_instance">{shift["name"]} ✔</div>', content_type="text/html")
+
+    async def websocket(self, request):
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        for frame in self.push_frames: await socket.send_str(frame)
+        async for _ in socket: pass
+        return socket
+
+    async def updates(self, request):
+        return web.Response(text=json.dumps([json.loads(f) for f in self.push_frames if f.lstrip().startswith(("{", "["))]),
+                            content_type="application/json")
+
+    # --- server ------------------------------------------------------------------
+    async def start(self):
+        app = web.Application()
+        app.add_routes([web.get("/", self.home), web.get("/login/", self.login_page), web.post("/login/", self.login),
+                        web.get("/rooms/{room}/", self.room_page), web.post("/rooms/{room}/shift-instances/{shift_id}/hold/", self.hold),
+                        web.get("/rooms/{room}/ws/", self.websocket), web.get("/rooms/{room}/updates/", self.updates)])
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        # A host name, not an IP: aiohttp's cookie jar ignores cookies set by IP addresses
+        self.url = f"http://localhost:{self._runner.addresses[0][1]}"
+        return self
+
+    async def close(self):
+        if self._runner is not None: await self._runner.cleanup()
+
+    async def __aenter__(self): return await self.start()
+
+    async def __aexit__(self, *exc): await self.close()
+
+def point_bot_at(bot, site, monkeypatch, sessions_dir):
+    """Send the bot's login and room URLs to the stub, and keep its saved sessions in `sessions_dir`."""
+    monkeypatch.setattr(bot, "LOGIN_URL", f"{site.url}/login/")
+    monkeypatch.setattr(bot, "get_month_url", lambda room_number, year, month: f"{site.url}/rooms/{room_number}/")
+    monkeypatch.setattr(bot, "SESSIONS_DIR", str(sessions_dir))
+
+async def wait_for(condition, timeout=5.0, interval=0.01):
+    """Poll until `condition()` is true; False on timeout."""
+    loop = asyncio.get_running_loop(); deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline: return False
+        await asyncio.sleep(interval)
+    return True
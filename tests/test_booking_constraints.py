@@ -0,0 +1,20 @@
+"""BookingConstraints: the per-account rules, counted from bookings and seeded history."""
+import pytest
+
+bot = pytest.importorskip("bot", reason="bot.py needs its runtime dependencies (playwright, customtkinter)")
+
+def test_one_per_day_and_weekly_limit():
+    constraints = bot.BookingConstraints({"one_per_day": True, "max_per_week": 2})
+    constraints.seed([("2025-12-01 الاثنين", "Morning")])
+    assert constraints.violation("2025-12-01", "Night") == "already have a shift that day"
+    constraints.record("2025-12-03", "Night")
+    assert constraints.violation("2025-12-05", "Morning") == "weekly limit of 2"
+    assert constraints.violation("2025-12-08", "Morning") is None  # the next ISO week
+
+@pytest.mark.parametrize("date_text", ["2025-02-30 الأحد", "2025-13-01", "no date"])
+def test_invalid_dates_are_not_counted(date_text):
+    constraints = bot.BookingConstraints({"one_per_day": True})
+    constraints.seed([(date_text, "Morning")])
+    constraints.record(date_text, "Night")
+    assert constraints.violation(date_text, "Morning") is None
+    assert constraints.by_day == {}
@@ -0,0 +1,142 @@
+"""The browserless engine against the local stub site: parsing the recorded room page, the hold
+request a 'Book' button sends, login with CSRF, polling, and booking outcomes."""
+import asyncio
+import configparser
+import queue
+import threading
+
+import pytest
+
+bot = pytest.importorskip("bot", reason="bot.py needs its runtime dependencies (playwright, customtkinter)")
+aiohttp = pytest.importorskip("aiohttp")
+from stub_site import HOLD_EXPIRE, HOLD_REJECT, StubSite, point_bot_at, read_fixture, wait_for
+
+ROOM_URL = "https://wardyati.com/rooms/1/"
+
+# --- parsing ------------------------------------------------------------------
+def test_parse_recorded_room_page():
+    index, csrf_token = bot.parse_room_html(read_fixture("room_page.html"))
+    assert csrf_token == "Zq1rX8recordedCsrfToken0000000000000000000000000000000000000000"
+    rows = [(slot["date"], slot["name"], slot["spots"], slot["bookable"], slot["card"], slot["slot"]) for slot in index.values()]
+    assert rows == [("2025-12-01 الاثنين", "Morning", 0, False, 0, 0),   # disabled
+                    ("2025-12-01 الاثنين", "Night", 2, True, 0, 1),
+                    ("2025-12-02 الثلاثاء", "Morning", 1, True, 1, 0),   # button inside a form
+                    ("2025-12-02 الثلاثاء", "Evening", 3, False, 1, 1)]  # hidden with d-none
+
+def test_hold_request_for_htmx_button():
+    index, _ = bot.parse_room_html(read_fixture("room_page.html"))
+    method, url, data, headers = bot.hold_request_for(index[("2025-12-01 الاثنين", "Night")]["request"], ROOM_URL)
+    assert (method, url) == ("POST", "https://wardyati.com/rooms/1/shift-instances/102/hold/")
+    assert data == {"source": "arena"}  # hx-vals
+    assert headers == {"HX-Request": "true", "HX-Current-URL": ROOM_URL}
+
+def test_hold_request_for_form_button():
+    index, _ = bot.parse_room_html(read_fixture("room_page.html"))
+    method, url, data, headers = bot.hold_request_for(index[("2025-12-02 الثلاثاء", "Morning")]["request"], ROOM_URL)
+    assert (method, url) == ("POST", "https://wardyati.com/rooms/1/shift-instances/103/hold/")
+    assert data == {"csrfmiddlewaretoken": "Zq1rX8recordedCsrfToken0000000000000000000000000000000000000000",
+                    "next": "/rooms/1/", "action": "hold"}
+    assert headers == {}
+
+def test_booking_outcome():
+    assert bot.booking_outcome(200, ROOM_URL) == (bot.BOOKING_CONFIRMED, "HTTP 200")
+    assert bot.booking_outcome(409)[0] == bot.BOOKING_REJECTED
+    assert bot.booking_outcome(200, "https://wardyati.com/login/?next=/rooms/1/") == (bot.BOOKING_REJECTED, "session expired")
+
+# --- against the stub -----------------------------------------------------------
+def room(open_morning=True, spots=1):
+    return {"2025-12-01 الاثنين": [{"id": 101, "name": "Morning", "spots": spots, "open": open_morning},
+                                   {"id": 102, "name": "Night", "spots": 0}]}
+
+def make_config(**settings):
+    config = configparser.ConfigParser()
+    config.read_dict({"Settings": {"scan_interval_seconds": "0.05", "confirm_timeout_seconds": "2", "booking_refill_seconds": "0", **settings},
+                      "Credentials": {}})
+    return config
+
+@pytest.fixture
+def run_engine(monkeypatch, tmp_path):
+    """Run run_http_automation against a stub site to the end; returns (log lines, RunEvents, RunState)."""
+    def run(site, shifts, password="secret", while_running=None, timeout=15):
+        log_queue = queue.Queue(); stop_event = threading.Event(); state = bot.RunState("acc")
+        async def scenario():
+            async with site:
+                point_bot_at(bot, site, monkeypatch, tmp_path)
+                run = asyncio.ensure_future(bot.run_http_automation(make_config(), shifts, site.room, 0, log_queue, stop_event,
+                                                                    credentials={"username": site.username, "password": password},
+                                                                    account_label="acc", state=state))
+                if while_running is not None: await while_running(site)
+                try: await asyncio.wait_for(asyncio.shield(run), timeout)
+                except asyncio.TimeoutError:
+                    stop_event.set(); await run
+                    pytest.fail("the run did not finish")
+        asyncio.run(scenario())
+        items = []
+        while not log_queue.empty(): items.append(log_queue.get())
+        return [str(item) for item in items], [item for item in items if isinstance(item, bot.RunEvent)], state
+    return run
+
+def kinds(events): return [event.kind for event in events]
+
+def test_login_with_csrf_then_book(run_engine):
+    site = StubSite(room())
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Morning"}])
+    assert site.logins == 1
+    assert [shift_id for shift_id, _, _ in site.holds] == [101]
+    _, header, cookie = site.holds[0]
+    assert header and header == cookie  # X-CSRFToken matches the csrftoken cookie
+    assert bot.EVENT_LOGIN_OK in kinds(events) and bot.EVENT_BOOKING_CONFIRMED in kinds(events)
+    assert state.phase == bot.RUN_FINISHED
+    assert site.shift(101)["booked"]
+
+def test_saved_session_skips_login(run_engine):
+    first = StubSite(room())
+    run_engine(first, [{"date": "2025-12-01", "name": "Morning"}])
+    second = StubSite(room())
+    second.sessions = first.sessions  # the same server, restarted
+    lines, events, _ = run_engine(second, [{"date": "2025-12-01", "name": "Morning"}])
+    assert second.logins == 0
+    assert any(event.kind == bot.EVENT_LOGIN_OK and event.data.get("restored") for event in events)
+
+def test_polls_until_the_shift_opens(run_engine):
+    site = StubSite(room(open_morning=False))
+    async def open_later(site):
+        assert await wait_for(lambda: site.room_requests >= 3)
+        site.set_shift(101, open=True)
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Morning"}], while_running=open_later)
+    assert site.room_requests >= 4
+    assert [shift_id for shift_id, _, _ in site.holds] == [101]
+    assert state.phase == bot.RUN_FINISHED
+
+def test_full_exact_target_is_dropped(run_engine):
+    site = StubSite(room())
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Night"}])
+    assert bot.EVENT_TARGET_FULL in kinds(events)
+    assert site.holds == []
+    assert state.phase == bot.RUN_FINISHED
+
+def test_rejected_hold_stays_in_the_queue(run_engine):
+    site = StubSite(room())
+    site.hold_outcomes = [HOLD_REJECT]
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Morning"}])
+    assert any("Booking request rejected (HTTP 409)" in line for line in lines)
+    assert [shift_id for shift_id, _, _ in site.holds] == [101, 101]
+    assert kinds(events).count(bot.EVENT_BOOKING_CONFIRMED) == 1
+    assert state.phase == bot.RUN_FINISHED
+
+def test_hold_redirected_to_login_logs_in_again(run_engine):
+    site = StubSite(room())
+    site.hold_outcomes = [HOLD_EXPIRE]
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Morning"}])
+    assert any("Booking request rejected (session expired)" in line for line in lines)
+    assert any("Session expired" in line and "Recovering" in line for line in lines)
+    assert site.logins == 2
+    assert kinds(events).count(bot.EVENT_BOOKING_CONFIRMED) == 1
+    assert state.phase == bot.RUN_FINISHED
+
+def test_wrong_password_fails_the_run(run_engine):
+    site = StubSite(room())
+    lines, events, state = run_engine(site, [{"date": "2025-12-01", "name": "Morning"}], password="wrong")
+    assert site.logins == 0 and site.holds == []
+    assert bot.EVENT_RUN_FAILED in kinds(events)
+    assert state.error == "Login failed. Check username/password."
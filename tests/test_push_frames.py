@@ -0,0 +1,80 @@
+"""decode_push_frame / PushState against recorded room push frames, and install_push_listener on a
+real page fed by the local stub's WebSocket and XHR endpoints."""
+import asyncio
+
+import pytest
+
+bot = pytest.importorskip("bot", reason="bot.py needs its runtime dependencies (playwright, customtkinter)")
+from stub_site import StubSite, read_fixture, wait_for
+
+def test_json_frame_with_date_on_outer_object():
+    updates = bot.decode_push_frame(read_fixture("push", "ws_update.json"))
+    assert updates == [("2025-12-01 الاثنين", "Morning", 1, True), ("2025-12-01 الاثنين", "Night", 2, None)]
+
+def test_json_list_frame_and_spots_as_text():
+    updates = bot.decode_push_frame(read_fixture("push", "ws_list.json").encode("utf-8"))
+    assert updates == [("2025-12-02", "Morning", 0, False), ("2025-12-02", "Evening", 3, None)]
+
+def test_unrelated_json_is_not_an_update():
+    # Generic keys (title, number, available, day, shift) and dates without YYYY-MM-DD are ignored
+    assert bot.decode_push_frame(read_fixture("push", "ws_unrelated.json")) == []
+
+def test_sse_body_with_multiline_data():
+    assert bot.decode_push_frame(read_fixture("push", "sse_update.txt")) == [("2025-12-02 الثلاثاء", "Evening", 0, None)]
+
+def test_htmx_fragment_with_day_card():
+    assert bot.decode_push_frame(read_fixture("push", "htmx_fragment.html")) == [("2025-12-01 الاثنين", "Morning", 1, True)]
+
+@pytest.mark.parametrize("payload", ["", "   ", "not json", "{broken", b"\x00\x01", "<div>no day cards</div>"])
+def test_anything_else_decodes_to_nothing(payload):
+    assert bot.decode_push_frame(payload) == []
+
+def test_push_state_reports_openings_and_overlays_the_snapshot():
+    push_state = bot.PushState(hold_seconds=60)
+    assert push_state.feed([("2025-12-01 الاثنين", "Morning", 0, None)]) is False
+    # The counter going up from zero opens the shift even without a bookable field
+    assert push_state.feed([("2025-12-01", "morning ", 1, None)]) is True
+    assert push_state.feed([("2025-12-01", "Morning", 1, None)]) is False  # already open
+    index, _ = bot.parse_room_html(read_fixture("room_page.html"))
+    push_state.overlay(index)
+    morning = index[("2025-12-01 الاثنين", "Morning")]
+    assert (morning["spots"], morning["bookable"]) == (1, True)
+    assert (push_state.frames, push_state.openings) == (3, 1)
+
+def test_push_state_entries_expire():
+    push_state = bot.PushState(hold_seconds=0)
+    push_state.feed([("2025-12-01", "Morning", 1, True)])
+    index, _ = bot.parse_room_html(read_fixture("room_page.html"))
+    push_state.overlay(index)
+    assert index[("2025-12-01 الاثنين", "Morning")]["spots"] == 0  # the page's own value wins again
+    assert push_state.updates == {}
+
+def test_listener_reads_websocket_frames_and_xhr_bodies():
+    async_playwright = pytest.importorskip("playwright.async_api").async_playwright
+    frames = [read_fixture("push", name).strip() for name in ("ws_unrelated.json", "ws_update.json", "ws_list.json")]
+    days = {"2025-12-01 الاثنين": [{"id": 101, "name": "Morning", "spots": 0}],
+            "2025-12-02 الثلاثاء": [{"id": 103, "name": "Evening", "spots": 3, "open": True}]}
+
+    async def scenario():
+        async with StubSite(days, push_frames=frames, push=True) as site, async_playwright() as playwright:
+            try: browser = await playwright.chromium.launch()
+            except Exception as e: pytest.skip(f"Chromium is not installed ({e})")
+            try:
+                context = await browser.new_context()
+                await context.add_cookies([{"name": "sessionid", "value": site.new_session(), "url": site.url}])
+                page = await context.new_page()
+                push_state = bot.PushState(hold_seconds=60); wake_event = asyncio.Event()
+                remove = bot.install_push_listener(page, push_state, wake_event)
+                await page.goto(f"{site.url}/rooms/1/")
+                # The two room WebSocket frames (the unrelated one is no update) plus the XHR body repeating them
+                assert await wait_for(lambda: push_state.frames >= 3)
+                assert wake_event.is_set()  # Morning on 2025-12-01 went from nothing to bookable
+                assert push_state.updates[push_state.key("2025-12-01", "Morning")]["bookable"] is True
+                assert push_state.updates[push_state.key("2025-12-02", "Morning")]["spots"] == 0
+                remove()
+                frames_seen = push_state.frames
+                await page.reload(); await asyncio.sleep(0.3)
+                assert push_state.frames == frames_seen  # detached
+            finally:
+                await browser.close()
+    asyncio.run(scenario())